@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# پر کردن کش تنظیمات سایت و فهرست دوره‌ها هنگام بالا آمدن هر worker
+from courses.cache import warm_site_cache  # noqa: E402
+
+warm_site_cache()
@@ -54,8 +54,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # اولین middleware تا زمان کل درخواست را اندازه بگیرد (maintenance/profiling.py)
+    'maintenance.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # قبل از SessionMiddleware تا نوشتن نشست هم کاربر را به دیتابیس اصلی بچسباند (maintenance/replicas.py)
+    'maintenance.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,6 +70,15 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
 ]
 
+# پروفایل درخواست‌ها: هدر Server-Timing برای staff، ثبت درخواست‌های کندتر از PROFILING_SLOW_MS
+# و صدک‌های هر ویو در /admin/profiling/. PROFILING_EXPLAIN برای کوئری‌های کندترین درخواست‌ها
+# EXPLAIN هم می‌گیرد (فقط هنگام عیب‌یابی روشن شود). پیش‌فرض فقط در حالت DEBUG روشن است.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', str(DEBUG)) == 'True'
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', '500'))
+PROFILING_EXPLAIN = os.getenv('PROFILING_EXPLAIN', 'False') == 'True'
+PROFILING_WINDOW = 1000         # تعداد درخواست‌های اخیر هر ویو برای صدک‌ها
+PROFILING_SLOW_BUFFER = 50      # تعداد درخواست‌های کند نگه داشته شده
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -86,13 +99,67 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# ویوهای async صفحه‌های دانشجو (courses/async_views.py)؛ فقط هنگام اجرا با سرور ASGI روشن شود
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
 
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# زیر ASGI اتصال ماندگار (conn_max_age) به درستی بسته نمی‌شود و باید خاموش باشد؛
+# برای استفاده‌ی دوباره از اتصال‌ها، pool سمت دیتابیس (مثلا pgbouncer) به کار ببرید
 DATABASES = {
-    'default': dj_database_url.config(default='sqlite:///db.sqlite3', conn_max_age=600)
+    'default': dj_database_url.config(default='sqlite:///db.sqlite3', conn_max_age=0 if ASYNC_VIEWS else 600)
+}
+
+# replica های فقط‌خواندنی، با کاما جدا شده (مثلا postgres://...,postgres://...) با نام‌های replica1، replica2، ...
+# خواندن‌های GET ویوهای REPLICA_VIEWS به یکی از آن‌ها می‌رود؛ کاربری که چیزی نوشته تا
+# REPLICA_STICKY_SECONDS بعد از اصلی می‌خواند. برای تست محلی با دو فایل SQLite، README را ببینید.
+DATABASE_REPLICAS = []
+for _number, _url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    _alias = f'replica{_number}'
+    DATABASES[_alias] = dj_database_url.parse(_url.strip(), conn_max_age=0 if ASYNC_VIEWS else 600)
+    # در تست‌ها replica همان دیتابیس تست اصلی است
+    DATABASES[_alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['maintenance.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+REPLICA_VIEWS = [
+    'courses:course_list',
+    'courses:course_detail',
+    'courses:exercise_detail',
+    'admin:*_changelist',
+    'api:*',
+]
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# LocMemCache مال هر پروسه است: با بیش از یک worker باطل شدن کش (و بالا رفتن نسخه‌ها) به
+# workerهای دیگر نمی‌رسد. در production کش را با REDIS_URL مشترک کنید.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'sayad-lms'),
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# کش تنظیمات سایت و فهرست دوره‌های ثبت‌نام (courses/cache.py)
+SITE_CACHE_BACKEND = {
+    'BACKEND': 'courses.cache.TieredBackend',
+    'MAX_ENTRIES': 256,
+    'LOCAL_TIMEOUT': 30,
+    # سقف کهنگی وقتی کش مشترک نیست
+    'TIMEOUT': 300,
 }
 
 
@@ -140,6 +207,23 @@ AUTH_USER_MODEL = 'users.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# سپردن انتقال فایل‌های media به پروکسی جلویی: 'nginx' (X-Accel-Redirect) یا 'apache' (X-Sendfile)
+# برای nginx یک location داخلی (internal) با alias به MEDIA_ROOT روی MEDIA_SENDFILE_PREFIX لازم است.
+# خالی یعنی خود جنگو فایل را با پشتیبانی از Range و ETag می‌فرستد.
+MEDIA_SENDFILE_BACKEND = os.getenv('MEDIA_SENDFILE_BACKEND', '')
+MEDIA_SENDFILE_PREFIX = os.getenv('MEDIA_SENDFILE_PREFIX', '/protected-media/')
+
+# بازه‌ای که اکشن «پخش زمان انتشار» ادمین، انتشار دوره‌های انتخاب شده را در آن پخش می‌کند (دقیقه)
+RELEASE_STAGGER_MINUTES = int(os.getenv('RELEASE_STAGGER_MINUTES', '30'))
+
+# نمره‌دهی خودکار (courses/autograder.py): کد دانشجو با این کاربر بی‌دسترسی (مثلا nobody) و این مفسر پایتون
+# (بهتر است پایتون سیستم باشد، نه virtualenv پروژه) اجرا می‌شود. بدون AUTOGRADER_USER کد دانشجو اجرا نمی‌شود،
+# مگر AUTOGRADER_ALLOW_UNSANDBOXED=True باشد (فقط برای محیط توسعه: کد با کاربر خود برنامه و دسترسی کامل
+# به فایل‌ها و شبکه اجرا می‌شود). root در هر حال کاربر جدا لازم دارد
+AUTOGRADER_USER = os.getenv('AUTOGRADER_USER', '')
+AUTOGRADER_PYTHON = os.getenv('AUTOGRADER_PYTHON', '')
+AUTOGRADER_ALLOW_UNSANDBOXED = os.getenv('AUTOGRADER_ALLOW_UNSANDBOXED', 'False') == 'True'
+
 # --- تنظیمات احراز هویت و ایمیل ---
 SITE_ID = 1
 
@@ -148,8 +232,10 @@ AUTHENTICATION_BACKENDS = [
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
 
-# تنظیمات ارسال ایمیل (چاپ در ترمینال برای تست)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# با EMAIL_OUTBOX=True ایمیل‌ها در جدول OutboxEmail صف می‌شوند و دستور send_outbox آن‌ها را با
+# OUTBOX_DELIVERY_BACKEND می‌فرستد. فقط وقتی روشن شود که worker کنار وب اجرا می‌شود؛ بدون آن
+# ایمیل تایید هیچ‌وقت نمی‌رسد و cleanup_unverified_users کاربر را حذف می‌کند (README: Email outbox)
+EMAIL_OUTBOX = os.getenv('EMAIL_OUTBOX', 'False') == 'True'
 
 # تنظیمات رفتاری Allauth
 ACCOUNT_AUTHENTICATION_METHOD = 'email' # ورود فقط با ایمیل
@@ -180,15 +266,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 if not DEBUG:
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
     EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
     EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
     EMAIL_USE_TLS = True
     EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
     EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
-    DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+    # from_email جدول صف NOT NULL است؛ بدون EMAIL_HOST_USER هم فرستنده‌ی خالی نداریم
+    DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL') or EMAIL_HOST_USER or 'webmaster@localhost'
 else:
-    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+    OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# بدون صف، ایمیل مثل قبل در همان درخواست با SMTP (یا کنسول در حالت DEBUG) فرستاده می‌شود
+EMAIL_BACKEND = 'maintenance.mail.OutboxBackend' if EMAIL_OUTBOX else OUTBOX_DELIVERY_BACKEND
 
 # پیشوند عنوان ایمیل‌ها
 ACCOUNT_EMAIL_SUBJECT_PREFIX = "[آکادمی پایتون] "
@@ -16,26 +16,24 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.conf import settings
-from django.views.static import serve
-from django.conf.urls.static import static
 from courses.views import home_page, contact_us
+from courses.media import serve_media
 
 
 urlpatterns = [
+    # قبل از admin تا مسیرهای ادمین آن را نگیرند (maintenance/profiling.py)
+    path('admin/profiling/', include('maintenance.urls')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('accounts/', include('allauth.urls')),
     path('courses/', include('courses.urls')),
+    # API فقط‌خواندنی JSON برای کلاینت موبایل (courses/api.py)
+    path('api/', include('courses.api_urls')),
     path('', home_page, name='home'),
     path('contact/', contact_us, name='contact'),
 ]
 
+# فایل‌های media با بررسی دسترسی سرو می‌شوند (courses/media.py)
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {
-        'document_root': settings.MEDIA_ROOT,
-    }),
+    re_path(r'^media/(?P<path>.*)$', serve_media, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
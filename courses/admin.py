@@ -1,7 +1,25 @@
 from django.contrib import admin
 from .models import CourseTemplate, ExerciseTemplate, Course, Exercise, Submission
-from .models import EnrollmentRequest, SiteSetting 
+from .models import EnrollmentRequest, SiteSetting, ExerciseTestCase
 from django.utils.html import format_html
+from django import forms
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from .cache import bump_exercises
+from .enrollment import approve_requests
+from .gradebook import csv_export_response, get_gradebook_html, import_grades
+from .archive import submissions_for, zip_response
+from .propagation import deferred_propagation
+from .release import stagger_courses
+from .autograder import queue_submissions, supports_sandbox
+from .similarity import suspicious_pairs
 
 
 # --- مدیریت الگوها ---
@@ -14,25 +32,58 @@ class ExerciseTemplateInline(admin.StackedInline):
 class CourseTemplateAdmin(admin.ModelAdmin):
     inlines = [ExerciseTemplateInline]
 
+    def save_related(self, request, form, formsets, change):
+        # ذخیره‌ی هر تمرین inline همگام‌سازی جدا راه نمی‌اندازد؛ در پایان یک بار برای کل الگو انجام می‌شود
+        with deferred_propagation():
+            super().save_related(request, form, formsets, change)
+
 
 # --- اکشن‌های سفارشی برای تمرینات ---
+def _set_locked(queryset, is_locked):
+    # update سیگنال نمی‌فرستد؛ نسخه‌ی کش لیست تمرین‌های دوره‌های مربوطه را خودمان بالا می‌بریم
+    course_ids = set(queryset.values_list('course_id', flat=True).distinct())
+    queryset.update(is_locked=is_locked)
+    transaction.on_commit(lambda: bump_exercises(*course_ids))
+
+
 @admin.action(description='🔓 باز کردن قفل تمرین‌های انتخاب شده')
 def unlock_exercises(modeladmin, request, queryset):
-    queryset.update(is_locked=False)
+    _set_locked(queryset, False)
 
 
 @admin.action(description='🔒 قفل کردن تمرین‌های انتخاب شده')
 def lock_exercises(modeladmin, request, queryset):
-    queryset.update(is_locked=True)
+    _set_locked(queryset, True)
+
+
+# --- دانلود یکجای ارسال‌ها به صورت ZIP (ساخته شده در حین دانلود) ---
+@admin.action(description='🗜️ دانلود ZIP همه ارسال‌های تمرین‌های انتخاب شده')
+def download_exercise_submissions_zip(modeladmin, request, queryset):
+    return zip_response(submissions_for(exercises=queryset), filename='exercise_submissions.zip')
+
+
+@admin.action(description='🗜️ دانلود ZIP همه ارسال‌های دوره‌های انتخاب شده')
+def download_course_submissions_zip(modeladmin, request, queryset):
+    return zip_response(submissions_for(courses=queryset), filename='course_submissions.zip')
+
+
+@admin.action(description='⏱️ پخش زمان انتشار تمرین‌های دوره‌های انتخاب شده')
+def stagger_course_releases(modeladmin, request, queryset):
+    window = timedelta(minutes=getattr(settings, 'RELEASE_STAGGER_MINUTES', 30))
+    courses = stagger_courses(list(queryset), window)
+    messages.success(
+        request, f'انتشار تمرین‌های {len(courses)} دوره در بازه‌ی {window.total_seconds() / 60:.0f} دقیقه پخش شد.',
+    )
 
 
 # --- مدیریت دوره‌های اجرایی ---
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'template', 'course_number', 'created_at']
+    list_display = ['title', 'template', 'course_number', 'created_at', 'starts_at', 'release_offset', 'gradebook_link']
     
     # خطط کلیدی
     filter_horizontal = ('students',)
+    actions = [download_course_submissions_zip, stagger_course_releases]
     search_fields = (
         'title',
         'students__email',
@@ -40,20 +91,131 @@ class CourseAdmin(admin.ModelAdmin):
         'students__last_name',
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('template')
+
+    def gradebook_link(self, obj):
+        url = reverse('admin:courses_course_gradebook', args=[obj.pk])
+        return format_html('<a href="{}">📊 دفتر نمره</a>', url)
+    gradebook_link.short_description = 'دفتر نمره'
+
+    def get_urls(self):
+        urls = [
+            path('<int:course_id>/gradebook/', self.admin_site.admin_view(self.gradebook_view), name='courses_course_gradebook'),
+        ]
+        return urls + super().get_urls()
+
+    def gradebook_view(self, request, course_id):
+        course = get_object_or_404(Course, pk=course_id)
+        if not self.has_view_permission(request, course):
+            raise PermissionDenied
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'دفتر نمره: {course.title}',
+            'course': course,
+            'gradebook': get_gradebook_html(course),
+        }
+        return TemplateResponse(request, 'admin/courses/course/gradebook.html', context)
+
+
+class ExerciseTestCaseInline(admin.StackedInline):
+    model = ExerciseTestCase
+    extra = 0
+
 
 @admin.register(Exercise)
 class ExerciseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'course', 'order', 'is_locked']
+    inlines = [ExerciseTestCaseInline]
+    list_display = ['title', 'course', 'order', 'is_locked', 'unlock_at', 'lock_at', 'similarity_link']
     list_filter = ['course', 'is_locked'] # فیلتر سمت راست خیلی مهم است
     list_editable = ['is_locked'] # روش سریع برای باز کردن تکی
-    actions = [unlock_exercises, lock_exercises] # اضافه کردن دکمه‌های گروهی بالا
+    actions = [unlock_exercises, lock_exercises, download_exercise_submissions_zip] # اضافه کردن دکمه‌های گروهی بالا
+
+    def similarity_link(self, obj):
+        url = reverse('admin:courses_exercise_similarity', args=[obj.pk])
+        return format_html('<a href="{}">🔍 کدهای مشابه</a>', url)
+    similarity_link.short_description = 'کدهای مشابه'
+
+    def get_urls(self):
+        urls = [
+            path('<int:exercise_id>/similarity/', self.admin_site.admin_view(self.similarity_view), name='courses_exercise_similarity'),
+        ]
+        return urls + super().get_urls()
+
+    def similarity_view(self, request, exercise_id):
+        exercise = get_object_or_404(Exercise.objects.select_related('course'), pk=exercise_id)
+        if not self.has_view_permission(request, exercise):
+            raise PermissionDenied
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'کدهای مشابه: {exercise}',
+            'exercise': exercise,
+            'pairs': suspicious_pairs(exercise),
+        }
+        return TemplateResponse(request, 'admin/courses/exercise/similarity.html', context)
+
+
+@admin.action(description='📄 خروجی CSV دفتر نمره')
+def export_grades_csv(modeladmin, request, queryset):
+    return csv_export_response(queryset)
+
+
+@admin.action(description='🗜️ دانلود ZIP ارسال‌های انتخاب شده')
+def download_submissions_zip(modeladmin, request, queryset):
+    return zip_response(queryset)
+
+
+# اجرای کد دانشجو در درخواست ادمین worker وب را قفل می‌کرد؛ اکشن‌ها فقط صف می‌کنند و
+# autograde_submissions --queued --loop نمره می‌دهد
+def _sandbox_missing(modeladmin, request):
+    # بدون کاربر جدای sandbox کد دانشجو با کاربر برنامه (با دسترسی به دیتابیس و .env) اجرا می‌شد
+    if supports_sandbox():
+        return False
+    modeladmin.message_user(
+        request, 'نمره‌دهی خودکار فعال نیست: AUTOGRADER_USER (یا AUTOGRADER_ALLOW_UNSANDBOXED) تنظیم نشده است.',
+        messages.ERROR,
+    )
+    return True
+
+
+@admin.action(description='🤖 نمره‌دهی خودکار ارسال‌های انتخاب شده')
+def autograde_submissions(modeladmin, request, queryset):
+    if _sandbox_missing(modeladmin, request):
+        return
+    count = queue_submissions(queryset)
+    modeladmin.message_user(
+        request, f'{count} ارسال در صف نمره‌دهی خودکار قرار گرفت (نمره‌های دستی دست نمی‌خورند).', messages.SUCCESS,
+    )
+
+
+@admin.action(description='🤖 نمره‌دهی خودکار دوباره (بازنویسی نمره‌های دستی)')
+def autograde_submissions_overwrite(modeladmin, request, queryset):
+    if _sandbox_missing(modeladmin, request):
+        return
+    count = queue_submissions(queryset, overwrite_manual=True)
+    modeladmin.message_user(
+        request, f'{count} ارسال در صف نمره‌دهی خودکار قرار گرفت (نمره‌های دستی هم بازنویسی می‌شوند).',
+        messages.WARNING,
+    )
+
+
+class GradeImportForm(forms.Form):
+    csv_file = forms.FileField(label='فایل CSV دفتر نمره')
 
-from django.utils.html import format_html
 
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/courses/submission/change_list.html'
+    actions = [export_grades_csv, download_submissions_zip, autograde_submissions, autograde_submissions_overwrite]
+
     # ستون‌هایی که در جدول نمایش داده می‌شوند
     list_display = ['student_info', 'course_info', 'exercise_info', 'file_link', 'submitted_at_formatted', 'score_status']
+    # ستون‌ها دانشجو، تمرین و دوره را می‌خوانند؛ بدون این برای هر ردیف سه کوئری جدا زده می‌شود
+    list_select_related = ['student', 'exercise__course']
     
     # فیلترهای سمت راست (بسیار کاربردی)
     list_filter = ['exercise__course', 'exercise__is_locked', 'submitted_at']
@@ -95,16 +257,49 @@ class SubmissionAdmin(admin.ModelAdmin):
             return format_html('<span style="color: orange;">⏳ نمره داده نشده</span>')
         return format_html('<span style="color: blue; font-weight: bold;">{} / 100</span>', obj.score)
     score_status.short_description = 'وضعیت نمره'
+
+    # --- ورود گروهی نمره‌ها از CSV ---
+
+    def get_urls(self):
+        urls = [
+            path('import-grades/', self.admin_site.admin_view(self.import_grades_view), name='courses_submission_import_grades'),
+        ]
+        return urls + super().get_urls()
+
+    def import_grades_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        result = None
+        if request.method == 'POST':
+            form = GradeImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                result = import_grades(form.cleaned_data['csv_file'])
+                level = messages.WARNING if result.errors else messages.SUCCESS
+                self.message_user(
+                    request,
+                    f'{result.updated} ارسال به‌روز شد، {result.unchanged} بدون تغییر، {len(result.errors)} خطا.',
+                    level,
+                )
+        else:
+            form = GradeImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'ورود نمره‌ها از CSV',
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/courses/submission/import_grades.html', context)
     
 
 # اکشن برای تایید درخواست‌ها
 @admin.action(description='✅ تایید درخواست و عضویت دانشجو در دوره')
 def approve_enrollment(modeladmin, request, queryset):
-    for req in queryset:
-        # 1. دانشجو را به دوره اضافه کن
-        req.course.students.add(req.student)
-        # 2. درخواست را پاک کن (چون دیگه انجام شد)
-        req.delete()
+    # همه با هم: یک insert گروهی در جدول عضویت و یک delete، داخل یک تراکنش
+    approved = approve_requests(queryset)
+    modeladmin.message_user(request, f'{sum(approved.values())} درخواست در {len(approved)} دوره تایید شد.')
 
 @admin.register(EnrollmentRequest)
 class EnrollmentRequestAdmin(admin.ModelAdmin):
@@ -0,0 +1,196 @@
+"""
+API فقط‌خواندنی JSON برای کلاینت موبایل: دوره‌های دانشجو، تمرین‌های یک دوره و ارسال‌های دانشجو
+برای یک تمرین. احراز هویت همان نشست سایت است.
+
+صفحه‌بندی keyset است: cursor مقدار کلید مرتب‌سازی آخرین ردیف صفحه است و صفحه‌ی بعد با
+WHERE (order, id) > (...) ORDER BY order, id LIMIT n خوانده می‌شود؛ پس صفحه‌ی صدم هم مثل اولی یک
+جست‌وجوی ایندکس است، برخلاف OFFSET که همه‌ی ردیف‌های قبلی را می‌خواند و رد می‌کند.
+
+هر پاسخ ETag (هش بدنه) دارد و با If-None-Match یکسان، 304 بدون بدنه برمی‌گردد تا همگام‌سازی
+کلاینت روی صفحه‌هایی که عوض نشده‌اند تقریبا هیچ داده‌ای جابه‌جا نکند.
+"""
+import base64
+import functools
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+from .models import Course, Exercise, Submission
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class BadCursor(ValueError):
+    pass
+
+
+class Keyset:
+    """کلید مرتب‌سازی یکتا (آخرین فیلد باید id باشد) برای صفحه‌بندی keyset."""
+
+    def __init__(self, *fields, descending=False):
+        self.fields = fields
+        self.descending = descending
+
+    def order_by(self):
+        return [f'-{field}' if self.descending else field for field in self.fields]
+
+    def after(self, values, index=0):
+        """
+        ردیف‌های بعد از values به ترتیب کلید؛ به شکل f0 >= v0 AND (f0 > v0 OR ...) تا شرط اول
+        یک بازه‌ی ساده روی ایندکس باشد.
+        """
+        field, value = self.fields[index], values[index]
+        strict, inclusive = ('lt', 'lte') if self.descending else ('gt', 'gte')
+        if index == len(self.fields) - 1:
+            return Q(**{f'{field}__{strict}': value})
+        return Q(**{f'{field}__{inclusive}': value}) & (
+            Q(**{f'{field}__{strict}': value}) | self.after(values, index + 1)
+        )
+
+    def encode(self, obj):
+        # isoformat خود datetime؛ DjangoJSONEncoder میکروثانیه را تا میلی‌ثانیه کوتاه می‌کند و
+        # ردیف‌هایی که در همان میلی‌ثانیه ثبت شده‌اند از صفحه‌ی بعد جا می‌افتادند
+        values = [getattr(obj, field) for field in self.fields]
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, model, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise BadCursor(cursor)
+            # to_python برای None همان None را برمی‌گرداند و filter(order__gte=None) خطای ۵۰۰ می‌داد؛
+            # clean علاوه بر آن null بودن و بازه‌ی عدد صحیح دیتابیس را هم بررسی می‌کند
+            if any(isinstance(value, bool) or not isinstance(value, (str, int, float)) for value in values):
+                raise BadCursor(cursor)
+            return [model._meta.get_field(field).clean(value, None) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError) as error:
+            raise BadCursor(cursor) from error
+
+
+COURSE_KEYSET = Keyset('id')
+EXERCISE_KEYSET = Keyset('order', 'id')
+SUBMISSION_KEYSET = Keyset('submitted_at', 'id', descending=True)   # جدیدترین اول
+
+
+def _error(status, detail):
+    return JsonResponse({'detail': detail}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _json(request, payload):
+    body = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    # کلاینت باید هر بار با If-None-Match بپرسد؛ پاسخ مخصوص همین کاربر است
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def _page(request, queryset, keyset, serialize):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return _error(400, 'limit باید عدد باشد.')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            queryset = queryset.filter(keyset.after(keyset.decode(queryset.model, cursor)))
+        except BadCursor:
+            return _error(400, 'cursor نامعتبر است.')
+
+    # یک ردیف بیشتر خوانده می‌شود تا بدون COUNT معلوم شود صفحه‌ی بعدی هست یا نه
+    rows = list(queryset.order_by(*keyset.order_by())[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['cursor'] = keyset.encode(rows[-1])
+        next_url = f'{request.path}?{params.urlencode()}'
+    return _json(request, {'results': [serialize(row) for row in rows], 'next': next_url})
+
+
+def api_view(view):
+    """فقط GET/HEAD؛ کاربر وارد نشده به جای redirect به صفحه‌ی ورود، 401 می‌گیرد."""
+    @require_safe
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(401, 'ابتدا وارد شوید.')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _course_json(course):
+    return {
+        'id': course.pk,
+        'title': course.title,
+        'course_number': course.course_number,
+        'starts_at': course.starts_at,
+    }
+
+
+def _exercise_json(exercise):
+    return {
+        'id': exercise.pk,
+        'order': exercise.order,
+        'title': exercise.title,
+        'is_locked': exercise.is_locked,
+        'unlock_at': exercise.unlock_at,
+        'lock_at': exercise.lock_at,
+    }
+
+
+def _submission_json(submission):
+    return {
+        'id': submission.pk,
+        'submitted_at': submission.submitted_at,
+        'file': submission.submitted_file.url,
+        'original_name': submission.original_name,
+        'size': submission.size,
+        'score': submission.score,
+        'feedback': submission.feedback,
+    }
+
+
+@api_view
+def my_courses(request):
+    courses = request.user.courses_joined.only('pk', 'title', 'course_number', 'starts_at')
+    return _page(request, courses, COURSE_KEYSET, _course_json)
+
+
+@api_view
+def course_exercises(request, course_id):
+    course = Course.objects.filter(pk=course_id).only('pk').first()
+    if course is None:
+        return _error(404, 'دوره پیدا نشد.')
+    if not course.is_member(request.user):
+        return _error(403, 'شما در این دوره ثبت نام نکرده‌اید.')
+    exercises = Exercise.objects.filter(course_id=course_id).only(
+        'pk', 'order', 'title', 'is_locked', 'unlock_at', 'lock_at',
+    )
+    return _page(request, exercises, EXERCISE_KEYSET, _exercise_json)
+
+
+@api_view
+def exercise_submissions(request, exercise_id):
+    exercise = Exercise.objects.filter(pk=exercise_id).only('pk', 'course_id').first()
+    if exercise is None:
+        return _error(404, 'تمرین پیدا نشد.')
+    if exercise.course_id not in Course.memberships_for(request.user, [exercise.course_id]):
+        return _error(403, 'شما در این دوره ثبت نام نکرده‌اید.')
+    submissions = Submission.objects.filter(exercise_id=exercise_id, student=request.user).only(
+        'pk', 'submitted_at', 'submitted_file', 'original_name', 'size', 'score', 'feedback',
+    )
+    return _page(request, submissions, SUBMISSION_KEYSET, _submission_json)
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import api
+
+
+app_name = 'api'
+
+urlpatterns = [
+    path('courses/', api.my_courses, name='my_courses'),
+    path('courses/<int:course_id>/exercises/', api.course_exercises, name='course_exercises'),
+    path('exercises/<int:exercise_id>/submissions/', api.exercise_submissions, name='exercise_submissions'),
+]
@@ -0,0 +1,126 @@
+"""
+نسخه‌ی async صفحه‌های پربازدید دانشجو (فقط مسیر خواندن) برای اجرا زیر ASGI.
+
+کوئری‌های هر صفحه پشت سر هم await می‌شوند: ORM async جنگو هر کوئری را با
+sync_to_async(thread_sensitive=True) در thread همان درخواست اجرا می‌کند، پس کوئری‌های یک درخواست
+هم‌زمان اجرا نمی‌شوند (asyncio.gather هم فایده‌ای نداشت). سود ASGI بین درخواست‌هاست: worker در مدت
+انتظار یک درخواست برای دیتابیس، درخواست‌های دیگر را جواب می‌دهد.
+رندر قالب (که ممکن است به ORM همگام دست بزند) در thread اجرا می‌شود.
+با ASYNC_VIEWS=True در تنظیمات، courses/urls.py این ویوها را به جای courses/views.py استفاده می‌کند.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import HttpResponseForbidden
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.decorators.csrf import csrf_exempt
+
+from .cache import get_course_exercises
+from .forms import SubmissionForm
+from .models import Course, CourseProgress, Exercise, Submission
+from .progress import get_progress
+from . import views
+from .views import (
+    COURSE_CARDS_TIMEOUT, SUBMISSION_HISTORY_LIMIT, available_courses_queryset, course_cards_cache_key,
+    my_courses_queryset,
+)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _user(request):
+    # کاربر یک بار به صورت async خوانده می‌شود و جای request.user می‌نشیند تا
+    # context processor ها هنگام رندر دوباره سراغ session و دیتابیس نروند
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+def _membership(user_id, **lookups):
+    return Course.students.through.objects.filter(customuser_id=user_id, **lookups)
+
+
+arender = sync_to_async(render)
+
+
+@login_required
+async def course_list(request):
+    user = await _user(request)
+    cache_key = await sync_to_async(course_cards_cache_key)(request, user)
+
+    course_cards = await cache.aget(cache_key)
+    if course_cards is None:
+        context = {
+            'my_courses': await _alist(my_courses_queryset(user)),
+            'available_courses': await _alist(available_courses_queryset(user)),
+        }
+        course_cards = await sync_to_async(render_to_string)(
+            'courses/course_cards.html', context, request=request,
+        )
+        await cache.aset(cache_key, course_cards, COURSE_CARDS_TIMEOUT)
+
+    return await arender(request, 'courses/course_list.html', {'course_cards': mark_safe(course_cards)})
+
+
+@login_required
+async def course_detail(request, course_id):
+    user = await _user(request)
+
+    course = await aget_object_or_404(Course, pk=course_id)
+    is_enrolled = await _membership(user.pk, course_id=course_id).aexists()
+
+    context = {
+        'course': course,
+        'is_enrolled': is_enrolled,
+        'exercises': [],
+        'progress_percentage': 0,
+        'submitted_count': 0,
+        'total_exercises': 0,
+    }
+    if is_enrolled:
+        exercises = await sync_to_async(get_course_exercises)(course_id)
+        progress = await CourseProgress.objects.filter(student=user, course_id=course_id).afirst()
+        if progress is None:
+            progress = await sync_to_async(get_progress)(user, course)
+        context.update({
+            'exercises': exercises,
+            'progress_percentage': progress.percentage,
+            'submitted_count': progress.submitted_count,
+            'total_exercises': progress.total_exercises,
+        })
+    return await arender(request, 'courses/course_detail.html', context)
+
+
+@csrf_exempt
+@login_required
+async def exercise_detail(request, exercise_id):
+    if request.method == 'POST':
+        # ارسال فایل همان مسیر همگام courses.views را (با بررسی دسترسی و CSRF) طی می‌کند
+        return await sync_to_async(views.exercise_detail)(request, exercise_id)
+
+    user = await _user(request)
+    exercise = await aget_object_or_404(Exercise.objects.select_related('course'), pk=exercise_id)
+    if exercise.is_locked:
+        return HttpResponseForbidden("این تمرین قفل است.")
+
+    if not await _membership(user.pk, course_id=exercise.course_id).aexists():
+        messages.error(request, "شما در این دوره ثبت نام نکرده‌اید.")
+        return redirect('courses:course_detail', course_id=exercise.course_id)
+
+    previous_submissions = await _alist(
+        Submission.objects.filter(exercise_id=exercise_id, student=user)
+        .order_by('-submitted_at', '-pk')[:SUBMISSION_HISTORY_LIMIT + 1]
+    )
+
+    context = {
+        'exercise': exercise,
+        'form': SubmissionForm(),
+        'previous_submissions': previous_submissions[:SUBMISSION_HISTORY_LIMIT],
+        'more_submissions': len(previous_submissions) > SUBMISSION_HISTORY_LIMIT,
+    }
+    return await arender(request, 'courses/exercise_detail.html', context)
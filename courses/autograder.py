@@ -0,0 +1,458 @@
+"""
+نمره‌دهی خودکار ارسال‌های پایتون.
+
+هر ارسال (.py یا .zip) در یک پوشه‌ی موقت باز می‌شود و برای هر تست در یک subprocess جدا با
+محدودیت CPU، حافظه، حجم فایل، تعداد پروسه و زمان، با کاربر بی‌دسترسی AUTOGRADER_USER اجرا می‌شود. چند ارسال هم‌زمان (به تعداد هسته‌ها) اجرا
+می‌شوند؛ thread های pool فقط منتظر subprocess ها می‌مانند و کار اصلی روی همه‌ی هسته‌ها پخش می‌شود.
+تست‌های check در دو پروسه‌ی جدا اجرا می‌شوند (کد check و کد دانشجو، autograder_launcher.py) تا کد
+دانشجو نتواند قبول شدن تست را جعل کند.
+نتیجه‌ها دسته‌دسته با bulk_update در score و feedback نوشته می‌شوند.
+
+ارسال‌هایی که محتوای یکسان دارند (sha256 یکسان برای یک تمرین) فقط یک بار اجرا می‌شوند.
+اکشن ادمین فقط ارسال‌ها را در صف (Submission.autograde_request) می‌گذارد و
+autograde_submissions --queued --loop آن‌ها را بیرون از درخواست نمره می‌دهد.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+
+from .models import ExerciseTestCase, Submission
+from .uploads import supports_streaming
+
+try:
+    import pwd
+    import resource
+except ImportError:  # ویندوز
+    pwd = resource = None
+
+
+SOLUTION_MODULE = 'solution'
+MAX_ZIP_MEMBERS = 200
+MAX_UNZIPPED_BYTES = 20 * 1024 * 1024
+MAX_FEEDBACK_LINES = 20
+WRITE_BATCH_SIZE = 100
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    cpu_seconds: int = 2
+    memory_mb: int = 256
+    wall_seconds: float = 5
+    output_bytes: int = 64 * 1024
+    # RLIMIT_NPROC: صفر یعنی کد دانشجو نمی‌تواند fork کند یا thread بسازد
+    processes: int = 0
+
+
+SANDBOX_UNAVAILABLE = (
+    'Auto-grading needs a POSIX system, submissions on local disk and a separate AUTOGRADER_USER '
+    '(or AUTOGRADER_ALLOW_UNSANDBOXED=True on a worker that does not run as root).'
+)
+
+
+def sandbox_user():
+    """(uid, gid) کاربر AUTOGRADER_USER، یا None."""
+    if not settings.AUTOGRADER_USER:
+        return None
+    entry = pwd.getpwnam(settings.AUTOGRADER_USER)
+    return entry.pw_uid, entry.pw_gid
+
+
+def supports_sandbox():
+    # محدودیت‌ها با setrlimit در پروسه‌ی فرزند اعمال می‌شوند (فقط یونیکس) و فایل‌های ارسالی
+    # باید روی دیسک محلی باشند. rlimit ها جلوی خواندن فایل یا شبکه را نمی‌گیرند: بدون کاربر جدا، کد
+    # دانشجو با کاربر برنامه اجرا می‌شود و db.sqlite3، .env و تنظیمات را می‌خواند (و از طریق بازخورد
+    # بیرون می‌دهد)، پس فقط با انتخاب صریح AUTOGRADER_ALLOW_UNSANDBOXED. root هیچ‌وقت (محدودیت‌ها را
+    # دور می‌زند)
+    if resource is None or os.name != 'posix' or not supports_streaming():
+        return False
+    if settings.AUTOGRADER_USER:
+        return True
+    return settings.AUTOGRADER_ALLOW_UNSANDBOXED and os.geteuid() != 0
+
+
+# محدودیت‌ها داخل خود پروسه‌ی فرزند، قبل از اجرای کد دانشجو، اعمال می‌شوند (preexec_fn در برنامه‌ی
+# چند thread ای امن نیست). متن autograder_launcher.py با -c اجرا می‌شود تا کاربر sandbox به خواندن
+# پوشه‌ی پروژه نیاز نداشته باشد
+_LAUNCHER = (Path(__file__).parent / 'autograder_launcher.py').read_text(encoding='utf-8')
+
+
+def _kill_session(sid):
+    # پروسه‌ای که setsid کند از killpg فرار می‌کند؛ همه‌ی پروسه‌های session از /proc پیدا می‌شوند
+    # (با RLIMIT_NPROC=0 کد دانشجو اصلا نمی‌تواند پروسه‌ی دیگری بسازد)
+    pids = [int(entry) for entry in os.listdir('/proc') if entry.isdigit()] if os.path.isdir('/proc') else []
+    for pid in pids:
+        try:
+            if os.getsid(pid) == sid:
+                os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    try:
+        os.killpg(sid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _spawn(mode, args, workdir, limits, **kwargs):
+    env = {'PATH': '/usr/bin:/bin', 'PYTHONIOENCODING': 'utf-8', 'PYTHONDONTWRITEBYTECODE': '1'}
+    command = [
+        settings.AUTOGRADER_PYTHON or sys.executable, '-I', '-c', _LAUNCHER, mode,
+        str(limits.cpu_seconds), str(limits.memory_mb * 1024 * 1024), str(limits.output_bytes),
+        str(limits.processes), *args,
+    ]
+    user = sandbox_user()
+    credentials = {'user': user[0], 'group': user[1], 'extra_groups': []} if user else {}
+    return subprocess.Popen(command, cwd=workdir, env=env, start_new_session=True, **credentials, **kwargs)
+
+
+def _output(process, stdout, stderr, limits):
+    return (
+        process.returncode,
+        stdout[:limits.output_bytes].decode('utf-8', 'replace'),
+        stderr.decode('utf-8', 'replace').rstrip()[-2000:],
+    )
+
+
+def run_sandboxed(workdir, script, stdin, limits):
+    """اجرای script به عنوان __main__؛ (returncode, stdout, stderr) و returncode برابر None یعنی زمان تمام شد."""
+    process = _spawn(
+        'run', [script], workdir, limits,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = process.communicate(stdin.encode(), timeout=limits.wall_seconds)
+    except subprocess.TimeoutExpired:
+        # session با pid خود فرزند یکی است (start_new_session)؛ هنوز reap نشده پس pid آزاد نشده است
+        _kill_session(process.pid)
+        process.communicate()
+        return None, '', ''
+    return _output(process, stdout, stderr, limits)
+
+
+def run_check(code_dir, script, stdin, limits):
+    """
+    اسکریپت check و کد دانشجو در دو پروسه‌ی جدا (autograder_launcher.py) اجرا می‌شوند و نتیجه فقط از
+    کد خروج پروسه‌ی check می‌آید. وقتی پروسه‌ی check با خطا تمام شده و پروسه‌ی دانشجو با سیگنال
+    (محدودیت منابع) مرده، returncode همان سیگنال است. خروجی مثل run_sandboxed.
+    """
+    requests_read, requests_write = os.pipe()
+    responses_read, responses_write = os.pipe()
+    try:
+        with tempfile.TemporaryFile() as stdin_file:
+            stdin_file.write(stdin.encode())
+            stdin_file.seek(0)
+            server = _spawn(
+                'serve', [str(requests_read), str(responses_write)], code_dir, limits,
+                stdin=stdin_file, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                pass_fds=(requests_read, responses_write),
+            )
+        try:
+            check = _spawn(
+                'check', [str(requests_write), str(responses_read), script], os.path.dirname(script), limits,
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                pass_fds=(requests_write, responses_read),
+            )
+        except OSError:
+            _kill_session(server.pid)
+            server.wait()
+            raise
+    finally:
+        for fd in (requests_read, requests_write, responses_read, responses_write):
+            os.close(fd)
+    try:
+        stdout, stderr = check.communicate(timeout=limits.wall_seconds)
+    except subprocess.TimeoutExpired:
+        _kill_session(check.pid)
+        check.communicate()
+        return None, '', ''
+    finally:
+        server_code = server.poll()
+        _kill_session(server.pid)
+        server.wait()
+    returncode, stdout, stderr = _output(check, stdout, stderr, limits)
+    if returncode and server_code is not None and server_code < 0:
+        returncode = server_code
+    return returncode, stdout, stderr
+
+
+def _hand_over(code_dir):
+    # پوشه‌ی کد، قبل از اجرای هر کدی، یک بار مال کاربر sandbox می‌شود. اسکریپت‌های check در پوشه‌ی
+    # جدای root می‌مانند تا اجرای یک تست نتواند تست بعدی را عوض کند
+    user = sandbox_user()
+    if user is None:
+        return
+    for folder, _, files in os.walk(code_dir):
+        os.chown(folder, *user, follow_symlinks=False)
+        for name in files:
+            os.chown(os.path.join(folder, name), *user, follow_symlinks=False)
+
+
+def _extract_zip(path, workdir):
+    with zipfile.ZipFile(path) as archive:
+        members = archive.infolist()
+        if len(members) > MAX_ZIP_MEMBERS or sum(m.file_size for m in members) > MAX_UNZIPPED_BYTES:
+            raise ValueError('فایل ZIP بیش از حد بزرگ است.')
+        root = os.path.realpath(workdir)
+        for member in members:
+            target = os.path.realpath(os.path.join(workdir, member.filename))
+            if os.path.commonpath([root, target]) != root:
+                raise ValueError('مسیر نامعتبر در فایل ZIP.')
+        archive.extractall(workdir)
+
+    # فایل اصلی: solution.py یا main.py، یا تنها فایل .py موجود
+    python_files = []
+    for folder, _, files in os.walk(workdir):
+        python_files.extend(os.path.join(folder, name) for name in files if name.endswith('.py'))
+    for preferred in (SOLUTION_MODULE + '.py', 'main.py'):
+        for candidate in python_files:
+            if os.path.basename(candidate) == preferred:
+                return candidate
+    if len(python_files) == 1:
+        return python_files[0]
+    raise ValueError('فایل اصلی (main.py یا solution.py) در ZIP پیدا نشد.')
+
+
+def prepare_workdir(source_path, original_name, workdir):
+    """کد ارسال را در workdir می‌گذارد و پوشه‌ی حاوی solution.py را برمی‌گرداند."""
+    name = (original_name or source_path).lower()
+    if name.endswith('.zip'):
+        main = _extract_zip(source_path, workdir)
+        folder = os.path.dirname(main)
+        if os.path.basename(main) != SOLUTION_MODULE + '.py':
+            shutil.copyfile(main, os.path.join(folder, SOLUTION_MODULE + '.py'))
+        return folder
+    if name.endswith('.py'):
+        shutil.copyfile(source_path, os.path.join(workdir, SOLUTION_MODULE + '.py'))
+        return workdir
+    raise ValueError('فقط فایل‌های .py و .zip به صورت خودکار نمره‌دهی می‌شوند.')
+
+
+def _normalize(output):
+    return '\n'.join(line.rstrip() for line in output.strip().splitlines())
+
+
+def _write_checks(tests, checks_dir):
+    """مسیر اسکریپت هر تست: solution.py برای ورودی/خروجی، فایل جدا برای check."""
+    os.mkdir(checks_dir, 0o755)
+    scripts = []
+    for number, test in enumerate(tests, start=1):
+        if test['kind'] == ExerciseTestCase.KIND_CHECK:
+            script = os.path.join(checks_dir, f'check_{number}.py')
+            with open(script, 'w', encoding='utf-8') as handle:
+                handle.write(f'from {SOLUTION_MODULE} import *\n{test["check_code"]}\n')
+            os.chmod(script, 0o644)
+        else:
+            script = SOLUTION_MODULE + '.py'
+        scripts.append(script)
+    return scripts
+
+
+def run_test(folder, test, limits, script):
+    """(قبول شد؟، توضیح کوتاه)"""
+    run = run_check if test['kind'] == ExerciseTestCase.KIND_CHECK else run_sandboxed
+    returncode, stdout, stderr = run(folder, script, test['stdin'], limits)
+    if returncode is None:
+        return False, 'زمان اجرا تمام شد'
+    if returncode < 0:
+        return False, 'اجرا به دلیل محدودیت منابع متوقف شد'
+    if returncode != 0:
+        last_line = stderr.strip().splitlines()[-1] if stderr.strip() else f'کد خروج {returncode}'
+        return False, last_line[:200]
+    if test['kind'] == ExerciseTestCase.KIND_IO and _normalize(stdout) != _normalize(test['expected_output']):
+        return False, 'خروجی با خروجی مورد انتظار یکسان نیست'
+    return True, ''
+
+
+def grade_file(source_path, original_name, tests, limits):
+    """(score, feedback) برای یک فایل؛ بدون دسترسی به دیتابیس تا در thread اجرا شود."""
+    workdir = tempfile.mkdtemp(prefix='autograde-')
+    try:
+        # کاربر sandbox فقط اجازه‌ی عبور از پوشه‌ی کار را دارد، نه فهرست کردن آن
+        os.chmod(workdir, 0o711)
+        code_dir = os.path.join(workdir, 'code')
+        os.mkdir(code_dir)
+        try:
+            folder = prepare_workdir(source_path, original_name, code_dir)
+        except (ValueError, zipfile.BadZipFile) as error:
+            return 0, f'❌ {error}'
+        scripts = _write_checks(tests, os.path.join(workdir, 'checks'))
+        _hand_over(code_dir)
+
+        total = sum(test['weight'] for test in tests) or 1
+        earned = 0
+        lines = []
+        for number, (test, script) in enumerate(zip(tests, scripts), start=1):
+            passed, detail = run_test(folder, test, limits, script)
+            if passed:
+                earned += test['weight']
+                lines.append(f'✅ تست {number}')
+            else:
+                lines.append(f'❌ تست {number}: {detail}')
+        if len(lines) > MAX_FEEDBACK_LINES:
+            lines = lines[:MAX_FEEDBACK_LINES] + [f'... و {len(lines) - MAX_FEEDBACK_LINES} تست دیگر']
+        score = round(100 * earned / total)
+        return score, f'نمره‌ی خودکار: {score} / 100\n' + '\n'.join(lines)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _has_tests():
+    return Exists(ExerciseTestCase.objects.filter(exercise=OuterRef('exercise')))
+
+
+def manual_score():
+    # نمره‌ای که نمره‌دهی خودکار ننوشته (یا دستیار آموزشی بعدا عوضش کرده)
+    return Q(score__isnull=False) & (Q(autograded_score__isnull=True) | ~Q(score=F('autograded_score')))
+
+
+def gradable_submissions(queryset=None, regrade=False, overwrite_manual=False):
+    queryset = Submission.objects.all() if queryset is None else queryset
+    queryset = queryset.filter(_has_tests())
+    if not regrade:
+        queryset = queryset.filter(score__isnull=True)
+    elif not overwrite_manual:
+        queryset = queryset.exclude(manual_score())
+    return queryset
+
+
+def queue_submissions(queryset, overwrite_manual=False):
+    """ارسال‌ها را برای worker در صف می‌گذارد (بدون اجرای کد در درخواست ادمین)؛ تعداد را برمی‌گرداند."""
+    request = Submission.AUTOGRADE_OVERWRITE if overwrite_manual else Submission.AUTOGRADE_QUEUED
+    gradable = gradable_submissions(queryset, regrade=True, overwrite_manual=overwrite_manual)
+    return gradable.update(autograde_request=request)
+
+
+def queued_submissions():
+    """
+    ارسال‌های در صف. درخواست‌هایی که از زمان صف شدن نمره‌ی دستی گرفته‌اند (یا تمرینشان دیگر
+    تستی ندارد) از صف بیرون می‌روند.
+    """
+    queued = Submission.objects.exclude(autograde_request='')
+    queued.filter(
+        (Q(autograde_request=Submission.AUTOGRADE_QUEUED) & manual_score()) | ~_has_tests()
+    ).update(autograde_request='')
+    return queued
+
+
+def _tests_for(exercise_ids, cache):
+    missing = set(exercise_ids) - cache.keys()
+    if missing:
+        for exercise_id in missing:
+            cache[exercise_id] = []
+        tests = ExerciseTestCase.objects.filter(exercise_id__in=missing).values(
+            'exercise_id', 'kind', 'stdin', 'expected_output', 'check_code', 'weight',
+        )
+        for test in tests:
+            cache[test['exercise_id']].append(test)
+    return cache
+
+
+class GradingStats:
+    def __init__(self, workers):
+        self.workers = workers
+        self.graded = 0
+        self.executed = 0   # فایل‌هایی که واقعا اجرا شدند (بعد از حذف تکراری‌ها)
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def per_second(self):
+        return self.graded / self.elapsed if self.elapsed else 0.0
+
+    def per_core_second(self):
+        return self.per_second() / self.workers
+
+
+def grade_submissions(queryset, workers=None, limits=None, batch_size=WRITE_BATCH_SIZE, progress=None):
+    """
+    ارسال‌های queryset را نمره‌دهی و در score/feedback ذخیره می‌کند.
+    progress(stats) بعد از ذخیره‌ی هر دسته صدا زده می‌شود.
+    """
+    from .gradebook import bump_gradebook
+
+    if not supports_sandbox():
+        raise RuntimeError(SANDBOX_UNAVAILABLE)
+    workers = workers or os.cpu_count() or 1
+    limits = limits or SandboxLimits()
+    stats = GradingStats(workers)
+    tests_cache = {}
+
+    submissions = queryset.select_related('exercise').only(
+        'pk', 'submitted_file', 'original_name', 'sha256', 'exercise__course_id', 'exercise_id',
+    ).order_by('pk')
+
+    def grade(job):
+        path, original_name, tests = job
+        try:
+            return grade_file(path, original_name, tests, limits)
+        except OSError as error:
+            return None, f'❌ خطا در اجرای تست‌ها: {error}'
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        for submission in submissions.iterator(chunk_size=batch_size):
+            batch.append(submission)
+            if len(batch) >= batch_size:
+                _grade_batch(batch, pool, grade, tests_cache, stats, bump_gradebook)
+                batch = []
+                if progress:
+                    progress(stats)
+        if batch:
+            _grade_batch(batch, pool, grade, tests_cache, stats, bump_gradebook)
+            if progress:
+                progress(stats)
+    return stats
+
+
+def _grade_batch(batch, pool, grade, tests_cache, stats, bump_gradebook):
+    _tests_for({submission.exercise_id for submission in batch}, tests_cache)
+
+    jobs = {}
+    for submission in batch:
+        key = (submission.exercise_id, submission.sha256 or f'pk:{submission.pk}')
+        if key not in jobs:
+            jobs[key] = (
+                submission.submitted_file.path,
+                submission.original_name or submission.submitted_file.name,
+                tests_cache[submission.exercise_id],
+            )
+    keys = list(jobs)
+    results = dict(zip(keys, pool.map(grade, [jobs[key] for key in keys])))
+    stats.executed += len(keys)
+
+    changed = []
+    failed = []
+    for submission in batch:
+        score, feedback = results[(submission.exercise_id, submission.sha256 or f'pk:{submission.pk}')]
+        if score is None:
+            stats.failed += 1
+            failed.append(submission.pk)
+            continue
+        submission.score = score
+        submission.autograded_score = score
+        submission.feedback = feedback
+        submission.autograde_request = ''
+        changed.append(submission)
+
+    with transaction.atomic():
+        Submission.objects.bulk_update(changed, ['score', 'autograded_score', 'feedback', 'autograde_request'])
+        # اجرای ناموفق از صف بیرون می‌رود تا worker آن را بی‌پایان تکرار نکند
+        Submission.objects.filter(pk__in=failed).exclude(autograde_request='').update(autograde_request='')
+        course_ids = {submission.exercise.course_id for submission in changed}
+        # bulk_update سیگنال نمی‌فرستد
+        transaction.on_commit(lambda: bump_gradebook(*course_ids))
+    stats.graded += len(changed)
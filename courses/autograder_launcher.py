@@ -0,0 +1,290 @@
+"""
+برنامه‌ای که داخل sandbox اجرا می‌شود؛ import نمی‌شود و autograder متن آن را با python -I -c اجرا می‌کند.
+
+    run    محدودیت‌ها script              کد دانشجو به عنوان __main__ (تست ورودی/خروجی)
+    serve  محدودیت‌ها in out              solution را import می‌کند و درخواست‌های پروسه‌ی check را جواب می‌دهد
+    check  محدودیت‌ها in out script       اسکریپت check را با ماژول نماینده به جای solution اجرا می‌کند
+
+کد check و کد دانشجو در دو پروسه‌ی جدا اجرا می‌شوند و فقط مقدارهای ساده (عدد، رشته، bytes، لیست،
+tuple، set و dict) و شناسه‌ی شیءهای دیگر را به صورت JSON رد و بدل می‌کنند. پروسه‌ی check قبل از
+import شدن solution خودش را non-dumpable می‌کند تا کد دانشجو (با همان کاربر) نتواند ptrace کند یا به
+/proc/pid/mem و fd های آن دست بزند؛ پس نتیجه‌ی check (کد خروج آن) قابل جعل نیست.
+"""
+import builtins
+import importlib
+import json
+import operator
+import os
+import resource
+import runpy
+import sys
+import types
+
+
+def limit(cpu, memory, fsize, nproc):
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+
+
+# --- کدگذاری مقدارها: None، bool، عدد و رشته خودشان؛ بقیه dict تک‌کلیدی با برچسب نوع ---
+
+PLAIN_TYPES = (bool, int, float, str)
+CONTAINERS = {list: 'l', tuple: 't', set: 's', frozenset: 'f'}
+BUILDERS = {'l': list, 't': tuple, 's': set, 'f': frozenset}
+
+
+def encode(value, reference):
+    # type دقیق: زیرکلاس int یا str (با __eq__ دلخواه) مقدار ساده حساب نمی‌شود
+    kind = type(value)
+    if value is None or kind in PLAIN_TYPES:
+        return value
+    if kind in CONTAINERS:
+        return {CONTAINERS[kind]: [encode(item, reference) for item in value]}
+    if kind is dict:
+        return {'d': [[encode(key, reference), encode(item, reference)] for key, item in value.items()]}
+    if kind is bytes:
+        return {'b': value.hex()}
+    return {'r': reference(value)}
+
+
+def decode(data, resolve):
+    if data is None or type(data) in PLAIN_TYPES:
+        return data
+    if type(data) is not dict or len(data) != 1:
+        raise ValueError('invalid message')
+    (tag, body), = data.items()
+    if tag in BUILDERS:
+        return BUILDERS[tag](decode(item, resolve) for item in body)
+    if tag == 'd':
+        return {decode(key, resolve): decode(item, resolve) for key, item in body}
+    if tag == 'b':
+        return bytes.fromhex(body)
+    if tag == 'r':
+        return resolve(body)
+    raise ValueError('invalid message')
+
+
+# --- پروسه‌ی کد دانشجو ---
+
+OPERATIONS = {
+    'getattr': getattr,
+    'call': lambda function, args, kwargs: function(*args, **kwargs),
+    'len': len,
+    'getitem': operator.getitem,
+    'contains': operator.contains,
+    'list': list,
+    'bool': bool,
+    'repr': repr,
+    'str': str,
+    'hash': hash,
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+}
+
+
+def serve(requests, responses):
+    objects = []
+
+    def reference(value):
+        objects.append(value)
+        return len(objects) - 1
+
+    def reply(**message):
+        try:
+            line = json.dumps(message)
+        except (TypeError, ValueError, RecursionError) as error:
+            line = json.dumps({'error': [type(error).__name__, str(error)]})
+        responses.write(line + '\n')
+        responses.flush()
+
+    # solution تا درخواست اول پروسه‌ی check (که آن موقع non-dumpable شده) import نمی‌شود
+    if not requests.readline():
+        return
+    sys.path.insert(0, os.getcwd())
+    try:
+        module = importlib.import_module('solution')
+        names = getattr(module, '__all__', None)
+        if names is None:
+            names = [name for name in vars(module) if not name.startswith('_')]
+        objects.append(module)
+        reply(ok=encode(list(names), reference))
+    except BaseException as error:
+        reply(error=[type(error).__name__, str(error)[:500]])
+        return
+
+    for line in requests:
+        try:
+            request = json.loads(line)
+            args = decode(request['args'], objects.__getitem__)
+            reply(ok=encode(OPERATIONS[request['op']](*args), reference))
+        except BaseException as error:
+            reply(error=[type(error).__name__, str(error)[:500]])
+
+
+# --- پروسه‌ی check ---
+
+class SolutionError(Exception):
+    """خطای کد دانشجو که نوعش در builtins نیست، یا پروسه‌ی دانشجو که بسته شد."""
+
+
+EXITED = 'برنامه‌ی دانشجو قبل از تمام شدن کد بررسی خارج شد'
+
+
+class Channel:
+    def __init__(self, requests, responses):
+        self.requests = requests
+        self.responses = responses
+
+    def request(self, op, *args):
+        def reference(value):
+            if type(value) is not Remote:
+                raise TypeError(f'only plain values can be passed to solution, not {type(value).__name__}')
+            return object.__getattribute__(value, '_ref')
+
+        try:
+            self.requests.write(json.dumps({'op': op, 'args': encode(list(args), reference)}) + '\n')
+            self.requests.flush()
+        except BrokenPipeError:
+            pass
+        line = self.responses.readline()
+        if not line:
+            raise SolutionError(EXITED)
+        message = json.loads(line)
+        if 'error' in message:
+            name, text = (str(part) for part in message['error'])
+            if name == 'SystemExit':
+                raise SolutionError(EXITED)
+            exception = getattr(builtins, name, None)
+            try:
+                if not (isinstance(exception, type) and issubclass(exception, Exception)):
+                    raise TypeError(name)
+                error = exception(text)
+            except Exception:   # نوع ناشناخته یا سازنده‌ای که یک متن نمی‌پذیرد (مثلا UnicodeDecodeError)
+                error = SolutionError(f'{name}: {text}')
+            raise error
+        return decode(message['ok'], lambda ref: Remote(self, int(ref)))
+
+
+class Remote:
+    """نماینده‌ی شیئی در پروسه‌ی دانشجو؛ هر عمل روی آن یک درخواست است."""
+    __slots__ = ('_channel', '_ref')
+
+    def __init__(self, channel, ref):
+        object.__setattr__(self, '_channel', channel)
+        object.__setattr__(self, '_ref', ref)
+
+    def _ask(self, op, *args):
+        return object.__getattribute__(self, '_channel').request(op, self, *args)
+
+    def __getattr__(self, name):
+        return self._ask('getattr', name)
+
+    def __call__(self, *args, **kwargs):
+        return self._ask('call', args, kwargs)
+
+    def __len__(self):
+        return self._ask('len')
+
+    def __getitem__(self, key):
+        return self._ask('getitem', key)
+
+    def __contains__(self, item):
+        return self._ask('contains', item)
+
+    def __iter__(self):
+        return iter(self._ask('list'))
+
+    def __bool__(self):
+        return self._ask('bool')
+
+    def __repr__(self):
+        return self._ask('repr')
+
+    def __str__(self):
+        return self._ask('str')
+
+    def __hash__(self):
+        return self._ask('hash')
+
+    def __eq__(self, other):
+        return self._ask('eq', other)
+
+    def __ne__(self, other):
+        return self._ask('ne', other)
+
+    def __lt__(self, other):
+        return self._ask('lt', other)
+
+    def __le__(self, other):
+        return self._ask('le', other)
+
+    def __gt__(self, other):
+        return self._ask('gt', other)
+
+    def __ge__(self, other):
+        return self._ask('ge', other)
+
+
+def undumpable():
+    # PR_SET_DUMPABLE=0؛ بدون آن پروسه‌ی دانشجو با همان کاربر می‌توانست حافظه‌ی این پروسه را عوض کند
+    if sys.platform.startswith('linux'):
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.prctl(4, 0, 0, 0, 0) != 0:
+            raise OSError(ctypes.get_errno(), 'prctl(PR_SET_DUMPABLE) failed')
+
+
+def check(requests, responses, script):
+    channel = Channel(requests, responses)
+    try:
+        names = channel.request('import')
+    except SolutionError as error:
+        sys.exit(str(error))
+    except Exception as error:
+        # خطای import شدن solution (مثلا SyntaxError یا MemoryError) آخرین خط بازخورد می‌شود
+        sys.exit(f'{type(error).__name__}: {error}')
+    root = Remote(channel, 0)
+
+    def module_getattr(name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(root, name)
+
+    module = types.ModuleType('solution')
+    module.__all__ = [name for name in names if type(name) is str and name.isidentifier()]
+    module.__getattr__ = module_getattr
+    sys.modules['solution'] = module
+    runpy.run_path(script, run_name='__main__')
+
+
+def main():
+    mode = sys.argv[1]
+    limits = [int(value) for value in sys.argv[2:6]]
+    args = sys.argv[6:]
+    if mode == 'check':
+        undumpable()
+    limit(*limits)
+    if mode == 'run':
+        sys.argv = args
+        # با -I پوشه‌ی ارسال در sys.path نیست و resource.py یا runpy.py دانشجو جای ماژول واقعی را
+        # نمی‌گیرد؛ پوشه بعد از import ها اضافه می‌شود
+        sys.path.insert(0, os.getcwd())
+        runpy.run_path(args[0], run_name='__main__')
+        return
+    requests_fd, responses_fd = int(args[0]), int(args[1])
+    if mode == 'serve':
+        serve(os.fdopen(requests_fd, 'r', encoding='utf-8'), os.fdopen(responses_fd, 'w', encoding='utf-8'))
+    else:
+        sys.argv = args[2:]
+        check(os.fdopen(requests_fd, 'w', encoding='utf-8'), os.fdopen(responses_fd, 'r', encoding='utf-8'), args[2])
+
+
+if __name__ == '__main__':
+    main()
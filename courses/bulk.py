@@ -0,0 +1,26 @@
+"""
+حذف گروهی بدون خواندن ردیف‌ها.
+
+وقتی برای مدلی گیرنده‌ی pre_delete/post_delete ثبت شده، QuerySet.delete() همه‌ی ردیف‌ها را
+می‌خواند و برای هر کدام سیگنال می‌فرستد. delete_rows فقط یک DELETE می‌فرستد؛ فراخواننده باید
+مطمئن باشد ردیف دیگری به این ردیف‌ها کلید خارجی ندارد (یا قبلا حذف شده) و کار گیرنده‌ها را
+خودش انجام دهد.
+"""
+from django.db import connections
+from django.db.models import F
+
+
+def delete_rows(queryset):
+    """یک DELETE ... WHERE pk IN (زیرکوئری queryset)؛ تعداد ردیف‌های حذف شده را برمی‌گرداند."""
+    meta = queryset.model._meta
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    subquery, params = queryset.order_by().values(pk_value=F('pk')).query.sql_with_params()
+    # جدول مشتق شده (AS ids) لازم است: MySQL در DELETE زیرکوئری روی همان جدول را نمی‌پذیرد
+    sql = (
+        f'DELETE FROM {quote(meta.db_table)} WHERE {quote(meta.pk.column)} IN '
+        f'(SELECT {quote("pk_value")} FROM ({subquery}) AS {quote("ids")})'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
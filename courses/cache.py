@@ -0,0 +1,315 @@
+"""
+لایه‌ی کش خواندنی (read-through) برای داده‌هایی که به‌ندرت تغییر می‌کنند؛
+مثل تنظیمات سایت و فهرست دوره‌های قابل انتخاب در ثبت‌نام.
+
+بک‌اند از تنظیم SITE_CACHE_BACKEND خوانده می‌شود و با سیگنال‌های
+post_save/post_delete (در courses/signals.py) باطل می‌شود.
+
+همه‌ی داده‌های کش‌شده از دیتابیس اصلی خوانده می‌شوند (using(DEFAULT_DB_ALIAS))؛ replica ای که
+هنوز تغییر را دریافت نکرده، داده‌ی قدیمی را برای ساعت‌ها زیر کلید تازه کش می‌کرد.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils.module_loading import import_string
+
+
+# برای تشخیص «در کش نیست» از «مقدار None در کش است»
+MISSING = object()
+
+SITE_SETTING_KEY = 'site_setting'
+SIGNUP_CATALOG_KEY = 'signup_catalog'
+
+
+class LRUBackend:
+    """کش داخل حافظه‌ی هر پروسه با سقف تعداد و عمر محدود."""
+
+    def __init__(self, max_entries=256, timeout=30):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                return MISSING
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """
+    کش مشترک بین پروسه‌ها از طریق CACHES جنگو.
+    فقط وقتی واقعا مشترک است که CACHES روی Redis یا memcached باشد؛ LocMemCache مال هر پروسه است
+    و باطل شدن به workerهای دیگر نمی‌رسد، پس timeout نباید None باشد.
+    """
+
+    def __init__(self, alias='default', timeout=300, prefix='lms'):
+        self.alias = alias
+        self.timeout = timeout
+        self.prefix = prefix
+        self._keys = set()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get(self, key):
+        return self.cache.get(self._key(key), MISSING)
+
+    def set(self, key, value):
+        self._keys.add(key)
+        self.cache.set(self._key(key), value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+    def clear(self):
+        # فقط کلیدهای همین لایه؛ cache.clear() کل کش پیش‌فرض (نسخه‌ها، کارت‌ها، ...) را پاک می‌کرد
+        self.cache.delete_many([self._key(key) for key in self._keys])
+        self._keys.clear()
+
+
+class TieredBackend:
+    """
+    اول LRU همین پروسه و بعد کش جنگو.
+    با کش مشترک، عمر کوتاه LRU تضمین می‌کند پروسه‌های دیگر بعد از باطل‌شدن حداکثر local_timeout
+    ثانیه داده‌ی کهنه ببینند؛ با LocMemCache این سقف timeout لایه‌ی دوم است.
+    """
+
+    def __init__(self, max_entries=256, local_timeout=30, alias='default', timeout=300):
+        self.local = LRUBackend(max_entries=max_entries, timeout=local_timeout)
+        self.shared = DjangoCacheBackend(alias=alias, timeout=timeout)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is MISSING:
+            value = self.shared.get(key)
+            if value is not MISSING:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.shared.set(key, value)
+        self.local.set(key, value)
+
+    def delete(self, key):
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+
+class ReadThroughCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        value = self.backend.get(key)
+        if value is not MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value = loader()
+        self.backend.set(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
+
+
+def _build_backend():
+    config = dict(getattr(settings, 'SITE_CACHE_BACKEND', {}))
+    backend_path = config.pop('BACKEND', 'courses.cache.TieredBackend')
+    options = {key.lower(): value for key, value in config.items()}
+    return import_string(backend_path)(**options)
+
+
+_site_cache = None
+
+
+def get_site_cache():
+    global _site_cache
+    if _site_cache is None:
+        _site_cache = ReadThroughCache(_build_backend())
+    return _site_cache
+
+
+# --- داده‌های کش‌شده ---
+
+def get_site_setting():
+    from .models import SiteSetting
+    return get_site_cache().get_or_load(SITE_SETTING_KEY, lambda: SiteSetting.objects.using(DEFAULT_DB_ALIAS).first())
+
+
+def get_signup_catalog():
+    """لیست (id, عنوان) دوره‌های قابل انتخاب در فرم ثبت‌نام."""
+    from .models import Course
+
+    def load():
+        return [
+            (course.pk, str(course))
+            for course in Course.objects.using(DEFAULT_DB_ALIAS).filter(is_active_for_signup=True).only('pk', 'title')
+        ]
+
+    return get_site_cache().get_or_load(SIGNUP_CATALOG_KEY, load)
+
+
+def invalidate_site_setting():
+    get_site_cache().invalidate(SITE_SETTING_KEY)
+
+
+def invalidate_signup_catalog():
+    get_site_cache().invalidate(SIGNUP_CATALOG_KEY)
+
+
+# --- شماره نسخه (version stamp) برای کلیدهای کش ---
+# به‌جای پاک کردن تک‌تک کلیدها، نسخه بالا می‌رود و کلیدهای قدیمی خودشان منقضی می‌شوند.
+
+def _version_key(name):
+    return f'lms:version:{name}'
+
+
+def _initial_version():
+    # بعد از خالی شدن کش، نسخه هرگز به عدد قبلی برنمی‌گردد
+    return time.time_ns() // 1000
+
+
+def get_versions(*names):
+    cache = caches['default']
+    keys = {_version_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, name in keys.items():
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+        versions[name] = found[key]
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    cache = caches['default']
+    for name in names:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def user_version_name(user_id):
+    return f'user:{user_id}'
+
+
+# --- لیست تمرین‌های هر دوره (صفحه‌ی course_detail) ---
+# هر مسیری که تمرین را می‌سازد، تغییر می‌دهد یا قفلش را عوض می‌کند (حتی update و bulk_create که
+# سیگنال نمی‌فرستند) باید bump_exercises را صدا بزند؛ آن هم بعد از commit، وگرنه خواننده‌ای که
+# پیش از commit می‌رسد داده‌ی قدیمی را زیر نسخه‌ی جدید کش می‌کند.
+
+EXERCISE_LIST_TIMEOUT = 60 * 60
+EXERCISE_LIST_BUILD_TIMEOUT = 10
+
+
+def exercises_version_name(course_id):
+    return f'exercises:{course_id}'
+
+
+def bump_exercises(*course_ids):
+    bump_version(*[exercises_version_name(course_id) for course_id in set(course_ids)])
+
+
+def _load_course_exercises(course_id):
+    from .models import Exercise
+    return list(
+        Exercise.objects.using(DEFAULT_DB_ALIAS).filter(course_id=course_id).order_by('order')
+        .values('id', 'order', 'title', 'is_locked')
+    )
+
+
+def get_course_exercises(course_id):
+    """
+    لیست (id, order, title, is_locked) تمرین‌های دوره.
+    بعد از bump فقط یک درخواست لیست را دوباره می‌سازد؛ بقیه تا آماده شدن آن چند میلی‌ثانیه
+    آخرین لیست ساخته شده را می‌گیرند تا هزاران دانشجو هم‌زمان سراغ دیتابیس نروند.
+    """
+    cache = caches['default']
+    version = get_version(exercises_version_name(course_id))
+    key = f'course_exercises:{course_id}:{version}'
+    latest_key = f'course_exercises:{course_id}:latest'
+
+    exercises = cache.get(key)
+    if exercises is not None:
+        return exercises
+    if not cache.add(f'{key}:build', True, EXERCISE_LIST_BUILD_TIMEOUT):
+        exercises = cache.get(latest_key)
+        if exercises is not None:
+            return exercises
+    exercises = _load_course_exercises(course_id)
+    cache.set_many({key: exercises, latest_key: exercises}, EXERCISE_LIST_TIMEOUT)
+    return exercises
+
+
+def warm_site_cache():
+    """هنگام بالا آمدن هر worker صدا زده می‌شود تا اولین درخواست کوئری نزند."""
+    try:
+        invalidate_site_setting()
+        invalidate_signup_catalog()
+        get_site_setting()
+        get_signup_catalog()
+    except DatabaseError:
+        # دیتابیس هنوز آماده نیست (مثلا قبل از migrate)؛ اولین درخواست کش را پر می‌کند
+        pass
@@ -1,6 +1,6 @@
-from .models import SiteSetting
+from .cache import get_site_setting
 
 def website_settings(request):
-    # اولین ردیف تنظیمات را می‌گیرد
-    setting = SiteSetting.objects.first()
+    # تنظیمات سایت از کش خوانده می‌شود (با ذخیره در ادمین باطل می‌شود)
+    setting = get_site_setting()
     return {'site_setting': setting}
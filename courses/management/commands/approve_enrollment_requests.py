@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from courses.enrollment import approve_requests
+from courses.models import EnrollmentRequest
+
+
+class Command(BaseCommand):
+    help = "Approve pending enrollment requests in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only approve requests for this course id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pending = EnrollmentRequest.objects.all()
+        if options['courses']:
+            pending = pending.filter(course_id__in=options['courses'])
+
+        total = pending.count()
+        done = 0
+        last_pk = 0
+        while True:
+            # هر تکه در تراکنش جداگانه؛ ترتیب بر اساس pk تا تکه‌ها هم‌پوشانی نداشته باشند
+            chunk_ids = list(
+                pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not chunk_ids:
+                break
+            last_pk = chunk_ids[-1]
+
+            approved = approve_requests(EnrollmentRequest.objects.filter(pk__in=chunk_ids))
+            done += sum(approved.values())
+            self.stdout.write(f"{done}/{total} requests approved")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{done} enrollment requests approved")
+        )
@@ -0,0 +1,92 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.autograder import (
+    SANDBOX_UNAVAILABLE, SandboxLimits, gradable_submissions, grade_submissions, queued_submissions, supports_sandbox,
+)
+from courses.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Run exercise test cases against ungraded submissions in parallel sandboxes and store score/feedback"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Only grade submissions of this course id')
+        parser.add_argument('--exercise', type=int, help='Only grade submissions of this exercise id')
+        parser.add_argument('--regrade', action='store_true',
+                            help='Also grade submissions that already have an automatic score')
+        parser.add_argument('--overwrite-manual', action='store_true',
+                            help='With --regrade, also replace scores a TA entered by hand')
+        parser.add_argument('--queued', action='store_true',
+                            help='Grade the submissions queued from the admin instead')
+        parser.add_argument('--loop', action='store_true', help='With --queued, keep polling the queue')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Seconds to wait when the queue is empty (with --loop)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Submissions graded at once (default: number of CPU cores)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Scores written per bulk update')
+        parser.add_argument('--cpu-seconds', type=int, default=SandboxLimits.cpu_seconds)
+        parser.add_argument('--memory-mb', type=int, default=SandboxLimits.memory_mb)
+        parser.add_argument('--timeout', type=float, default=SandboxLimits.wall_seconds,
+                            help='Wall-clock seconds per test run')
+
+    def handle(self, *args, **options):
+        if not supports_sandbox():
+            raise CommandError(SANDBOX_UNAVAILABLE)
+        if options['loop'] and not options['queued']:
+            raise CommandError('--loop only works with --queued')
+
+        try:
+            while True:
+                graded = self._run_once(options)
+                if not options['loop']:
+                    break
+                if not graded:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
+
+    def _submissions(self, options):
+        if options['queued']:
+            submissions = queued_submissions()
+        else:
+            submissions = gradable_submissions(
+                Submission.objects.all(), regrade=options['regrade'], overwrite_manual=options['overwrite_manual'],
+            )
+        if options['course']:
+            submissions = submissions.filter(exercise__course_id=options['course'])
+        if options['exercise']:
+            submissions = submissions.filter(exercise_id=options['exercise'])
+        return submissions
+
+    def _run_once(self, options):
+        submissions = self._submissions(options)
+        total = submissions.count()
+        if not total and options['loop']:
+            return 0
+        self.stdout.write(f"{total} submissions to grade with {options['workers']} workers")
+        limits = SandboxLimits(
+            cpu_seconds=options['cpu_seconds'],
+            memory_mb=options['memory_mb'],
+            wall_seconds=options['timeout'],
+        )
+
+        def report(stats):
+            self.stdout.write(f"{stats.graded}/{total} graded, {stats.per_second():.1f}/s")
+
+        stats = grade_submissions(
+            submissions, workers=options['workers'], limits=limits,
+            batch_size=options['batch_size'], progress=report,
+        )
+
+        self.stdout.write(
+            f"{stats.executed} distinct files executed, {stats.failed} failed to run, "
+            f"{stats.elapsed:.1f}s, {stats.per_second():.2f} submissions/s, "
+            f"{stats.per_core_second():.2f} submissions/s per core"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{stats.graded} submissions graded")
+        )
+        return stats.graded + stats.failed
@@ -0,0 +1,180 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from courses.models import Course, CourseTemplate, Exercise, Submission
+from maintenance.benchmarks import scratch_database
+from users.models import CustomUser
+
+
+BENCH_EMAIL = 'asgi-bench@bench.invalid'
+BENCH_TEMPLATE_TITLE = 'ASGI benchmark'
+
+
+def _add_db_latency(latency):
+    # تاخیر شبکه تا دیتابیس (مثل دیتابیس مدیریت‌شده‌ی جدا از سرور برنامه) برای هر کوئری
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def on_connect(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(on_connect, weak=False)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare student page throughput of the WSGI app (sync views, gunicorn-style fixed workers) "
+        "against the ASGI app (async views) at high concurrency, in-process (runs in a temporary database)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+        parser.add_argument('--requests', type=int, default=600)
+        parser.add_argument('--concurrency', type=int, default=100, help='Simultaneous clients')
+        parser.add_argument('--wsgi-workers', type=int,
+                            help='Requests the WSGI server handles at once, gunicorn workers x threads '
+                                 '(default: --concurrency, the same concurrency the ASGI side gets)')
+        parser.add_argument('--db-latency-ms', type=float, default=2,
+                            help='Simulated network round trip added to every query')
+
+    def handle(self, *args, **options):
+        if options['wsgi_workers'] is None:
+            options['wsgi_workers'] = options['concurrency']
+        if options['mode'] == 'both':
+            for mode in ('wsgi', 'asgi'):
+                self._spawn(mode, options)
+            return
+
+        # ASYNC_VIEWS هنگام import شدن courses/urls.py خوانده می‌شود، پس هر حالت در پروسه‌ی جدا اجرا می‌شود
+        if settings.ASYNC_VIEWS != (options['mode'] == 'asgi'):
+            raise CommandError('Run with ASYNC_VIEWS=True for --mode asgi and ASYNC_VIEWS=False for --mode wsgi')
+
+        with scratch_database():
+            paths, cookie = self._prepare()
+            if options['db_latency_ms']:
+                _add_db_latency(options['db_latency_ms'] / 1000)
+            urls = [paths[index % len(paths)] for index in range(options['requests'])]
+
+            if options['mode'] == 'wsgi':
+                elapsed, statuses = self._run_wsgi(urls, cookie, options['wsgi_workers'])
+                label = f"WSGI, {options['wsgi_workers']} workers, sync views"
+            else:
+                elapsed, statuses = asyncio.run(self._run_asgi(urls, cookie, options['concurrency']))
+                label = 'ASGI, async views'
+
+        errors = sum(1 for status in statuses if status != 200)
+        self.stdout.write(
+            f"{label:34} {len(urls) / elapsed:8.1f} req/s   {elapsed / len(urls) * 1000:7.2f} ms/req"
+            f"   {errors} non-200"
+        )
+
+    def _spawn(self, mode, options):
+        env = dict(os.environ, ASYNC_VIEWS='True' if mode == 'asgi' else 'False')
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_asgi', '--mode', mode,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            '--wsgi-workers', str(options['wsgi_workers']),
+            '--db-latency-ms', str(options['db_latency_ms']),
+        ]
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr)
+        self.stdout.write(result.stdout.strip().splitlines()[-1])
+
+    def _prepare(self):
+        user = CustomUser(email=BENCH_EMAIL, first_name='Bench', last_name='Student')
+        user.save()
+
+        template = CourseTemplate.objects.create(title=BENCH_TEMPLATE_TITLE, description='-')
+        course = Course.objects.create(template=template, course_number=1, title=BENCH_TEMPLATE_TITLE)
+        for order in range(1, 21):
+            Exercise.objects.create(
+                course=course, title=f'تمرین {order}', problem_statement='صورت سوال',
+                order=order, is_locked=False,
+            )
+        course.students.add(user)
+        exercise = course.exercises.order_by('order').first()
+        Submission.objects.bulk_create([
+            Submission(student=user, exercise=exercise, submitted_file=f'bench/{index}.py')
+            for index in range(5)
+        ])
+
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        paths = ['/courses/', f'/courses/{course.pk}/', f'/courses/exercise/{exercise.pk}/']
+        return paths, cookie
+
+    def _run_wsgi(self, urls, cookie, workers):
+        application = WSGIHandler()
+        statuses = []
+        lock = threading.Lock()
+
+        def call(path):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.errors': sys.stderr,
+            }
+            status = []
+            body = application(environ, lambda line, headers, exc_info=None: status.append(line))
+            for _ in body:
+                pass
+            body.close()
+            with lock:
+                statuses.append(int(status[0].split()[0]))
+
+        start = time.perf_counter()
+        # صف درخواست‌ها پشت تعداد ثابتی worker، مثل backlog در gunicorn
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(call, urls))
+        return time.perf_counter() - start, statuses
+
+    async def _run_asgi(self, urls, cookie, concurrency):
+        application = ASGIHandler()
+        statuses = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(path):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'server': ('localhost', 80),
+                'client': ('127.0.0.1', 50000),
+                'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            }
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                await application(scope, receive, send)
+            statuses.append(status[0])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call(path) for path in urls))
+        return time.perf_counter() - start, statuses
@@ -0,0 +1,208 @@
+import io
+import math
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from courses.management.commands.generate_demo_data import DEMO_DOMAIN
+from courses.models import Course, Exercise
+from maintenance import replicas
+from users.models import CustomUser
+
+
+ADMIN_EMAIL = f'load-admin@{DEMO_DOMAIN}'
+
+
+def percentile(sorted_values, fraction):
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def _session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main student and admin pages with concurrent clients and report "
+        "p50/p95/p99 latency and requests per second (run generate_demo_data first)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous clients')
+        parser.add_argument('--students', type=int, default=200, help='Distinct demo students to log in as')
+        parser.add_argument('--admin-share', type=float, default=0.1,
+                            help='Fraction of requests that go to admin pages')
+        parser.add_argument('--base-url',
+                            help='Benchmark a running server (e.g. http://127.0.0.1:8000) instead of the in-process WSGI app')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        student_targets = self._student_targets(options['students'])
+        admin_targets = self._admin_targets()
+
+        plan = []
+        for _ in range(options['requests']):
+            if self.random.random() < options['admin_share']:
+                plan.append(self.random.choice(admin_targets))
+            else:
+                plan.append(self.random.choice(self.random.choice(student_targets)))
+
+        if options['base_url']:
+            send = self._http_sender(options['base_url'].rstrip('/'))
+        else:
+            send = self._wsgi_sender()
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def call(target):
+            label, path, cookie = target
+            started = time.perf_counter()
+            status = send(path, cookie)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[label].append(elapsed)
+                if status != 200:
+                    errors[label] += 1
+
+        replicas.stats.clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(call, plan))
+        elapsed = time.perf_counter() - started
+
+        self._report(latencies, errors, elapsed, options)
+
+    def _student_targets(self, count):
+        students = list(
+            CustomUser.objects.filter(email__endswith='@' + DEMO_DOMAIN, courses_joined__isnull=False)
+            .distinct().order_by('pk')[:count]
+        )
+        if not students:
+            raise CommandError('No demo students found; run generate_demo_data first')
+
+        memberships = Course.students.through.objects.filter(customuser__in=students).values_list('customuser_id', 'course_id')
+        courses_of = defaultdict(list)
+        for student_id, course_id in memberships:
+            courses_of[student_id].append(course_id)
+        unlocked = defaultdict(list)
+        for exercise_id, course_id in Exercise.objects.filter(
+            course_id__in={course_id for _, course_id in memberships}, is_locked=False,
+        ).values_list('pk', 'course_id'):
+            unlocked[course_id].append(exercise_id)
+
+        targets = []
+        for student in students:
+            cookie = _session_cookie(student)
+            course_id = self.random.choice(courses_of[student.pk])
+            paths = [
+                ('course list', reverse('courses:course_list')),
+                ('course detail', reverse('courses:course_detail', args=[course_id])),
+            ]
+            if unlocked[course_id]:
+                paths.append(('exercise detail', reverse('courses:exercise_detail', args=[self.random.choice(unlocked[course_id])])))
+            targets.append([(label, path, cookie) for label, path in paths])
+        return targets
+
+    def _admin_targets(self):
+        admin = CustomUser.objects.filter(email=ADMIN_EMAIL).first()
+        if admin is None:
+            admin = CustomUser.objects.create_superuser(
+                email=ADMIN_EMAIL, username='load-admin', password=None, first_name='Load', last_name='Admin',
+            )
+        cookie = _session_cookie(admin)
+        course = Course.objects.filter(students__email__endswith='@' + DEMO_DOMAIN).order_by('pk').first()
+        submissions = reverse('admin:courses_submission_changelist')
+        paths = [
+            ('admin submissions', submissions),
+            ('admin submissions by course', f'{submissions}?exercise__course__id__exact={course.pk}'),
+            ('admin submissions search', f'{submissions}?q=Ahmadi'),
+            ('admin courses', reverse('admin:courses_course_changelist')),
+            ('admin users', reverse('admin:users_customuser_changelist')),
+            ('admin enrollment requests', reverse('admin:courses_enrollmentrequest_changelist')),
+            ('admin gradebook', reverse('admin:courses_course_gradebook', args=[course.pk])),
+        ]
+        return [(label, path, cookie) for label, path in paths]
+
+    def _wsgi_sender(self):
+        application = WSGIHandler()
+
+        def send(path, cookie):
+            path, _, query = path.partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.errors': sys.stderr,
+            }
+            status = []
+            body = application(environ, lambda line, headers, exc_info=None: status.append(line))
+            for _ in body:
+                pass
+            body.close()
+            return int(status[0].split()[0])
+        return send
+
+    def _http_sender(self, base_url):
+        # بدون دنبال کردن redirect تا ۳۰۲ (مثلا نشست نامعتبر) خطا حساب شود
+        class NoRedirect(urllib.request.HTTPRedirectHandler):
+            def redirect_request(self, *args, **kwargs):
+                return None
+
+        opener = urllib.request.build_opener(NoRedirect)
+
+        def send(path, cookie):
+            request = urllib.request.Request(base_url + path, headers={'Cookie': cookie})
+            try:
+                with opener.open(request, timeout=60) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as error:
+                return error.code
+            except OSError:
+                return 0
+        return send
+
+    def _report(self, latencies, errors, elapsed, options):
+        total = sum(len(values) for values in latencies.values())
+        target = options['base_url'] or 'in-process WSGI'
+        self.stdout.write(f"{total} requests against {target}, {options['concurrency']} concurrent clients\n")
+        self.stdout.write(f"{'page':30} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        everything = []
+        for label in sorted(latencies):
+            values = sorted(latencies[label])
+            everything.extend(values)
+            self.stdout.write(
+                f"{label:30} {len(values):6} {percentile(values, 0.5) * 1000:8.1f} "
+                f"{percentile(values, 0.95) * 1000:8.1f} {percentile(values, 0.99) * 1000:8.1f} {errors[label]:7}"
+            )
+        everything.sort()
+        self.stdout.write(
+            f"{'all':30} {total:6} {percentile(everything, 0.5) * 1000:8.1f} "
+            f"{percentile(everything, 0.95) * 1000:8.1f} {percentile(everything, 0.99) * 1000:8.1f} "
+            f"{sum(errors.values()):7}"
+        )
+        if not options['base_url']:
+            # خواندن‌ها در همین پروسه شمرده شده‌اند؛ برای سرور جدا، صفحه‌ی /admin/profiling/ را ببینید
+            split = ', '.join(f"{row['alias']} {row['share']:.0f}%" for row in replicas.stats.split())
+            self.stdout.write(f"reads by database: {split}")
+        self.stdout.write(self.style.SUCCESS(f"{total / elapsed:.1f} requests/s over {elapsed:.1f}s"))
@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from courses.media import serve_media
+from maintenance.benchmarks import scratch_media_root
+
+
+class _StaffUser:
+    is_authenticated = True
+    is_staff = True
+
+
+class Command(BaseCommand):
+    help = "Compare worker occupancy of django.views.static.serve against the permission-checked media view"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=50, help='Size of the generated test file')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # فایل آزمایشی در یک MEDIA_ROOT موقت ساخته می‌شود، نه در media واقعی
+        with scratch_media_root():
+            self._run(options)
+
+    def _run(self, options):
+        bench_dir = os.path.join(settings.MEDIA_ROOT, 'bench')
+        os.makedirs(bench_dir)
+        file_path = os.path.join(bench_dir, 'payload.zip')
+        with open(file_path, 'wb') as handle:
+            chunk = os.urandom(1024 * 1024)
+            for _ in range(options['size_mb']):
+                handle.write(chunk)
+
+        factory = RequestFactory()
+        path = 'bench/payload.zip'
+
+        def old_view():
+            return serve(factory.get('/media/' + path), path, document_root=settings.MEDIA_ROOT)
+
+        def new_view(**headers):
+            request = factory.get('/media/' + path, headers=headers)
+            request.user = _StaffUser()
+            return serve_media(request, path)
+
+        scenarios = [
+            ('static.serve (before)', old_view),
+            ('serve_media, FileResponse', new_view),
+            ('serve_media, Range 1MB', lambda: new_view(Range='bytes=0-1048575')),
+        ]
+        for label, view in scenarios:
+            self._report(label, view, options['repeat'])
+        with override_settings(MEDIA_SENDFILE_BACKEND='nginx'):
+            self._report('serve_media, X-Accel-Redirect', new_view, options['repeat'])
+
+    def _report(self, label, view, repeat):
+        # زمانی که worker درگیر است: از فراخوانی ویو تا فرستادن آخرین بایت بدنه‌ی پاسخ
+        timings = []
+        sent = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = view()
+            sent = sum(len(chunk) for chunk in response)
+            response.close()
+            timings.append(time.perf_counter() - start)
+
+        average_ms = sum(timings) / len(timings) * 1000
+        self.stdout.write(f"{label:32} {average_ms:9.2f} ms/request   {sent / 1024 / 1024:8.2f} MB through worker")
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Exercise
+from courses.similarity import index_pending, rebuild_exercise
+
+
+class Command(BaseCommand):
+    help = "Rebuild winnowing fingerprints and suspicious submission pairs for exercises"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exercise', type=int, action='append', dest='exercises',
+                            help='Exercise id to rebuild (can be repeated; default: all exercises with submissions)')
+        parser.add_argument('--course', type=int, help='Only exercises of this course id')
+        parser.add_argument('--pending', action='store_true',
+                            help='Index the submissions queued since the last run instead of rebuilding')
+        parser.add_argument('--loop', action='store_true', help='With --pending, keep polling the queue')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Seconds to wait when the queue is empty (with --loop)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Submissions indexed per batch')
+
+    def handle(self, *args, **options):
+        if options['loop'] and not options['pending']:
+            raise CommandError('--loop only works with --pending')
+        if options['pending']:
+            try:
+                while True:
+                    indexed = self._index_pending(options)
+                    if not options['loop']:
+                        break
+                    if not indexed:
+                        time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                self.stdout.write("Interrupted")
+            return
+
+        exercises = Exercise.objects.filter(submissions__isnull=False).distinct().order_by('pk')
+        if options['exercises']:
+            exercises = exercises.filter(pk__in=options['exercises'])
+        if options['course']:
+            exercises = exercises.filter(course_id=options['course'])
+
+        total_pairs = 0
+        for exercise_id in exercises.values_list('pk', flat=True):
+            start = time.perf_counter()
+            indexed, pairs = rebuild_exercise(exercise_id)
+            total_pairs += len(pairs)
+            self.stdout.write(
+                f"exercise {exercise_id}: {indexed} submissions indexed, {len(pairs)} suspicious pairs, "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{total_pairs} suspicious pairs found")
+        )
+
+    def _index_pending(self, options):
+        """تا خالی شدن صف دسته‌دسته ایندکس می‌کند و تعداد کل را برمی‌گرداند."""
+        total = total_failed = 0
+        while True:
+            indexed, failed = index_pending(options['batch_size'])
+            total += indexed
+            total_failed += failed
+            if not indexed + failed:
+                break
+        if total or total_failed or not options['loop']:
+            self.stdout.write(f"{total} queued submissions indexed, {total_failed} failed")
+        return total + total_failed
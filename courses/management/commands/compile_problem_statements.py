@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.markup import render_problem_statement
+from courses.models import Exercise, ExerciseTemplate
+
+
+class Command(BaseCommand):
+    help = "Compile problem statements of exercise templates and exercises to stored HTML (Markdown + highlighted code)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only rows that have no compiled HTML yet (default: recompile everything)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # تمرین‌های کپی شده از یک الگو متن یکسان دارند؛ هر متن یک بار تبدیل می‌شود
+        compiled = {}
+        for model in (ExerciseTemplate, Exercise):
+            started = time.perf_counter()
+            updated = self._compile(model, compiled, options)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {updated} updated in {time.perf_counter() - started:.1f}s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(compiled)} distinct problem statements compiled")
+        )
+
+    def _compile(self, model, compiled, options):
+        queryset = model.objects.only('pk', 'problem_statement', 'problem_statement_html').order_by('pk')
+        if options['missing_only']:
+            queryset = queryset.filter(problem_statement_html='')
+
+        updated = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=options['batch_size']):
+            html = compiled.get(obj.problem_statement)
+            if html is None:
+                html = compiled[obj.problem_statement] = render_problem_statement(obj.problem_statement)
+            if html != obj.problem_statement_html:
+                obj.problem_statement_html = html
+                batch.append(obj)
+            if len(batch) >= options['batch_size']:
+                updated += self._save(model, batch)
+                batch = []
+        if batch:
+            updated += self._save(model, batch)
+        return updated
+
+    def _save(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_update(batch, ['problem_statement_html'])
+        return len(batch)
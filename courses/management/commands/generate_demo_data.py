@@ -0,0 +1,264 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from courses.bulk import delete_rows
+from courses.cache import bump_version
+from courses.gradebook import bump_gradebook
+from courses.models import (
+    Course, CourseProgress, CourseTemplate, EnrollmentRequest, Exercise, ExerciseTemplate, FingerprintPosting,
+    SimilarityPair, Submission,
+)
+from courses.markup import render_problem_statement
+from courses.progress import rebuild_progress
+from courses.uploads import store_blob
+from users.models import CustomUser
+from users.usernames import assign_usernames
+
+
+DEMO_DOMAIN = 'demo.invalid'
+DEMO_TEMPLATE_PREFIX = '[demo] '
+DEMO_PASSWORD = 'demo-password'
+
+FIRST_NAMES = ['Ali', 'Sara', 'Reza', 'Maryam', 'Hossein', 'Zahra', 'Mohammad', 'Fatemeh', 'Amir', 'Niloofar']
+LAST_NAMES = ['Ahmadi', 'Mohammadi', 'Hosseini', 'Karimi', 'Rezaei', 'Moradi', 'Jafari', 'Rahimi', 'Heidari', 'Sadeghi']
+
+
+def _batched_create(model, rows, batch_size):
+    """rows یک generator است؛ فقط یک دسته در حافظه نگه داشته می‌شود."""
+    created = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+    return created
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic templates, courses, students, enrollments, enrollment requests and "
+        "submissions with bulk_create, for sizing and load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, default=5)
+        parser.add_argument('--exercises-per-template', type=int, default=12)
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--courses-per-student', type=int, default=3)
+        parser.add_argument('--requests-per-student', type=int, default=1,
+                            help='Pending enrollment requests per student')
+        parser.add_argument('--submissions-per-student', type=int, default=30)
+        parser.add_argument('--files', type=int, default=200,
+                            help='Distinct fake files; submissions share them like identical uploads do')
+        parser.add_argument('--graded-fraction', type=float, default=0.5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--flush', action='store_true',
+                            help=f'Delete previously generated demo data (@{DEMO_DOMAIN} users, "{DEMO_TEMPLATE_PREFIX}" templates) first')
+
+    def handle(self, *args, **options):
+        if options['courses_per_student'] + options['requests_per_student'] > options['courses']:
+            raise CommandError('--courses-per-student + --requests-per-student cannot exceed --courses')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if options['flush']:
+            self._flush()
+        elif CustomUser.objects.filter(email__endswith='@' + DEMO_DOMAIN).exists():
+            raise CommandError('Demo data already exists; run with --flush to replace it')
+
+        step = time.perf_counter()
+        with transaction.atomic():
+            courses, exercises_by_course = self._courses(options)
+        self._report('courses', len(courses), step)
+
+        step = time.perf_counter()
+        with transaction.atomic():
+            students = self._students(options['students'])
+        self._report('students', len(students), step)
+
+        step = time.perf_counter()
+        files = self._files(options['files'])
+        self._report('fake files', len(files), step)
+
+        tables = self._enrollments_and_submissions(students, courses, exercises_by_course, files, options)
+        for label, model, rows in tables:
+            step = time.perf_counter()
+            with transaction.atomic():
+                count = _batched_create(model, rows, self.batch_size)
+            self._report(label, count, step)
+
+        step = time.perf_counter()
+        with transaction.atomic():
+            progress_rows = rebuild_progress(course_ids=[course.pk for course in courses])
+        # bulk_create سیگنال نمی‌فرستد
+        bump_version('courses')
+        bump_gradebook(*[course.pk for course in courses])
+        self._report('progress rows', progress_rows, step)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Demo data generated in {time.perf_counter() - started:.1f}s "
+            f"(student password: {DEMO_PASSWORD})"
+        ))
+
+    def _report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f"{count:>10} {label:38} {elapsed:7.1f}s {rate:10.0f} rows/s")
+
+    def _flush(self):
+        started = time.perf_counter()
+        students = CustomUser.objects.filter(email__endswith='@' + DEMO_DOMAIN)
+        courses = Course.objects.filter(template__title__startswith=DEMO_TEMPLATE_PREFIX)
+        with transaction.atomic():
+            # جدول‌های بزرگ مستقیم حذف می‌شوند؛ delete() معمولی همه‌ی ردیف‌ها را می‌خواند و برای
+            # هر ارسال سیگنال می‌فرستد. بقیه (و وابسته‌های کوچک) با cascade عادی حذف می‌شوند.
+            # delete_rows یک DELETE بدون سیگنال و cascade است، پس این‌جا دو شرط را خودمان تضمین می‌کنیم:
+            # - هر جدولی که به این ردیف‌ها FK دارد قبل از آن‌ها در همین فهرست می‌آید (ترتیب مهم است)
+            # - کار گیرنده‌های سیگنال لازم نیست: پیشرفت‌ها همین‌جا حذف و کش‌ها با bump_version باطل می‌شوند
+            submissions = Submission.objects.filter(Q(student__in=students) | Q(exercise__course__in=courses))
+            for queryset in (
+                FingerprintPosting.objects.filter(submission__in=submissions),
+                SimilarityPair.objects.filter(Q(submission_a__in=submissions) | Q(submission_b__in=submissions)),
+                submissions,
+                CourseProgress.objects.filter(Q(student__in=students) | Q(course__in=courses)),
+                EnrollmentRequest.objects.filter(Q(student__in=students) | Q(course__in=courses)),
+                Course.students.through.objects.filter(Q(customuser__in=students) | Q(course__in=courses)),
+            ):
+                delete_rows(queryset)
+            # دوره‌ها اول حذف می‌شوند چون الگو PROTECT است
+            courses.delete()
+            CourseTemplate.objects.filter(title__startswith=DEMO_TEMPLATE_PREFIX).delete()
+            students.delete()
+        bump_version('courses')
+        self.stdout.write(f"Previous demo data deleted in {time.perf_counter() - started:.1f}s")
+
+    def _courses(self, options):
+        templates = CourseTemplate.objects.bulk_create([
+            CourseTemplate(title=f'{DEMO_TEMPLATE_PREFIX}Template {number}', description='Generated demo template')
+            for number in range(1, options['templates'] + 1)
+        ])
+        statements = {
+            order: f'Demo problem statement {order}.\n\n```python\nnumbers = list(map(int, input().split()))\n```'
+            for order in range(1, options['exercises_per_template'] + 1)
+        }
+        exercise_templates = ExerciseTemplate.objects.bulk_create([
+            ExerciseTemplate(
+                course_template=template, title=f'Exercise {order}', order=order,
+                problem_statement=statement, problem_statement_html=render_problem_statement(statement),
+            )
+            for template in templates for order, statement in statements.items()
+        ])
+        by_template = {}
+        for exercise_template in exercise_templates:
+            by_template.setdefault(exercise_template.course_template_id, []).append(exercise_template)
+
+        next_number = (Course.objects.order_by('-course_number').values_list('course_number', flat=True).first() or 0) + 1
+        courses = Course.objects.bulk_create([
+            Course(
+                template=template, course_number=number, is_active_for_signup=True,
+                title=f"{template.title[len(DEMO_TEMPLATE_PREFIX):]} - دوره {number}",
+                description=template.description,
+            )
+            for template, number in (
+                (templates[index % len(templates)], next_number + index) for index in range(options['courses'])
+            )
+        ])
+        # سیگنال ساختن تمرین از روی الگو برای bulk_create اجرا نمی‌شود
+        exercises = Exercise.objects.bulk_create([
+            Exercise(
+                course=course, source_template=exercise_template, title=exercise_template.title,
+                problem_statement=exercise_template.problem_statement,
+                problem_statement_html=exercise_template.problem_statement_html, order=exercise_template.order,
+                is_locked=exercise_template.order > 2,
+            )
+            for course in courses for exercise_template in by_template[course.template_id]
+        ])
+        exercises_by_course = {}
+        for exercise in exercises:
+            exercises_by_course.setdefault(exercise.course_id, []).append(exercise.pk)
+        return courses, exercises_by_course
+
+    def _students(self, count):
+        # هش رمز یک بار ساخته می‌شود؛ ساختن آن برای هر کاربر به تنهایی دقیقه‌ها طول می‌کشد
+        password = make_password(DEMO_PASSWORD)
+        students = []
+        for start in range(0, count, self.batch_size):
+            batch = [
+                CustomUser(
+                    email=f'student{number}@{DEMO_DOMAIN}', password=password,
+                    first_name=self.random.choice(FIRST_NAMES), last_name=self.random.choice(LAST_NAMES),
+                )
+                for number in range(start, min(start + self.batch_size, count))
+            ]
+            assign_usernames(batch)
+            CustomUser.objects.bulk_create(batch)
+            students.extend(user.pk for user in batch)
+        return students
+
+    def _files(self, count):
+        files = []
+        for number in range(count):
+            source = (
+                f'# demo submission {number}\n'
+                f'numbers = list(map(int, input().split()))\n'
+                f'print(sum(numbers) * {number})\n'
+            )
+            stored_name, digest, size = store_blob(ContentFile(source.encode(), name=f'solution{number}.py'))
+            files.append((stored_name, digest, size))
+        return files
+
+    def _enrollments_and_submissions(self, students, courses, exercises_by_course, files, options):
+        Membership = Course.students.through
+        course_ids = [course.pk for course in courses]
+        joined_courses = {}
+        requested_courses = {}
+        for student_id in students:
+            picked = self.random.sample(course_ids, options['courses_per_student'] + options['requests_per_student'])
+            joined_courses[student_id] = picked[:options['courses_per_student']]
+            requested_courses[student_id] = picked[options['courses_per_student']:]
+
+        def memberships():
+            for student_id, picked in joined_courses.items():
+                for course_id in picked:
+                    yield Membership(course_id=course_id, customuser_id=student_id)
+
+        def enrollment_requests():
+            for student_id, picked in requested_courses.items():
+                for course_id in picked:
+                    yield EnrollmentRequest(student_id=student_id, course_id=course_id)
+
+        def submissions():
+            for student_id, picked in joined_courses.items():
+                for _ in range(options['submissions_per_student']):
+                    stored_name, digest, size = self.random.choice(files)
+                    graded = self.random.random() < options['graded_fraction']
+                    yield Submission(
+                        student_id=student_id,
+                        exercise_id=self.random.choice(exercises_by_course[self.random.choice(picked)]),
+                        submitted_file=stored_name, sha256=digest, size=size,
+                        original_name='solution.py',
+                        score=self.random.randint(0, 100) if graded else None,
+                        feedback='Generated demo feedback' if graded else None,
+                        # صف ایندکس را پر نمی‌کند؛ build_similarity_index کل ایندکس را می‌سازد
+                        similarity_pending=False,
+                    )
+
+        return [
+            ('enrollments', Membership, memberships()),
+            ('enrollment requests', EnrollmentRequest, enrollment_requests()),
+            ('submissions', Submission, submissions()),
+        ]
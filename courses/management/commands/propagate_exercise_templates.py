@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import CourseTemplate
+from courses.propagation import sync_course_template
+
+
+class Command(BaseCommand):
+    help = "Sync exercises of active courses with their exercise templates (create, update, link, delete or lock removed ones)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course-template', type=int, action='append', dest='course_templates',
+                            help='Only sync this course template id (can be repeated)')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the diff')
+
+    def handle(self, *args, **options):
+        course_templates = CourseTemplate.objects.order_by('pk')
+        if options['course_templates']:
+            course_templates = course_templates.filter(pk__in=options['course_templates'])
+
+        for course_template in course_templates:
+            plan = sync_course_template(course_template.pk, dry_run=options['dry_run'])
+            if not plan:
+                continue
+            self.stdout.write(f"{course_template}:")
+            for line in plan.describe():
+                self.stdout.write(f"  {line}")
+
+        self.stdout.write(
+            self.style.SUCCESS("dry run, nothing saved" if options['dry_run'] else "exercise templates synced")
+        )
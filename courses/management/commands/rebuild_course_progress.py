@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.progress import rebuild_progress
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized per-student course progress table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only rebuild this course id (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_progress(course_ids=options['courses'], batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{written} progress rows rebuilt")
+        )
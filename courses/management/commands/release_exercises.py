@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.release import apply_due_releases, next_release_at
+
+
+class Command(BaseCommand):
+    help = (
+        "Unlock and lock exercises whose unlock_at/lock_at time has come. Runs as a long-lived "
+        "scheduler that sleeps until the next pending transition (or use --once from cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Apply due transitions and exit')
+        parser.add_argument('--max-sleep', type=float, default=60,
+                            help='Upper bound on one sleep, so schedules added meanwhile are picked up (seconds)')
+
+    def handle(self, *args, **options):
+        while True:
+            result = apply_due_releases()
+            if result:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{timezone.now():%Y-%m-%d %H:%M:%S} {result.unlocked} unlocked, {result.locked} locked "
+                    f"in {len(result.course_ids)} courses"
+                ))
+            if options['once']:
+                return
+
+            upcoming = next_release_at()
+            delay = options['max_sleep']
+            if upcoming is not None:
+                delay = min(delay, max(0.0, (upcoming - timezone.now()).total_seconds()))
+            time.sleep(delay)
@@ -0,0 +1,63 @@
+"""
+تبدیل صورت سوال (Markdown) به HTML هنگام ذخیره.
+
+HTML در فیلد problem_statement_html کنار متن اصلی ذخیره می‌شود تا نمایش صفحه‌ی تمرین هیچ
+هزینه‌ای برای رندر نداشته باشد. بلوک‌های کد (```python ... ```) با Pygments رنگ‌آمیزی می‌شوند؛
+استایل‌ها داخل خود HTML هستند و CSS جداگانه لازم نیست.
+HTML خام داخل متن escape می‌شود.
+
+Markdown و Pygments در requirements.txt هستند. بعد از تغییر این فایل، دستور
+compile_problem_statements ردیف‌های موجود را دوباره می‌سازد.
+"""
+import html
+import re
+from urllib.parse import urlsplit
+
+import markdown
+from markdown.treeprocessors import Treeprocessor
+
+
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+# مرورگر فاصله‌ها و کاراکترهای کنترلی را از آدرس حذف می‌کند ("java\tscript:" همان "javascript:" است)
+_URL_IGNORED_CHARACTERS = re.compile(r'[\x00-\x20\x7f-\x9f]')
+
+
+def _url_scheme(value):
+    """scheme آدرس همان‌طور که مرورگر می‌بیند: بعد از باز کردن entity ها (&#106;avascript:) و حذف کاراکترهای کنترلی."""
+    value = value.replace(markdown.util.AMP_SUBSTITUTE, '&')
+    return urlsplit(_URL_IGNORED_CHARACTERS.sub('', html.unescape(value))).scheme.lower()
+
+
+class _SafeLinks(Treeprocessor):
+    # لینک‌ها و تصویرهایی مثل javascript:... حذف می‌شوند
+    def run(self, root):
+        for element in root.iter():
+            for attribute in ('href', 'src'):
+                value = element.get(attribute)
+                if value is not None and _url_scheme(value) not in SAFE_URL_SCHEMES:
+                    del element.attrib[attribute]
+
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite', 'tables', 'sane_lists']
+MARKDOWN_EXTENSION_CONFIGS = {
+    # guess_lang=False: بلوک بدون زبان رنگ‌آمیزی حدسی نمی‌گیرد
+    'codehilite': {'noclasses': True, 'guess_lang': False, 'css_class': 'highlight'},
+}
+
+
+def _markdown_renderer():
+    renderer = markdown.Markdown(
+        extensions=MARKDOWN_EXTENSIONS, extension_configs=MARKDOWN_EXTENSION_CONFIGS, output_format='html',
+    )
+    # HTML خام نوشته شده در صورت سوال به صورت متن نمایش داده می‌شود
+    renderer.preprocessors.deregister('html_block')
+    renderer.inlinePatterns.deregister('html')
+    renderer.treeprocessors.register(_SafeLinks(renderer), 'safe_links', 0)
+    return renderer
+
+
+def render_problem_statement(source):
+    if not source:
+        return ''
+    return _markdown_renderer().convert(source)
@@ -0,0 +1,153 @@
+"""
+سرو فایل‌های media با بررسی دسترسی.
+
+- فایل‌های ارسالی فقط برای صاحب ارسال یا کارمندان (staff) قابل دانلود هستند.
+- اگر پروکسی جلویی تنظیم شده باشد (MEDIA_SENDFILE_BACKEND)، انتقال فایل با
+  X-Accel-Redirect (nginx) یا X-Sendfile (apache) به آن سپرده می‌شود و worker فورا آزاد می‌شود.
+- در غیر این صورت FileResponse با ETag، Last-Modified و درخواست‌های Range برگردانده می‌شود.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Submission
+
+
+# پوشه‌هایی که بدون ورود هم در دسترس هستند (آیکون و لوگوی سایت)
+PUBLIC_PREFIXES = ('site/',)
+# پوشه‌هایی که به فایل ارسالی یک Submission تعلق دارند
+SUBMISSION_PREFIXES = ('submissions/', 'blobs/')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def can_access(user, path):
+    if path.startswith(PUBLIC_PREFIXES):
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    if path.startswith(SUBMISSION_PREFIXES):
+        # blob ها بین ارسال‌ها مشترک‌اند؛ کافی است یکی از ارسال‌های خود کاربر به این فایل اشاره کند
+        return Submission.objects.filter(submitted_file=path, student=user).exists()
+    return False
+
+
+def _offload(path, full_path, content_type):
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', '')
+    response = HttpResponse(content_type=content_type)
+    if backend == 'nginx':
+        prefix = getattr(settings, 'MEDIA_SENDFILE_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(path)
+    elif backend == 'apache':
+        response['X-Sendfile'] = full_path
+    else:
+        return None
+    return response
+
+
+def _parse_range(header, size):
+    """فقط یک بازه پشتیبانی می‌شود؛ خروجی (start, end) یا None (=کل فایل) یا False (=نامعتبر)."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500 یعنی ۵۰۰ بایت آخر
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_range(full_path, start, length):
+    with open(full_path, 'rb') as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not can_access(request.user, path):
+        # وجود فایل را برای کاربر غیرمجاز فاش نمی‌کنیم
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = _offload(path, full_path, content_type)
+    if response is not None:
+        patch_cache_control(response, private=True)
+        return response
+
+    stat = os.stat(full_path)
+    # blob ها بر اساس محتوا نام‌گذاری شده‌اند و تغییر نمی‌کنند؛ mtime و حجم برای بقیه کافی است
+    etag = quote_etag(f'{int(stat.st_mtime)}-{stat.st_size}')
+    last_modified = int(stat.st_mtime)
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        patch_cache_control(conditional, private=True)
+        return conditional
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.method in ('GET', 'HEAD'):
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag or if_range == http_date(last_modified):
+            byte_range = _parse_range(range_header, stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_range(full_path, start, length), status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(length)
+    else:
+        # FileResponse از wsgi.file_wrapper (sendfile در gunicorn) استفاده می‌کند
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 07:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_remove_submission_teacher_comment_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted_count', models.PositiveIntegerField(default=0, verbose_name='تعداد تمرین\u200cهای ارسال شده')),
+                ('total_exercises', models.PositiveIntegerField(default=0, verbose_name='تعداد کل تمرین\u200cها')),
+                ('percentage', models.PositiveSmallIntegerField(default=0, verbose_name='درصد پیشرفت')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_records', to='courses.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'پیشرفت دانشجو',
+                'verbose_name_plural': 'پیشرفت دانشجویان',
+                'unique_together': {('student', 'course')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_courseprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='نام اصلی فایل'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='هش SHA-256 فایل'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='حجم فایل (بایت)'),
+        ),
+    ]
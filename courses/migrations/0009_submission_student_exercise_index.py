@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 07:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_submission_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'exercise', 'submitted_at'], name='submission_student_ex_idx'),
+        ),
+    ]
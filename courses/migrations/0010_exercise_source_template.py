@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 07:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_existing_exercises(apps, schema_editor):
+    # تمرین‌های قبلی با عنوان به الگوی دوره‌شان وصل می‌شوند (همان معیار قبلی جلوگیری از تکرار)
+    Exercise = apps.get_model('courses', 'Exercise')
+    ExerciseTemplate = apps.get_model('courses', 'ExerciseTemplate')
+
+    templates = {
+        (template.course_template_id, template.title): template.pk
+        for template in ExerciseTemplate.objects.all()
+    }
+    linked = []
+    for exercise in Exercise.objects.select_related('course').filter(source_template__isnull=True):
+        template_id = templates.get((exercise.course.template_id, exercise.title))
+        if template_id:
+            exercise.source_template_id = template_id
+            linked.append(exercise)
+    Exercise.objects.bulk_update(linked, ['source_template'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_submission_student_exercise_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='source_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exercises', to='courses.exercisetemplate', verbose_name='الگوی تمرین'),
+        ),
+        migrations.RunPython(link_existing_exercises, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_exercise_source_template'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseTestCase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('io', 'ورودی / خروجی مورد انتظار'), ('check', 'کد بررسی (assert)')], default='io', max_length=10, verbose_name='نوع تست')),
+                ('stdin', models.TextField(blank=True, verbose_name='ورودی (stdin)')),
+                ('expected_output', models.TextField(blank=True, verbose_name='خروجی مورد انتظار')),
+                ('check_code', models.TextField(blank=True, verbose_name='کد بررسی')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='وزن')),
+                ('order', models.PositiveIntegerField(default=1, verbose_name='شماره ترتیب')),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_cases', to='courses.exercise')),
+            ],
+            options={
+                'verbose_name': 'تست خودکار',
+                'verbose_name_plural': 'تست\u200cهای خودکار',
+                'ordering': ['order', 'pk'],
+            },
+        ),
+    ]
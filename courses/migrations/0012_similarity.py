@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_exercisetestcase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeFingerprint',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('hashes', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CommonFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.exercise')),
+            ],
+            options={
+                'unique_together': {('exercise', 'hash')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FingerprintPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.exercise')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_postings', to='courses.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['exercise', 'hash'], name='fingerprint_exercise_hash_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarityPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared', models.PositiveIntegerField(verbose_name='اثر انگشت مشترک')),
+                ('similarity', models.FloatField(verbose_name='شباهت')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_pairs', to='courses.exercise')),
+                ('submission_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.submission')),
+                ('submission_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.submission')),
+            ],
+            options={
+                'verbose_name': 'ارسال مشابه',
+                'verbose_name_plural': 'ارسال\u200cهای مشابه',
+                'indexes': [models.Index(fields=['exercise', '-similarity'], name='similarity_exercise_idx')],
+                'unique_together': {('submission_a', 'submission_b')},
+            },
+        ),
+    ]
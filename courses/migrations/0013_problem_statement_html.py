@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='problem_statement_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='exercisetemplate',
+            name='problem_statement_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='problem_statement',
+            field=models.TextField(help_text='Markdown؛ کد را داخل ```python ... ``` بنویسید.'),
+        ),
+        migrations.AlterField(
+            model_name='exercisetemplate',
+            name='problem_statement',
+            field=models.TextField(help_text='Markdown؛ کد را داخل ```python ... ``` بنویسید.', verbose_name='صورت سوال'),
+        ),
+    ]
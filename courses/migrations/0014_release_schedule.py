@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 08:31
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_problem_statement_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='release_offset',
+            field=models.DurationField(default=datetime.timedelta(0), verbose_name='تاخیر انتشار تمرین\u200cها'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='زمان شروع دوره'),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='lock_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='زمان قفل شدن'),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='unlock_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='زمان باز شدن'),
+        ),
+        migrations.AddField(
+            model_name='exercisetemplate',
+            name='lock_offset',
+            field=models.DurationField(blank=True, null=True, verbose_name='قفل شدن پس از شروع دوره'),
+        ),
+        migrations.AddField(
+            model_name='exercisetemplate',
+            name='unlock_offset',
+            field=models.DurationField(blank=True, null=True, verbose_name='باز شدن پس از شروع دوره'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(condition=models.Q(('unlock_at__isnull', False)), fields=['unlock_at'], name='exercise_unlock_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(condition=models.Q(('lock_at__isnull', False)), fields=['lock_at'], name='exercise_lock_at_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_release_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['course', 'order', 'id'], name='exercise_course_order_idx'),
+        ),
+    ]
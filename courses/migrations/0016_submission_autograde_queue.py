@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 09:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_autograded(apps, schema_editor):
+    # نمره‌هایی که قبلا نمره‌دهی خودکار نوشته (بازخوردشان با سرتیتر آن شروع می‌شود) دستی حساب نشوند
+    Submission = apps.get_model('courses', 'Submission')
+    Submission.objects.filter(feedback__startswith='نمره‌ی خودکار:').update(autograded_score=models.F('score'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_exercise_course_order_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='autograde_request',
+            field=models.CharField(blank=True, choices=[('queued', 'در صف (نمره\u200cی دستی حفظ شود)'), ('overwrite', 'در صف (بازنویسی نمره\u200cی دستی)')], editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='autograded_score',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('autograde_request', ''), _negated=True), fields=['autograde_request'], name='submission_autograde_idx'),
+        ),
+        migrations.RunPython(mark_existing_autograded, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+import io
+
+from django.core.management import call_command
+from django.db import migrations, transaction
+
+
+def recompile_statements(apps, schema_editor):
+    # HTML ذخیره شده قبل از باز کردن entity ها در بررسی scheme (مثلا &#106;avascript:) دوباره ساخته می‌شود.
+    # کد تبدیل در courses/markup.py تغییر می‌کند و اینجا کپی نمی‌شود؛ اگر دستور در نسخه‌ی فعلی کد اجرا
+    # نشد، migration کاری نمی‌کند و compile_problem_statements باید جدا اجرا شود.
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            call_command('compile_problem_statements', stdout=io.StringIO())
+    except Exception as error:
+        print(f"\n  Skipped recompiling problem statements ({type(error).__name__}: {error}); "
+              f"run 'python manage.py compile_problem_statements' after migrating.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_submission_autograde_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompile_statements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 09:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_resanitize_problem_statement_links'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='similarity_pending',
+            # ارسال‌های موجود قبلا با سیگنال post_save ایندکس شده‌اند و در صف نمی‌روند
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='similarity_pending',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('similarity_pending', True)), fields=['id'], name='submission_similarity_idx'),
+        ),
+    ]
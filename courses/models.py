@@ -130,10 +130,25 @@
 
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 import os
+from datetime import timedelta
+
+from .markup import render_problem_statement
+from .uploads import StoredBlob, store_blob
+
+
+def compile_problem_statement(instance, save_kwargs):
+    # HTML صورت سوال هنگام ذخیره ساخته و کنار متن ذخیره می‌شود (courses/markup.py)
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None:
+        if 'problem_statement' not in update_fields:
+            return
+        save_kwargs['update_fields'] = {*update_fields, 'problem_statement_html'}
+    instance.problem_statement_html = render_problem_statement(instance.problem_statement)
 
 # --- بخش الگوها (Templates) ---
 class CourseTemplate(models.Model):
@@ -146,8 +161,12 @@ class CourseTemplate(models.Model):
 class ExerciseTemplate(models.Model):
     course_template = models.ForeignKey(CourseTemplate, on_delete=models.CASCADE, related_name='exercise_templates')
     title = models.CharField(max_length=200, verbose_name='عنوان تمرین')
-    problem_statement = models.TextField(verbose_name='صورت سوال')
+    problem_statement = models.TextField(verbose_name='صورت سوال', help_text='Markdown؛ کد را داخل ```python ... ``` بنویسید.')
+    problem_statement_html = models.TextField(blank=True, editable=False)
     order = models.PositiveIntegerField(default=1, verbose_name='شماره ترتیب')
+    # زمان‌بندی انتشار نسبت به شروع هر دوره (courses/release.py)؛ مثلا "7 00:00:00" یعنی یک هفته بعد
+    unlock_offset = models.DurationField(null=True, blank=True, verbose_name='باز شدن پس از شروع دوره')
+    lock_offset = models.DurationField(null=True, blank=True, verbose_name='قفل شدن پس از شروع دوره')
 
     class Meta:
         ordering = ['order']
@@ -155,7 +174,24 @@ class ExerciseTemplate(models.Model):
     def __str__(self):
         return f"{self.title} (الگو)"
 
+    def clean(self):
+        if self.unlock_offset is not None and self.lock_offset is not None and self.lock_offset <= self.unlock_offset:
+            raise ValidationError({'lock_offset': 'زمان قفل شدن باید بعد از زمان باز شدن باشد.'})
+
+    def save(self, *args, **kwargs):
+        compile_problem_statement(self, kwargs)
+        super().save(*args, **kwargs)
+
 # --- بخش اجرایی (Active Courses) ---
+def _membership_memo(user):
+    # request.user در هر درخواست یک شیء تازه است، پس این حافظه عمر همان درخواست را دارد
+    memo = getattr(user, '_course_membership_memo', None)
+    if memo is None:
+        memo = {}
+        user._course_membership_memo = memo
+    return memo
+
+
 class Course(models.Model):
     # تغییر مهم: related_name اضافه شد تا بتوانیم دوره‌های فعال یک الگو را پیدا کنیم
     template = models.ForeignKey(CourseTemplate, on_delete=models.PROTECT, verbose_name='نوع دوره', related_name='active_courses')
@@ -168,10 +204,47 @@ class Course(models.Model):
     students = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='courses_joined', blank=True, verbose_name='دانشجویان')
     is_active_for_signup = models.BooleanField(default=True, verbose_name='قابل انتخاب در ثبت‌نام')
     created_at = models.DateTimeField(auto_now_add=True)
+    # بدون زمان شروع، تمرین‌های دوره زمان‌بندی ندارند و فقط دستی باز و قفل می‌شوند
+    starts_at = models.DateTimeField(null=True, blank=True, verbose_name='زمان شروع دوره')
+    # فاصله‌ی انتشار این دوره از بقیه‌ی دوره‌های هم‌الگو، تا همه با هم باز نشوند
+    release_offset = models.DurationField(default=timedelta(0), verbose_name='تاخیر انتشار تمرین‌ها')
 
     class Meta:
         unique_together = ['template', 'course_number']
 
+    def is_member(self, user):
+        """
+        آیا کاربر عضو این دوره است؟
+        به جای بارگذاری همه‌ی دانشجویان (user in course.students.all())، یک EXISTS روی ایندکس
+        یکتای جدول واسط می‌زند و جواب را روی خود شیء کاربر (یعنی برای همان درخواست) نگه می‌دارد.
+        """
+        if not user.is_authenticated:
+            return False
+        memo = _membership_memo(user)
+        if self.pk not in memo:
+            memo[self.pk] = Course.students.through.objects.filter(
+                course_id=self.pk, customuser_id=user.pk,
+            ).exists()
+        return memo[self.pk]
+
+    @classmethod
+    def memberships_for(cls, user, courses):
+        """مجموعه‌ی id دوره‌هایی از courses که کاربر عضو آن‌هاست؛ با یک کوئری برای همه."""
+        if not user.is_authenticated:
+            return set()
+        memo = _membership_memo(user)
+        course_ids = {getattr(course, 'pk', course) for course in courses}
+        unknown = course_ids - memo.keys()
+        if unknown:
+            joined = set(
+                cls.students.through.objects.filter(
+                    customuser_id=user.pk, course_id__in=unknown,
+                ).values_list('course_id', flat=True)
+            )
+            for course_id in unknown:
+                memo[course_id] = course_id in joined
+        return {course_id for course_id in course_ids if memo[course_id]}
+
     def save(self, *args, **kwargs):
         if not self.title:
             self.title = f"{self.template.title} - دوره {self.course_number}"
@@ -184,17 +257,64 @@ class Course(models.Model):
 
 class Exercise(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='exercises')
+    # الگویی که این تمرین از آن کپی شده؛ ویرایش و حذف الگو از این طریق به دوره‌ها می‌رسد (courses/propagation.py)
+    source_template = models.ForeignKey(
+        'ExerciseTemplate', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='exercises', verbose_name='الگوی تمرین',
+    )
     title = models.CharField(max_length=200)
-    problem_statement = models.TextField()
+    problem_statement = models.TextField(help_text='Markdown؛ کد را داخل ```python ... ``` بنویسید.')
+    problem_statement_html = models.TextField(blank=True, editable=False)
     is_locked = models.BooleanField(default=True, verbose_name='قفل است؟')
     order = models.PositiveIntegerField()
+    # تغییر وضعیت‌های زمان‌بندی شده‌ی در انتظار؛ بعد از اعمال (دستور release_exercises) خالی می‌شوند
+    unlock_at = models.DateTimeField(null=True, blank=True, verbose_name='زمان باز شدن')
+    lock_at = models.DateTimeField(null=True, blank=True, verbose_name='زمان قفل شدن')
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # لیست تمرین‌های دوره به ترتیب (صفحه‌ی دوره، صفحه‌بندی keyset در API)
+            models.Index(fields=['course', 'order', 'id'], name='exercise_course_order_idx'),
+            # فقط ردیف‌های در انتظار در ایندکس هستند، پس با رشد جدول کوچک می‌مانند
+            models.Index(fields=['unlock_at'], name='exercise_unlock_at_idx', condition=models.Q(unlock_at__isnull=False)),
+            models.Index(fields=['lock_at'], name='exercise_lock_at_idx', condition=models.Q(lock_at__isnull=False)),
+        ]
 
     def __str__(self):
         return f"{self.course.course_number} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        compile_problem_statement(self, kwargs)
+        super().save(*args, **kwargs)
+
+
+class ExerciseTestCase(models.Model):
+    """تست خودکار تمرین؛ ارسال‌های .py و .zip با courses/autograder.py در محیط محدود اجرا و نمره‌دهی می‌شوند."""
+    KIND_IO = 'io'
+    KIND_CHECK = 'check'
+    KIND_CHOICES = [
+        (KIND_IO, 'ورودی / خروجی مورد انتظار'),
+        (KIND_CHECK, 'کد بررسی (assert)'),
+    ]
+
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='test_cases')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_IO, verbose_name='نوع تست')
+    stdin = models.TextField(blank=True, verbose_name='ورودی (stdin)')
+    expected_output = models.TextField(blank=True, verbose_name='خروجی مورد انتظار')
+    # برای نوع check: بعد از «from solution import *» اجرا می‌شود، مثلا assert add(2, 3) == 5
+    check_code = models.TextField(blank=True, verbose_name='کد بررسی')
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name='وزن')
+    order = models.PositiveIntegerField(default=1, verbose_name='شماره ترتیب')
+
+    class Meta:
+        ordering = ['order', 'pk']
+        verbose_name = 'تست خودکار'
+        verbose_name_plural = 'تست‌های خودکار'
+
+    def __str__(self):
+        return f"{self.exercise} - تست {self.order}"
+
 
 def submission_file_path(instance, filename):
     user_folder = instance.student.username or instance.student.email.split('@')[0]
@@ -220,6 +340,127 @@ class Submission(models.Model):
     feedback = models.TextField(blank=True, null=True, verbose_name='بازخورد استاد')
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    # نمره‌دهی خودکار (courses/autograder.py): نمره‌ای که خودش نوشته؛ اگر score با آن فرق کند نمره دستی است
+    autograded_score = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # درخواست نمره‌دهی از ادمین که worker (autograde_submissions --queued) اجرا می‌کند
+    AUTOGRADE_QUEUED = 'queued'
+    AUTOGRADE_OVERWRITE = 'overwrite'
+    AUTOGRADE_CHOICES = [
+        (AUTOGRADE_QUEUED, 'در صف (نمره‌ی دستی حفظ شود)'),
+        (AUTOGRADE_OVERWRITE, 'در صف (بازنویسی نمره‌ی دستی)'),
+    ]
+    autograde_request = models.CharField(max_length=10, choices=AUTOGRADE_CHOICES, blank=True, editable=False)
+    # ارسال جدید در صف ایندکس اثر انگشت (courses/similarity.py) است؛ build_similarity_index --pending
+    # بیرون از درخواست آپلود ایندکسش می‌کند
+    similarity_pending = models.BooleanField(default=True, editable=False)
+
+    # فایل‌ها بر اساس هش محتوا ذخیره می‌شوند (courses/uploads.py)؛ ارسال‌های یکسان یک فایل مشترک دارند
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='هش SHA-256 فایل')
+    size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='حجم فایل (بایت)')
+    original_name = models.CharField(max_length=255, blank=True, verbose_name='نام اصلی فایل')
+
+    class Meta:
+        indexes = [
+            # تاریخچه‌ی ارسال‌های یک دانشجو برای یک تمرین (آخرین ارسال، دفتر نمره، صفحه‌ی تمرین)
+            models.Index(fields=['student', 'exercise', 'submitted_at'], name='submission_student_ex_idx'),
+            # صف نمره‌دهی خودکار: فقط ردیف‌های درخواست شده در ایندکس هستند
+            models.Index(
+                fields=['autograde_request'], condition=~models.Q(autograde_request=''),
+                name='submission_autograde_idx',
+            ),
+            models.Index(
+                fields=['id'], condition=models.Q(similarity_pending=True), name='submission_similarity_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        file = self.submitted_file
+        if file and not file._committed:
+            uploaded = file.file
+            if isinstance(uploaded, StoredBlob):
+                # handler آپلود فایل را قبلا در پوشه‌ی موقت همان دیسک نوشته و هشش را دارد
+                uploaded.promote()
+                stored_name, digest, size = uploaded.blob_name, uploaded.sha256, uploaded.size
+            else:
+                stored_name, digest, size = store_blob(uploaded, file.storage)
+            self.original_name = os.path.basename(uploaded.name)[:255]
+            file.name = stored_name
+            file._committed = True
+            self.sha256 = digest
+            self.size = size
+        super().save(*args, **kwargs)
+
+class CodeFingerprint(models.Model):
+    """اثر انگشت winnowing یک محتوای فایل؛ با sha256 کش می‌شود تا فایل‌های یکسان دوباره پردازش نشوند (courses/similarity.py)."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    hashes = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({len(self.hashes)})"
+
+
+class FingerprintPosting(models.Model):
+    """ایندکس معکوس: کدام ارسال‌های یک تمرین این hash را دارند (فقط hash های غیرعمومی)."""
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='+')
+    submission = models.ForeignKey('Submission', on_delete=models.CASCADE, related_name='fingerprint_postings')
+    hash = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['exercise', 'hash'], name='fingerprint_exercise_hash_idx'),
+        ]
+
+
+class CommonFingerprint(models.Model):
+    """hash هایی که در تعداد زیادی از ارسال‌های یک تمرین آمده‌اند (کد آماده، الگوهای رایج) و برای تشخیص کپی نادیده گرفته می‌شوند."""
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='+')
+    hash = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ['exercise', 'hash']
+
+
+class SimilarityPair(models.Model):
+    """دو ارسال از دو دانشجوی مختلف برای یک تمرین که بخش زیادی از اثر انگشتشان مشترک است."""
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='similarity_pairs')
+    # همیشه submission_a.pk < submission_b.pk
+    submission_a = models.ForeignKey('Submission', on_delete=models.CASCADE, related_name='+')
+    submission_b = models.ForeignKey('Submission', on_delete=models.CASCADE, related_name='+')
+    shared = models.PositiveIntegerField(verbose_name='اثر انگشت مشترک')
+    similarity = models.FloatField(verbose_name='شباهت')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['submission_a', 'submission_b']
+        indexes = [
+            models.Index(fields=['exercise', '-similarity'], name='similarity_exercise_idx'),
+        ]
+        verbose_name = 'ارسال مشابه'
+        verbose_name_plural = 'ارسال‌های مشابه'
+
+    def __str__(self):
+        return f"{self.submission_a_id} ~ {self.submission_b_id}: {self.similarity:.0%}"
+
+
+class CourseProgress(models.Model):
+    # جدول خلاصه‌ی پیشرفت هر دانشجو در هر دوره؛ با سیگنال‌ها به‌روز می‌شود (courses/progress.py)
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress_records')
+    submitted_count = models.PositiveIntegerField(default=0, verbose_name='تعداد تمرین‌های ارسال شده')
+    total_exercises = models.PositiveIntegerField(default=0, verbose_name='تعداد کل تمرین‌ها')
+    percentage = models.PositiveSmallIntegerField(default=0, verbose_name='درصد پیشرفت')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'course']
+        verbose_name = 'پیشرفت دانشجو'
+        verbose_name_plural = 'پیشرفت دانشجویان'
+
+    def __str__(self):
+        return f"{self.student} - {self.course}: {self.percentage}%"
+
+
 class EnrollmentRequest(models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='enrollment_requests')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollment_requests')
@@ -247,28 +488,11 @@ class SiteSetting(models.Model):
         verbose_name_plural = "تنظیمات سایت"
 
 
-# وقتی در بخش "الگوها" یک تمرین جدید اضافه کنید، خودکار به همه دوره‌های فعال اضافه می‌شود.
+# وقتی در بخش "الگوها" یک تمرین اضافه یا ویرایش کنید، خودکار به همه دوره‌های فعال منتقل می‌شود.
+# (حذف الگو در courses/signals.py با pre_delete مدیریت می‌شود)
 
 @receiver(post_save, sender=ExerciseTemplate)
 def auto_create_exercise_for_active_courses(sender, instance, created, **kwargs):
-    if created: # فقط اگر تمرین جدید باشد (نه ویرایش)
-        # تمام دوره‌هایی که از این الگو ساخته شده‌اند را پیدا کن
-        active_courses = instance.course_template.active_courses.all()
-        
-        exercises_to_create = []
-        for course in active_courses:
-            # بررسی کن که قبلاً اضافه نشده باشد
-            if not Exercise.objects.filter(course=course, title=instance.title).exists():
-                exercises_to_create.append(
-                    Exercise(
-                        course=course,
-                        title=instance.title,
-                        problem_statement=instance.problem_statement,
-                        order=instance.order,
-                        is_locked=True # پیش‌فرض قفل باشد
-                    )
-                )
-        
-        # ثبت همه با هم در دیتابیس (برای سرعت بیشتر)
-        if exercises_to_create:
-            Exercise.objects.bulk_create(exercises_to_create)
+    # همگام‌سازی set-based همه‌ی دوره‌های این الگو (courses/propagation.py)
+    from .propagation import request_sync
+    request_sync(instance.course_template_id)
@@ -0,0 +1,183 @@
+"""
+نگه‌داری جدول CourseProgress به صورت افزایشی.
+
+به جای شمردن دوباره‌ی ارسال‌ها در هر بار نمایش صفحه‌ی دوره، با هر ارسال جدید،
+حذف ارسال و تغییر تعداد تمرین‌ها فقط ردیف‌های مربوطه به‌روز می‌شوند.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+from .models import CourseProgress, Exercise, Submission
+
+
+def percentage_expression(submitted, total):
+    # همان محاسبه‌ی قبلی ویو: int(submitted / total * 100) و صفر وقتی تمرینی نیست
+    return Case(
+        When(GreaterThan(total, 0), then=submitted * 100 / total),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def calculate_percentage(submitted, total):
+    return int((submitted / total) * 100) if total > 0 else 0
+
+
+def _total_exercises_subquery():
+    exercises = (
+        Exercise.objects.filter(course=OuterRef('course'))
+        .order_by().values('course')
+        .annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(Subquery(exercises, output_field=IntegerField()), 0)
+
+
+def _submitted_count_subquery():
+    submissions = (
+        Submission.objects.filter(student=OuterRef('student'), exercise__course=OuterRef('course'))
+        .order_by().values('student')
+        .annotate(submitted=Count('exercise', distinct=True)).values('submitted')
+    )
+    return Coalesce(Subquery(submissions, output_field=IntegerField()), 0)
+
+
+def compute_progress(student_id, course_id):
+    """محاسبه‌ی کامل (فقط برای ساخت اولین ردیف و بازسازی)."""
+    total = Exercise.objects.filter(course_id=course_id).count()
+    submitted = (
+        Submission.objects.filter(student_id=student_id, exercise__course_id=course_id)
+        .values('exercise').distinct().count()
+    )
+    return submitted, total
+
+
+def _create_progress(student_id, course_id):
+    submitted, total = compute_progress(student_id, course_id)
+    try:
+        with transaction.atomic():
+            return CourseProgress.objects.create(
+                student_id=student_id,
+                course_id=course_id,
+                submitted_count=submitted,
+                total_exercises=total,
+                percentage=calculate_percentage(submitted, total),
+            )
+    except IntegrityError:
+        # درخواست هم‌زمان دیگری زودتر ردیف را ساخته است
+        return CourseProgress.objects.get(student_id=student_id, course_id=course_id)
+
+
+def get_progress(student, course):
+    """ردیف پیشرفت را با یک جستجوی یکتا برمی‌گرداند و اگر نبود می‌سازد."""
+    progress = CourseProgress.objects.filter(student=student, course=course).first()
+    if progress is None:
+        progress = _create_progress(student.pk, course.pk)
+    return progress
+
+
+def record_submission_created(submission):
+    course_id = submission.exercise.course_id
+    student_id = submission.student_id
+    older = Submission.objects.filter(
+        student_id=student_id, exercise_id=submission.exercise_id, pk__lt=submission.pk,
+    )
+
+    with transaction.atomic():
+        # قفل ردیف، سیگنال‌های هم‌زمان یک دانشجو در یک دوره را پشت سر هم اجرا می‌کند
+        progress = (
+            CourseProgress.objects.select_for_update()
+            .filter(student_id=student_id, course_id=course_id).first()
+        )
+        if progress is None:
+            _create_progress(student_id, course_id)
+            return
+
+        # فقط ارسالی که قبل از آن ارسالی برای همین تمرین نیست شمارش را به‌روز می‌کند، آن هم با شمردن
+        # دوباره نه +1: دو اولین ارسال هم‌زمان هر دو قبل از سیگنالشان commit می‌شوند و هر کدام دیگری
+        # را می‌دید، پس هیچ‌کدام +1 نمی‌کرد؛ شمارش دوباره در هر ترتیبی درست است.
+        submitted = _submitted_count_subquery()
+        CourseProgress.objects.filter(pk=progress.pk).exclude(Exists(older)).update(
+            submitted_count=submitted,
+            percentage=percentage_expression(submitted, F('total_exercises')),
+        )
+
+
+def refresh_submitted_count(student_id, exercise_id):
+    # بعد از حذف ارسال‌ها (ممکن است چند ارسال در یک cascade حذف شوند) شمارش دقیق را دوباره می‌گیریم.
+    # فقط UPDATE؛ ردیف جدیدی نمی‌سازیم تا با حذف cascade کاربر یا دوره تداخل نکند.
+    submitted = _submitted_count_subquery()
+    course = Exercise.objects.filter(pk=exercise_id).values('course_id')
+    CourseProgress.objects.filter(student_id=student_id, course_id__in=course).update(
+        submitted_count=submitted,
+        percentage=percentage_expression(submitted, F('total_exercises')),
+    )
+
+
+def refresh_course_totals(course_ids):
+    """بعد از اضافه یا حذف شدن تمرین‌ها، تعداد کل و درصد همه‌ی دانشجویان دوره با یک UPDATE."""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return
+    total = _total_exercises_subquery()
+    CourseProgress.objects.filter(course_id__in=course_ids).update(
+        total_exercises=total,
+        percentage=percentage_expression(F('submitted_count'), total),
+    )
+
+
+def rebuild_progress(course_ids=None, batch_size=1000):
+    """
+    بازسازی کامل جدول با چند کوئری گروه‌بندی شده.
+    برای همه‌ی دانشجویان عضو دوره‌ها و هر کسی که در دوره ارسالی دارد ردیف ساخته می‌شود.
+    """
+    from .models import Course
+
+    exercises = Exercise.objects.order_by()
+    submissions = Submission.objects.order_by()
+    enrollments = Course.students.through.objects.order_by()
+    if course_ids is not None:
+        exercises = exercises.filter(course_id__in=course_ids)
+        submissions = submissions.filter(exercise__course_id__in=course_ids)
+        enrollments = enrollments.filter(course_id__in=course_ids)
+
+    totals = dict(exercises.values('course').annotate(total=Count('pk')).values_list('course', 'total'))
+
+    submitted = {
+        (row['student'], row['exercise__course']): row['submitted']
+        for row in submissions.values('student', 'exercise__course').annotate(
+            submitted=Count('exercise', distinct=True)
+        )
+    }
+    pairs = set(submitted)
+    pairs.update(enrollments.values_list('customuser_id', 'course_id'))
+
+    rows = []
+    written = 0
+    for student_id, course_id in pairs:
+        count = submitted.get((student_id, course_id), 0)
+        total = totals.get(course_id, 0)
+        rows.append(CourseProgress(
+            student_id=student_id,
+            course_id=course_id,
+            submitted_count=count,
+            total_exercises=total,
+            percentage=calculate_percentage(count, total),
+        ))
+        if len(rows) >= batch_size:
+            written += _upsert(rows)
+            rows = []
+    if rows:
+        written += _upsert(rows)
+    return written
+
+
+def _upsert(rows):
+    CourseProgress.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['student', 'course'],
+        update_fields=['submitted_count', 'total_exercises', 'percentage', 'updated_at'],
+    )
+    return len(rows)
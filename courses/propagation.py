@@ -0,0 +1,245 @@
+"""
+هماهنگ نگه داشتن تمرین‌های دوره‌های فعال با الگوهای تمرین (ExerciseTemplate).
+
+برای هر الگوی دوره، همه‌ی تغییرات (ساخت، ویرایش، حذف) با چند دستور set-based اعمال می‌شوند:
+یک bulk_create، یک bulk_update، یک delete و یک update قفل، داخل یک تراکنش. با dry_run فقط
+برنامه‌ی تغییرات (diff) برگردانده می‌شود و چیزی ذخیره نمی‌شود.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Course, Exercise, ExerciseTemplate, Submission
+from .release import SCHEDULE_FIELDS, release_times, schedule_changes
+
+
+# فیلدهایی که از الگو به تمرین دوره کپی می‌شوند؛ HTML صورت سوال یک بار برای الگو ساخته و کپی می‌شود
+SYNCED_FIELDS = ['title', 'problem_statement', 'problem_statement_html', 'order']
+
+
+class PropagationPlan:
+    def __init__(self):
+        self.to_create = []   # Exercise های جدید
+        self.to_update = []   # (Exercise, {فیلد: (قبلی، جدید)})
+        self.to_link = []     # تمرین‌های قدیمی بدون الگو که با عنوان پیدا و وصل می‌شوند
+        # تمرین‌های الگوی حذف شده یا منتقل شده به الگوی دوره‌ی دیگر: بدون ارسال حذف و با ارسال فقط
+        # قفل می‌شوند تا کار دانشجویان از بین نرود
+        self.to_delete = []
+        self.to_lock = []
+
+    def __bool__(self):
+        return bool(self.to_create or self.to_update or self.to_link or self.to_delete or self.to_lock)
+
+    def describe(self):
+        lines = []
+        for exercise in self.to_create:
+            lines.append(f'+ [{exercise.course_id}] {exercise.title} (order {exercise.order})')
+        for exercise, changes in self.to_update:
+            for field, (old, new) in changes.items():
+                old_text, new_text = str(old)[:40], str(new)[:40]
+                lines.append(f'~ [{exercise.course_id}] #{exercise.pk} {field}: {old_text!r} -> {new_text!r}')
+        for exercise in self.to_link:
+            lines.append(f'= [{exercise.course_id}] #{exercise.pk} linked to template {exercise.source_template_id}')
+        for exercise in self.to_delete:
+            lines.append(f'- [{exercise.course_id}] #{exercise.pk} {exercise.title}')
+        for exercise in self.to_lock:
+            lines.append(f'! [{exercise.course_id}] #{exercise.pk} {exercise.title} (has submissions, locked)')
+        return lines
+
+
+def _has_submissions():
+    return Exists(Submission.objects.filter(exercise=OuterRef('pk')))
+
+
+def _plan_removals(plan, exercises):
+    for exercise in exercises.annotate(has_submissions=_has_submissions()).only('pk', 'course_id', 'title'):
+        (plan.to_lock if exercise.has_submissions else plan.to_delete).append(exercise)
+
+
+def template_to_exercise(template, course):
+    # زمان‌های گذشته هم نگه داشته می‌شوند تا دور بعدی release_exercises وضعیت تمرین را درست کند
+    unlock_at, lock_at = release_times(template, course)
+    return Exercise(
+        course_id=course.pk,
+        source_template=template,
+        title=template.title,
+        problem_statement=template.problem_statement,
+        problem_statement_html=template.problem_statement_html,
+        order=template.order,
+        is_locked=True,  # پیش‌فرض قفل باشد
+        unlock_at=unlock_at,
+        lock_at=lock_at,
+    )
+
+
+def plan_course_template(course_template_id, course_ids=None):
+    """مقایسه‌ی الگوها با تمرین‌های موجود؛ پنج کوئری صرف‌نظر از تعداد دوره‌ها و تمرین‌ها."""
+    plan = PropagationPlan()
+    templates = list(ExerciseTemplate.objects.filter(course_template_id=course_template_id))
+    if course_ids is None:
+        course_ids = list(
+            Course.objects.filter(template_id=course_template_id).values_list('pk', flat=True)
+        )
+    if not course_ids:
+        return plan
+    # تمرین‌هایی که الگویشان دیگر مال این الگوی دوره نیست
+    _plan_removals(plan, Exercise.objects.filter(course_id__in=course_ids, source_template__isnull=False).exclude(
+        source_template__course_template_id=course_template_id,
+    ))
+    if not templates:
+        return plan
+    courses = Course.objects.only('pk', 'starts_at', 'release_offset').in_bulk(course_ids)
+    now = timezone.now()
+
+    linked = {}
+    unlinked_by_title = {}
+    exercises = Exercise.objects.filter(course_id__in=course_ids).filter(
+        Q(source_template__isnull=True) | Q(source_template__in=templates)
+    )
+    for exercise in exercises:
+        if exercise.source_template_id is None:
+            unlinked_by_title.setdefault((exercise.course_id, exercise.title), exercise)
+        else:
+            linked[(exercise.course_id, exercise.source_template_id)] = exercise
+
+    for template in templates:
+        for course_id in course_ids:
+            exercise = linked.get((course_id, template.pk))
+            if exercise is None:
+                legacy = unlinked_by_title.pop((course_id, template.title), None)
+                if legacy is not None:
+                    legacy.source_template = template
+                    plan.to_link.append(legacy)
+                    exercise = legacy
+                else:
+                    plan.to_create.append(template_to_exercise(template, courses[course_id]))
+                    continue
+
+            changes = {
+                field: (getattr(exercise, field), getattr(template, field))
+                for field in SYNCED_FIELDS
+                if getattr(exercise, field) != getattr(template, field)
+            }
+            changes.update(schedule_changes(exercise, template, courses[course_id], now))
+            if changes:
+                for field, (_, new) in changes.items():
+                    setattr(exercise, field, new)
+                plan.to_update.append((exercise, changes))
+    return plan
+
+
+def apply_plan(plan):
+    if not plan:
+        return plan
+    touched_courses = set()
+    with transaction.atomic():
+        if plan.to_create:
+            Exercise.objects.bulk_create(plan.to_create)
+            touched_courses.update(exercise.course_id for exercise in plan.to_create)
+
+        updated = {exercise.pk: exercise for exercise, _ in plan.to_update}
+        updated.update({exercise.pk: exercise for exercise in plan.to_link})
+        if updated:
+            Exercise.objects.bulk_update(list(updated.values()), SYNCED_FIELDS + SCHEDULE_FIELDS + ['source_template'])
+            touched_courses.update(exercise.course_id for exercise in updated.values())
+
+        removed = plan.to_delete + plan.to_lock
+        if removed:
+            # دوباره با شرط ارسال: تمرینی که از زمان برنامه‌ریزی ارسال گرفته، فقط قفل می‌شود
+            exercises = Exercise.objects.filter(pk__in=[exercise.pk for exercise in removed])
+            with exercise_signals_suppressed():
+                exercises.filter(~_has_submissions()).delete()
+            exercises.update(is_locked=True)
+            touched_courses.update(exercise.course_id for exercise in removed)
+
+        _after_bulk_change(touched_courses, totals_changed=bool(plan.to_create or plan.to_delete))
+    return plan
+
+
+def sync_course_template(course_template_id, dry_run=False, course_ids=None):
+    plan = plan_course_template(course_template_id, course_ids=course_ids)
+    if not dry_run:
+        apply_plan(plan)
+    return plan
+
+
+def remove_template_exercises(template_ids, dry_run=False):
+    """
+    قبل از حذف الگو صدا زده می‌شود (بعد از حذف، اتصال SET_NULL شده و از دست می‌رود).
+    تمرین‌های بدون ارسال با یک delete حذف می‌شوند؛ تمرین‌هایی که ارسال دارند حذف نمی‌شوند
+    (تا کار دانشجویان از بین نرود) و فقط قفل می‌شوند.
+    """
+    plan = PropagationPlan()
+    _plan_removals(plan, Exercise.objects.filter(source_template_id__in=template_ids))
+    if not dry_run:
+        apply_plan(plan)
+    return plan
+
+
+# حذف گروهی تمرین‌ها: delete() برای هر ردیف post_delete می‌فرستد و گیرنده‌های تمرین (پیشرفت، دفتر نمره،
+# لیست تمرین‌ها) هر کدام یک بار برای هر تمرین اجرا می‌شدند. داخل این بلوک آن‌ها کاری نمی‌کنند و
+# _after_bulk_change یک بار برای هر دوره همان کار را می‌کند.
+_suppressed = threading.local()
+
+
+@contextmanager
+def exercise_signals_suppressed():
+    previous = getattr(_suppressed, 'active', False)
+    _suppressed.active = True
+    try:
+        yield
+    finally:
+        _suppressed.active = previous
+
+
+def exercise_signals_are_suppressed():
+    return getattr(_suppressed, 'active', False)
+
+
+def _after_bulk_change(course_ids, totals_changed):
+    # bulk_create و bulk_update سیگنال نمی‌فرستند؛ جدول پیشرفت، کش دفتر نمره و لیست تمرین‌ها را خودمان به‌روز می‌کنیم
+    from .cache import bump_exercises
+    from .gradebook import bump_gradebook
+    from .progress import refresh_course_totals
+
+    if not course_ids:
+        return
+    if totals_changed:
+        refresh_course_totals(course_ids)
+    transaction.on_commit(lambda: bump_gradebook(*course_ids))
+    transaction.on_commit(lambda: bump_exercises(*course_ids))
+
+
+# --- تعویق همگام‌سازی تا پایان ذخیره‌ی فرم (مثلا inline ادمین با ۵۰ تمرین) ---
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_propagation():
+    """
+    داخل این بلوک، ذخیره‌ی هر الگو فقط id الگوی دوره را یادداشت می‌کند و در پایان
+    هر الگوی دوره یک بار همگام می‌شود.
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    _deferred.pending = set()
+    try:
+        yield
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+    for course_template_id in pending:
+        sync_course_template(course_template_id)
+
+
+def request_sync(course_template_id):
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.add(course_template_id)
+    else:
+        sync_course_template(course_template_id)
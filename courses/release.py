@@ -0,0 +1,136 @@
+"""
+انتشار زمان‌بندی شده‌ی تمرین‌ها (باز و قفل شدن خودکار).
+
+الگوی تمرین فاصله‌ی باز و قفل شدن از شروع دوره را دارد (unlock_offset/lock_offset) و هر تمرین
+دوره زمان مطلق آن را (unlock_at/lock_at):
+    زمان = course.starts_at + course.release_offset + offset الگو
+این زمان‌ها «تغییر در انتظار» هستند: دستور release_exercises در هر دور همه‌ی تغییرهای سررسیده را با
+یک UPDATE اعمال و خالی می‌کند، پس ایندکس‌های جزئی روی این دو ستون فقط ردیف‌های در انتظار را دارند
+و زمان بیدار شدن بعدی با یک جست‌وجوی ایندکس پیدا می‌شود، بدون مرور همه‌ی تمرین‌ها.
+
+release_offset دوره‌ها با stagger_courses در یک بازه پخش می‌شود تا دوره‌های هم‌الگو (و
+دانشجویانشان) هم‌زمان سراغ سایت نیایند.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Course, Exercise
+
+
+SCHEDULE_FIELDS = ['unlock_at', 'lock_at']
+
+
+def release_times(template, course):
+    """(unlock_at, lock_at) تمرین ساخته شده از template در course؛ بدون شروع دوره یا offset، None."""
+    if template is None or course.starts_at is None:
+        return None, None
+    start = course.starts_at + course.release_offset
+    return tuple(
+        None if offset is None else start + offset
+        for offset in (template.unlock_offset, template.lock_offset)
+    )
+
+
+def schedule_changes(exercise, template, course, now):
+    """
+    تغییر فیلدهای زمان‌بندی یک تمرین موجود، به شکل {فیلد: (قبلی، جدید)}.
+    زمان گذشته‌ای که فیلدش خالی است دوباره زمان‌بندی نمی‌شود: آن تغییر قبلا اعمال شده و نباید قفل یا
+    باز کردن دستی مدرس را برگرداند. ولی زمان هنوز در انتظار به زمان جدید می‌رود، حتی اگر گذشته باشد،
+    تا دور بعدی release_exercises اعمالش کند.
+    """
+    changes = {}
+    for field, wanted in zip(SCHEDULE_FIELDS, release_times(template, course)):
+        current = getattr(exercise, field)
+        if current is None and wanted is not None and wanted <= now:
+            continue
+        if current != wanted:
+            changes[field] = (current, wanted)
+    return changes
+
+
+def reschedule_courses(course_ids):
+    """بعد از تغییر شروع یا تاخیر انتشار دوره‌ها؛ یک خواندن و یک bulk_update."""
+    now = timezone.now()
+    courses = Course.objects.in_bulk(course_ids)
+    exercises = Exercise.objects.filter(
+        course_id__in=course_ids, source_template__isnull=False,
+    ).select_related('source_template')
+    changed = []
+    for exercise in exercises:
+        changes = schedule_changes(exercise, exercise.source_template, courses[exercise.course_id], now)
+        if changes:
+            for field, (_, new) in changes.items():
+                setattr(exercise, field, new)
+            changed.append(exercise)
+    if changed:
+        Exercise.objects.bulk_update(changed, SCHEDULE_FIELDS)
+    return len(changed)
+
+
+def stagger_courses(courses, window):
+    """
+    release_offset دوره‌ها (به ترتیب شماره‌ی دوره) به فاصله‌ی مساوی در window پخش می‌شود؛
+    دوره‌ی اول بدون تاخیر و آخری window * (n-1)/n.
+    """
+    courses = sorted(courses, key=lambda course: (course.course_number, course.pk))
+    step = window / len(courses) if courses else timedelta(0)
+    for index, course in enumerate(courses):
+        course.release_offset = step * index
+    with transaction.atomic():
+        Course.objects.bulk_update(courses, ['release_offset'])
+        reschedule_courses([course.pk for course in courses])
+    return courses
+
+
+class ReleaseResult:
+    def __init__(self):
+        self.unlocked = 0
+        self.locked = 0
+        self.course_ids = set()
+
+    def __bool__(self):
+        return bool(self.unlocked or self.locked)
+
+
+def apply_due_releases(now=None):
+    """
+    همه‌ی تغییرهای سررسیده با یک UPDATE. اگر هر دو زمان گذشته باشد (مثلا دستور مدتی خاموش بوده)
+    قفل شدن برنده است چون همیشه بعد از باز شدن است.
+    """
+    from .cache import bump_exercises
+
+    now = now or timezone.now()
+    result = ReleaseResult()
+    due = Q(unlock_at__lte=now) | Q(lock_at__lte=now)
+    with transaction.atomic():
+        rows = list(Exercise.objects.select_for_update().filter(due).order_by().values_list('pk', 'course_id', 'lock_at'))
+        if not rows:
+            return result
+        Exercise.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+            is_locked=Case(When(lock_at__lte=now, then=Value(True)), default=Value(False)),
+            unlock_at=Case(When(unlock_at__lte=now, then=Value(None)), default=F('unlock_at')),
+            lock_at=Case(When(lock_at__lte=now, then=Value(None)), default=F('lock_at')),
+        )
+        for _, course_id, lock_at in rows:
+            if lock_at is not None and lock_at <= now:
+                result.locked += 1
+            else:
+                result.unlocked += 1
+            result.course_ids.add(course_id)
+        # update سیگنال نمی‌فرستد
+        course_ids = list(result.course_ids)
+        transaction.on_commit(lambda: bump_exercises(*course_ids))
+    return result
+
+
+def next_release_at():
+    """نزدیک‌ترین تغییر در انتظار، یا None؛ دو جست‌وجوی ایندکس (ORDER BY ... LIMIT 1)."""
+    times = [
+        Exercise.objects.filter(**{f'{field}__isnull': False}).order_by(field).values_list(field, flat=True).first()
+        for field in SCHEDULE_FIELDS
+    ]
+    times = [value for value in times if value is not None]
+    return min(times) if times else None
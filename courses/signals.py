@@ -1,6 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Course, Exercise, ExerciseTemplate
+from .models import Course, CourseTemplate, Exercise, ExerciseTemplate, SiteSetting, EnrollmentRequest, Submission
+from .cache import (
+    invalidate_site_setting, invalidate_signup_catalog, bump_version, user_version_name, bump_exercises,
+)
+from .progress import record_submission_created, refresh_submitted_count, refresh_course_totals
+from .gradebook import bump_gradebook, bump_gradebook_for_exercises
+from .propagation import exercise_signals_are_suppressed, remove_template_exercises, template_to_exercise
+from .release import reschedule_courses
 
 
 @receiver(post_save, sender=Course)
@@ -11,15 +19,124 @@ def create_exercises_from_template(sender, instance, created, **kwargs):
     if created: # فقط بار اول که ساخته شد
         templates = ExerciseTemplate.objects.filter(course_template=instance.template)
         
-        exercises_to_create = []
-        for temp in templates:
-            exercises_to_create.append(Exercise(
-                course=instance,
-                title=temp.title,
-                problem_statement=temp.problem_statement,
-                order=temp.order,
-                is_locked=True # پیش‌فرض همه قفل هستند
-            ))
-        
+        exercises_to_create = [template_to_exercise(temp, instance) for temp in templates]
+
         # ثبت یکجای همه تمرینات در دیتابیس (برای سرعت بالا)
         Exercise.objects.bulk_create(exercises_to_create)
+        # bulk_create سیگنال نمی‌فرستد؛ جدول پیشرفت را خودمان به‌روز می‌کنیم
+        refresh_course_totals([instance.pk])
+        transaction.on_commit(lambda: bump_exercises(instance.pk))
+
+
+@receiver(post_save, sender=Course)
+def reschedule_exercises_of_course(sender, instance, created, update_fields=None, **kwargs):
+    """با تغییر زمان شروع یا تاخیر انتشار دوره، زمان‌های در انتظار تمرین‌ها دوباره حساب می‌شوند."""
+    if created or (update_fields is not None and not {'starts_at', 'release_offset'} & set(update_fields)):
+        return
+    reschedule_courses([instance.pk])
+
+
+@receiver(pre_delete, sender=ExerciseTemplate)
+def remove_exercises_of_deleted_template(sender, instance, **kwargs):
+    """
+    با حذف الگو، تمرین‌های کپی شده‌ی بدون ارسال حذف و بقیه قفل می‌شوند.
+    باید قبل از حذف باشد چون بعد از آن source_template تمرین‌ها NULL می‌شود.
+    """
+    remove_template_exercises([instance.pk])
+
+
+# --- باطل کردن کش تنظیمات سایت و فهرست دوره‌های ثبت‌نام ---
+
+@receiver([post_save, post_delete], sender=SiteSetting)
+def invalidate_site_setting_cache(sender, **kwargs):
+    invalidate_site_setting()
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_signup_catalog_cache(sender, **kwargs):
+    invalidate_signup_catalog()
+
+
+# --- باطل کردن کش کارت‌های داشبورد (course_list) ---
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=CourseTemplate)   # کارت‌ها عنوان الگو را نشان می‌دهند
+def bump_courses_version(sender, **kwargs):
+    bump_version('courses')
+
+
+@receiver([post_save, post_delete], sender=EnrollmentRequest)
+def bump_user_version_on_request(sender, instance, **kwargs):
+    bump_version(user_version_name(instance.student_id))
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def bump_user_version_on_enrollment(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if reverse:
+        # از سمت کاربر: user.courses_joined.add(...)
+        bump_version(user_version_name(instance.pk))
+    elif action == 'pre_clear':
+        # در clear لیست دانشجوها در pk_set نمی‌آید؛ قبل از پاک شدن آن‌ها را می‌خوانیم
+        user_ids = instance.students.values_list('pk', flat=True)
+        bump_version(*[user_version_name(user_id) for user_id in user_ids])
+    elif pk_set:
+        bump_version(*[user_version_name(user_id) for user_id in pk_set])
+
+    # ردیف‌های ماتریس نمرات (اعضای دوره) هم عوض شده‌اند
+    if reverse:
+        bump_gradebook(*(pk_set or instance.courses_joined.values_list('pk', flat=True)))
+    else:
+        bump_gradebook(instance.pk)
+
+
+# --- به‌روزرسانی جدول پیشرفت دانشجویان (CourseProgress) ---
+
+@receiver(post_save, sender=Submission)
+def update_progress_on_submission(sender, instance, created, **kwargs):
+    if created:
+        record_submission_created(instance)
+
+
+@receiver(post_delete, sender=Submission)
+def update_progress_on_submission_delete(sender, instance, **kwargs):
+    refresh_submitted_count(instance.student_id, instance.exercise_id)
+
+
+@receiver(post_save, sender=Exercise)
+def update_progress_on_exercise_create(sender, instance, created, **kwargs):
+    if created:
+        refresh_course_totals([instance.course_id])
+
+
+@receiver(post_delete, sender=Exercise)
+def update_progress_on_exercise_delete(sender, instance, **kwargs):
+    if exercise_signals_are_suppressed():
+        return
+    refresh_course_totals([instance.course_id])
+
+
+# --- باطل کردن کش ماتریس نمرات (courses/gradebook.py) ---
+
+@receiver([post_save, post_delete], sender=Submission)
+def bump_gradebook_on_submission(sender, instance, **kwargs):
+    # exercise_id و نه instance.exercise: در حذف cascade برای هر ارسال یک کوئری جدا زده می‌شد
+    bump_gradebook_for_exercises(instance.exercise_id)
+
+
+@receiver([post_save, post_delete], sender=Exercise)
+def bump_gradebook_on_exercise(sender, instance, **kwargs):
+    if exercise_signals_are_suppressed():
+        return
+    bump_gradebook(instance.course_id)
+
+
+# --- باطل کردن کش لیست تمرین‌های دوره (courses/cache.py) ---
+
+@receiver([post_save, post_delete], sender=Exercise)
+def bump_exercises_on_exercise(sender, instance, **kwargs):
+    if exercise_signals_are_suppressed():
+        return
+    course_id = instance.course_id
+    transaction.on_commit(lambda: bump_exercises(course_id))
@@ -0,0 +1,341 @@
+"""
+تشخیص کد کپی شده بین ارسال‌های یک تمرین با اثر انگشت winnowing.
+
+کد پایتون توکن‌بندی و نرمال می‌شود (نام متغیرها، عددها و رشته‌ها یکسان می‌شوند و توضیحات حذف
+می‌شوند)، از هر K توکن پشت سر هم یک hash ساخته می‌شود و از هر پنجره‌ی WINDOW تایی کمینه‌ی
+hash ها نگه داشته می‌شود. هر کپی مشترک به طول K + WINDOW - 1 توکن حتما حداقل یک hash مشترک دارد.
+
+hash ها در ایندکس معکوس FingerprintPosting ذخیره می‌شوند؛ پس برای هر ارسال جدید فقط ارسال‌هایی
+بررسی می‌شوند که hash مشترک دارند (بدون مقایسه‌ی دوبه‌دوی همه). hash هایی که در تعداد زیادی از
+ارسال‌ها هستند (کد آماده‌ی صورت سوال، input().split() و ...) به CommonFingerprint منتقل و
+نادیده گرفته می‌شوند.
+
+ارسال‌های جدید با similarity_pending در صف می‌مانند و index_pending (دستور
+build_similarity_index --pending) بیرون از درخواست آپلود ایندکسشان می‌کند.
+"""
+import builtins
+import hashlib
+import io
+import keyword
+import os
+import tokenize
+import zipfile
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import CodeFingerprint, CommonFingerprint, FingerprintPosting, SimilarityPair, Submission
+
+
+K = 6
+WINDOW = 4
+SIMILARITY_THRESHOLD = 0.6
+MIN_SHARED = 5
+# hash هایی که در بیش از این سهم از ارسال‌های تمرین آمده‌اند مشترک عمومی حساب می‌شوند
+COMMON_HASH_FRACTION = 0.05
+MIN_COMMON_LIMIT = 10
+# سقف مطلق: گروه کپی بزرگ‌تر از این بعید است و لیست‌های بلندتر هزینه‌ی شمارش جفت‌ها را n² می‌کنند
+MAX_COMMON_LIMIT = 50
+MAX_SOURCE_BYTES = 1024 * 1024
+BULK_SIZE = 5000
+
+_BUILTIN_NAMES = set(dir(builtins))
+_SKIPPED = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+_STRING_PARTS = {
+    getattr(tokenize, name) for name in ('FSTRING_MIDDLE', 'FSTRING_END') if hasattr(tokenize, name)
+}
+_STRING_STARTS = {tokenize.STRING} | {
+    getattr(tokenize, name) for name in ('FSTRING_START',) if hasattr(tokenize, name)
+}
+
+
+def normalized_tokens(source):
+    tokens = []
+    try:
+        for token in tokenize.tokenize(io.BytesIO(source).readline):
+            kind = token.type
+            if kind in _SKIPPED or kind in _STRING_PARTS:
+                continue
+            if kind == tokenize.NAME:
+                # کلمات کلیدی و توابع داخلی ساختار کد هستند؛ بقیه‌ی نام‌ها (قابل تغییر) یکسان می‌شوند
+                name = token.string
+                tokens.append(name if keyword.iskeyword(name) or name in _BUILTIN_NAMES else 'V')
+            elif kind == tokenize.NUMBER:
+                tokens.append('N')
+            elif kind in _STRING_STARTS:
+                tokens.append('S')
+            elif kind == tokenize.NEWLINE:
+                tokens.append(';')
+            elif kind == tokenize.INDENT:
+                tokens.append('{')
+            elif kind == tokenize.DEDENT:
+                tokens.append('}')
+            else:
+                tokens.append(token.string)
+    except (tokenize.TokenError, SyntaxError):
+        # کد ناقص هم تا جایی که توکن‌بندی شده قابل مقایسه است
+        pass
+    return tokens
+
+
+def _kgram_hash(gram):
+    digest = hashlib.blake2b(' '.join(gram).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def winnow(tokens, k=K, window=WINDOW):
+    hashes = [_kgram_hash(tokens[i:i + k]) for i in range(len(tokens) - k + 1)]
+    if len(hashes) <= window:
+        return set(hashes)
+    selected = set()
+    previous = -1
+    for start in range(len(hashes) - window + 1):
+        # کمینه‌ی پنجره؛ در تساوی، سمت راست‌ترین
+        position = min(range(start, start + window), key=lambda i: (hashes[i], -i))
+        if position != previous:
+            selected.add(hashes[position])
+            previous = position
+    return selected
+
+
+def fingerprint_source(source):
+    return sorted(winnow(normalized_tokens(source)))
+
+
+def read_source(submission):
+    """کد پایتون ارسال (برای ZIP همه‌ی فایل‌های .py پشت سر هم)، یا None برای فایل‌های دیگر."""
+    name = (submission.original_name or submission.submitted_file.name).lower()
+    try:
+        with submission.submitted_file.open('rb') as handle:
+            if name.endswith('.py'):
+                return handle.read(MAX_SOURCE_BYTES)
+            if name.endswith('.zip'):
+                parts = []
+                remaining = MAX_SOURCE_BYTES
+                with zipfile.ZipFile(handle) as archive:
+                    for member in sorted(archive.namelist()):
+                        if remaining <= 0:
+                            break
+                        if member.endswith('.py') and not os.path.basename(member).startswith('.'):
+                            # فقط تا سقف از حالت فشرده باز می‌شود (zip bomb حافظه را پر نمی‌کند)
+                            with archive.open(member) as source:
+                                parts.append(source.read(remaining))
+                            remaining -= len(parts[-1])
+                return b'\n'.join(parts)
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return None
+
+
+def fingerprints_for(submissions):
+    """{submission_id: [hash, ...]}؛ اثر انگشت هر محتوا فقط یک بار ساخته و در CodeFingerprint کش می‌شود."""
+    submissions = list(submissions)
+    digests = {submission.sha256 for submission in submissions if submission.sha256}
+    cached = dict(CodeFingerprint.objects.filter(sha256__in=digests).values_list('sha256', 'hashes'))
+
+    result = {}
+    new_rows = {}
+    for submission in submissions:
+        digest = submission.sha256
+        if digest and digest in cached:
+            result[submission.pk] = cached[digest]
+            continue
+        source = read_source(submission)
+        if source is None:
+            continue
+        hashes = fingerprint_source(source)
+        result[submission.pk] = hashes
+        if digest:
+            cached[digest] = hashes
+            new_rows[digest] = CodeFingerprint(sha256=digest, hashes=hashes)
+    CodeFingerprint.objects.bulk_create(new_rows.values(), batch_size=500, ignore_conflicts=True)
+    return result
+
+
+def common_limit(submission_count):
+    return min(MAX_COMMON_LIMIT, max(MIN_COMMON_LIMIT, int(submission_count * COMMON_HASH_FRACTION)))
+
+
+def _similarity(shared, size_a, size_b):
+    return shared / max(1, min(size_a, size_b))
+
+
+def index_submission(submission):
+    """
+    ارسال جدید را به ایندکس اضافه می‌کند و جفت‌های مشکوک آن را ثبت می‌کند.
+    hash های عمومی در CommonFingerprint هستند و posting ندارند، پس هر لیست posting حداکثر
+    common_limit ردیف دارد و هزینه‌ی هر ارسال به تعداد کل ارسال‌های تمرین بستگی ندارد.
+    """
+    hashes = fingerprints_for([submission]).get(submission.pk)
+    if not hashes:
+        return []
+    exercise_id = submission.exercise_id
+    limit = common_limit(Submission.objects.filter(exercise_id=exercise_id).count())
+
+    with transaction.atomic():
+        FingerprintPosting.objects.filter(submission=submission).delete()
+        common = set(
+            CommonFingerprint.objects.filter(exercise_id=exercise_id, hash__in=hashes)
+            .values_list('hash', flat=True)
+        )
+        postings = FingerprintPosting.objects.filter(exercise_id=exercise_id)
+        frequency = dict(
+            postings.filter(hash__in=[value for value in hashes if value not in common])
+            .values('hash').annotate(n=Count('pk')).values_list('hash', 'n')
+        )
+        # hash هایی که با این ارسال از حد می‌گذرند عمومی می‌شوند و posting هایشان حذف می‌شود
+        newly_common = [value for value, count in frequency.items() if count + 1 > limit]
+        if newly_common:
+            CommonFingerprint.objects.bulk_create(
+                [CommonFingerprint(exercise_id=exercise_id, hash=value) for value in newly_common],
+                ignore_conflicts=True,
+            )
+            postings.filter(hash__in=newly_common).delete()
+            common.update(newly_common)
+
+        usable = [value for value in hashes if value not in common]
+        FingerprintPosting.objects.bulk_create(
+            [FingerprintPosting(exercise_id=exercise_id, submission_id=submission.pk, hash=value) for value in usable],
+            batch_size=BULK_SIZE,
+        )
+        matches = dict(
+            postings.filter(hash__in=usable)
+            .exclude(submission__student_id=submission.student_id)
+            .values('submission_id').annotate(shared=Count('pk'))
+            .filter(shared__gte=MIN_SHARED).values_list('submission_id', 'shared')
+        )
+        if not matches:
+            return []
+        sizes = dict(
+            FingerprintPosting.objects.filter(submission_id__in=list(matches))
+            .values('submission_id').annotate(n=Count('pk')).values_list('submission_id', 'n')
+        )
+
+        pairs = []
+        for other_id, shared in matches.items():
+            similarity = _similarity(shared, len(usable), sizes.get(other_id, 0))
+            if similarity >= SIMILARITY_THRESHOLD:
+                first, second = sorted((submission.pk, other_id))
+                pairs.append(SimilarityPair(
+                    exercise_id=exercise_id, submission_a_id=first, submission_b_id=second,
+                    shared=shared, similarity=similarity,
+                ))
+        SimilarityPair.objects.bulk_create(
+            pairs, update_conflicts=True,
+            unique_fields=['submission_a', 'submission_b'], update_fields=['shared', 'similarity'],
+        )
+    return pairs
+
+
+def index_pending(batch_size=100):
+    """
+    یک دسته از ارسال‌های در صف را ایندکس می‌کند و (تعداد ایندکس شده، تعداد خطا) را برمی‌گرداند.
+    ارسالی که خطا داد هم از صف خارج می‌شود تا صف گیر نکند؛ build_similarity_index بعدا آن را
+    همراه کل تمرین بازسازی می‌کند.
+    """
+    submissions = list(
+        Submission.objects.filter(similarity_pending=True).only(
+            'pk', 'student_id', 'exercise_id', 'submitted_file', 'original_name', 'sha256',
+        ).order_by('pk')[:batch_size]
+    )
+    failed = 0
+    for submission in submissions:
+        try:
+            index_submission(submission)
+        except Exception:
+            failed += 1
+    Submission.objects.filter(pk__in=[submission.pk for submission in submissions]).update(similarity_pending=False)
+    return len(submissions) - failed, failed
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild_exercise(exercise_id, chunk_size=2000):
+    """
+    بازسازی کامل ایندکس و جفت‌های یک تمرین (برای ارسال‌های قدیمی یا تغییر پارامترها).
+    جفت‌ها در حافظه از روی لیست‌های posting شمرده می‌شوند؛ چون لیست hash های عمومی کنار
+    گذاشته می‌شود، هزینه حداکثر common_limit² برای هر hash است، نه n².
+    """
+    submissions = Submission.objects.filter(exercise_id=exercise_id).only(
+        'pk', 'student_id', 'exercise_id', 'submitted_file', 'original_name', 'sha256',
+    ).order_by('pk')
+
+    students = {}
+    fingerprints = {}
+    batch = []
+    for submission in submissions.iterator(chunk_size=chunk_size):
+        students[submission.pk] = submission.student_id
+        batch.append(submission)
+        if len(batch) >= chunk_size:
+            fingerprints.update(fingerprints_for(batch))
+            batch = []
+    fingerprints.update(fingerprints_for(batch))
+
+    index = defaultdict(list)
+    for submission_id, hashes in fingerprints.items():
+        for value in hashes:
+            index[value].append(submission_id)
+
+    limit = common_limit(len(students))
+    common = []
+    shared = Counter()
+    usable_sizes = Counter()
+    for value, submission_ids in index.items():
+        if len(submission_ids) > limit:
+            common.append(value)
+            continue
+        usable_sizes.update(submission_ids)
+        for position, first in enumerate(submission_ids):
+            for second in submission_ids[position + 1:]:
+                if students[first] != students[second]:
+                    shared[(first, second)] += 1
+
+    pairs = []
+    for (first, second), count in shared.items():
+        if count < MIN_SHARED:
+            continue
+        similarity = _similarity(count, usable_sizes[first], usable_sizes[second])
+        if similarity >= SIMILARITY_THRESHOLD:
+            pairs.append(SimilarityPair(
+                exercise_id=exercise_id, submission_a_id=first, submission_b_id=second,
+                shared=count, similarity=similarity,
+            ))
+
+    with transaction.atomic():
+        FingerprintPosting.objects.filter(exercise_id=exercise_id).delete()
+        CommonFingerprint.objects.filter(exercise_id=exercise_id).delete()
+        SimilarityPair.objects.filter(exercise_id=exercise_id).delete()
+        CommonFingerprint.objects.bulk_create(
+            [CommonFingerprint(exercise_id=exercise_id, hash=value) for value in common], batch_size=BULK_SIZE,
+        )
+        postings = (
+            FingerprintPosting(exercise_id=exercise_id, submission_id=submission_id, hash=value)
+            for value, submission_ids in index.items() if len(submission_ids) <= limit
+            for submission_id in submission_ids
+        )
+        # دسته‌دسته تا برای صدها هزار posting همه‌ی اشیا هم‌زمان در حافظه نباشند
+        for batch in _batched(postings, BULK_SIZE):
+            FingerprintPosting.objects.bulk_create(batch)
+        SimilarityPair.objects.bulk_create(pairs, batch_size=BULK_SIZE)
+        if students:
+            # ارسال‌های بازسازی شده دیگر در صف index_pending لازم نیستند
+            submissions.filter(pk__lte=max(students), similarity_pending=True).update(similarity_pending=False)
+    return len(fingerprints), pairs
+
+
+def suspicious_pairs(exercise, limit=200):
+    return (
+        SimilarityPair.objects.filter(exercise=exercise)
+        .select_related('submission_a__student', 'submission_b__student')
+        .order_by('-similarity', '-shared')[:limit]
+    )
@@ -1,3 +1,1627 @@
-from django.test import TestCase
+import base64
+import csv
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+import unittest.mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+
+from users.models import CustomUser
+from . import async_views, urls as course_urls
+from .archive import zip_response
+from .autograder import (
+    MAX_ZIP_MEMBERS, MAX_UNZIPPED_BYTES, SandboxLimits, grade_file, grade_submissions, queue_submissions,
+    queued_submissions, supports_sandbox,
+)
+from .cache import (
+    MISSING, DjangoCacheBackend, ReadThroughCache, TieredBackend, get_signup_catalog, get_site_cache,
+    get_site_setting, get_version, user_version_name,
+)
+from .enrollment import approve_requests
+from .gradebook import build_matrix, get_gradebook_html, import_grades, iter_csv_rows
+from .markup import render_problem_statement
+from .models import (
+    CommonFingerprint, Course, CourseProgress, CourseTemplate, EnrollmentRequest, Exercise, ExerciseTemplate,
+    ExerciseTestCase, FingerprintPosting, SimilarityPair, SiteSetting, Submission,
+)
+from .progress import get_progress, rebuild_progress, record_submission_created
+from .release import apply_due_releases, next_release_at, stagger_courses
+from .similarity import fingerprint_source, index_pending, index_submission, read_source, rebuild_exercise
+from .views import SUBMISSION_HISTORY_LIMIT
+
+
+class CourseMembershipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='پایتون مقدماتی', description='...')
+        cls.course = Course.objects.create(template=template, course_number=137)
+        cls.other_course = Course.objects.create(template=template, course_number=138)
+        cls.student = CustomUser.objects.create(email='student@example.com', first_name='Ali', last_name='Ahmadi')
+        students = [
+            CustomUser(email=f's{i}@example.com', username=f's{i}') for i in range(50)
+        ]
+        cls.course.students.add(cls.student, *CustomUser.objects.bulk_create(students))
+
+    def test_is_member_uses_single_exists_on_through_table(self):
+        user = CustomUser.objects.get(pk=self.student.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.course.is_member(user))
+            self.assertFalse(self.other_course.is_member(user))
+
+        self.assertEqual(len(queries), 2)
+        through_table = Course.students.through._meta.db_table
+        for query in queries:
+            sql = query['sql']
+            self.assertIn(through_table, sql)
+            self.assertIn('LIMIT 1', sql)
+            # جدول کاربران اصلا خوانده نمی‌شود
+            self.assertNotIn(f'FROM "{CustomUser._meta.db_table}"', sql)
+
+    def test_is_member_is_memoized_per_user_object(self):
+        user = CustomUser.objects.get(pk=self.student.pk)
+        self.course.is_member(user)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.course.is_member(user))
+
+    def test_memberships_for_checks_many_courses_in_one_query(self):
+        user = CustomUser.objects.get(pk=self.student.pk)
+        with self.assertNumQueries(1):
+            joined = Course.memberships_for(user, [self.course, self.other_course])
+        self.assertEqual(joined, {self.course.pk})
+        with self.assertNumQueries(0):
+            self.assertFalse(self.other_course.is_member(user))
+
+    def test_course_detail_does_not_load_students(self):
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('courses:course_detail', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_enrolled'])
+        through_table = Course.students.through._meta.db_table
+        membership_queries = [q['sql'] for q in queries if through_table in q['sql']]
+        self.assertEqual(len(membership_queries), 1)
+        self.assertIn('LIMIT 1', membership_queries[0])
+
+
+
+class SiteCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.setting = SiteSetting.objects.create(site_name='آکادمی')
+        cls.template = CourseTemplate.objects.create(title='پایتون', description='...')
+        cls.course = Course.objects.create(template=cls.template, course_number=1, is_active_for_signup=True)
+
+    def setUp(self):
+        cache.clear()
+        get_site_cache().clear()
+
+    def test_read_through_counts_hits_and_misses(self):
+        site_cache = ReadThroughCache(TieredBackend())
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return 'value'
+
+        for _ in range(3):
+            self.assertEqual(site_cache.get_or_load('key', loader), 'value')
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(site_cache.stats(), {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+        site_cache.invalidate('key')
+        site_cache.get_or_load('key', loader)
+        self.assertEqual(len(loads), 2)
+
+    def test_clear_only_removes_own_keys(self):
+        cache.set('unrelated', 1)
+        backend = DjangoCacheBackend()
+        backend.set('key', 'value')
+        backend.clear()
+        self.assertIs(backend.get('key'), MISSING)
+        self.assertEqual(cache.get('unrelated'), 1)
+
+    def test_signup_page_does_not_query_settings_or_catalog(self):
+        url = reverse('account_signup')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for model in (SiteSetting, Course):
+            table = model._meta.db_table
+            self.assertFalse([q['sql'] for q in queries if f'FROM "{table}"' in q['sql']], table)
+
+    def test_saves_invalidate_setting_and_catalog(self):
+        self.assertEqual(get_site_setting().site_name, 'آکادمی')
+        self.assertEqual([pk for pk, _ in get_signup_catalog()], [self.course.pk])
+
+        self.setting.site_name = 'آکادمی پایتون'
+        self.setting.save()
+        other = Course.objects.create(template=self.template, course_number=2, is_active_for_signup=True)
+        with self.assertNumQueries(2):
+            self.assertEqual(get_site_setting().site_name, 'آکادمی پایتون')
+            self.assertEqual([pk for pk, _ in get_signup_catalog()], [self.course.pk, other.pk])
+
+        self.course.is_active_for_signup = False
+        self.course.save()
+        self.assertEqual([pk for pk, _ in get_signup_catalog()], [other.pk])
+
+
+class CourseListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.template = CourseTemplate.objects.create(title='پایتون', description='...')
+        cls.student = CustomUser.objects.create(email='lister@example.com', first_name='Nima', last_name='Rad')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.student)
+
+    def add_courses(self, numbers):
+        for number in numbers:
+            course = Course.objects.create(template=self.template, course_number=number)
+            if number % 2:
+                course.students.add(self.student)
+            else:
+                EnrollmentRequest.objects.create(student=self.student, course=course)
+
+    def count_queries(self):
+        cache.clear()
+        get_site_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('courses:course_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_courses(self):
+        self.add_courses(range(1, 3))
+        few = self.count_queries()
+        self.add_courses(range(3, 41))
+        self.assertEqual(self.count_queries(), few)
+
+    def test_template_title_change_refreshes_cached_cards(self):
+        self.add_courses([1])
+        self.assertContains(self.client.get(reverse('courses:course_list')), 'پایتون')
+        self.template.title = 'پایتون پیشرفته'
+        self.template.save()
+        self.assertContains(self.client.get(reverse('courses:course_list')), 'پایتون پیشرفته')
+
+
+class CourseProgressTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        for order in range(1, 5):
+            ExerciseTemplate.objects.create(course_template=template, title=f'تمرین {order}', order=order)
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.first, cls.second = cls.course.exercises.order_by('order')[:2]
+        cls.student = CustomUser.objects.create(email='progress@example.com', first_name='Ali', last_name='Nouri')
+        cls.course.students.add(cls.student)
+
+    def setUp(self):
+        get_progress(self.student, self.course)
+
+    def progress(self):
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        return progress.submitted_count, progress.total_exercises, progress.percentage
+
+    def submit(self, exercise):
+        return Submission.objects.create(student=self.student, exercise=exercise, submitted_file='p/x.py')
+
+    def test_only_first_submission_of_an_exercise_counts(self):
+        self.submit(self.first)
+        self.submit(self.first)
+        self.assertEqual(self.progress(), (1, 4, 25))
+        self.submit(self.second)
+        self.assertEqual(self.progress(), (2, 4, 50))
+
+    def test_concurrent_first_submissions_are_counted_once(self):
+        # هر دو ارسال قبل از اجرای سیگنال یکدیگر commit شده‌اند
+        both = Submission.objects.bulk_create([
+            Submission(student=self.student, exercise=self.first, submitted_file='p/a.py'),
+            Submission(student=self.student, exercise=self.first, submitted_file='p/b.py'),
+        ])
+        for submission in reversed(both):
+            record_submission_created(submission)
+        self.assertEqual(self.progress(), (1, 4, 25))
+
+    def test_deletes_recount(self):
+        first = self.submit(self.first)
+        again = self.submit(self.first)
+        self.submit(self.second)
+        first.delete()
+        self.assertEqual(self.progress(), (2, 4, 50))
+        again.delete()
+        self.assertEqual(self.progress(), (1, 4, 25))
+        self.second.delete()
+        self.assertEqual(self.progress(), (0, 3, 0))
+
+    def test_rebuild_progress(self):
+        self.submit(self.first)
+        CourseProgress.objects.update(submitted_count=0, total_exercises=0, percentage=0)
+        other = CustomUser.objects.create(email='late@example.com', first_name='Mina', last_name='Sadr')
+        self.course.students.add(other)
+
+        self.assertEqual(rebuild_progress([self.course.pk]), 2)
+        self.assertEqual(self.progress(), (1, 4, 25))
+        self.assertEqual(CourseProgress.objects.get(student=other).submitted_count, 0)
+
+
+class SubmissionUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        ExerciseTemplate.objects.create(course_template=template, title='تمرین', order=1)
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.exercise = cls.course.exercises.get()
+        Exercise.objects.filter(pk=cls.exercise.pk).update(is_locked=False)
+        cls.student = CustomUser.objects.create(email='uploader@example.com', first_name='Ali', last_name='Nouri')
+        cls.outsider = CustomUser.objects.create(email='outsider@example.com', first_name='Sara', last_name='Nouri')
+        cls.course.students.add(cls.student)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.url = reverse('courses:exercise_detail', args=[self.exercise.pk])
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def post(self, client=None, name='solution.py'):
+        client = client or self.client
+        return client.post(self.url, {'submitted_file': SimpleUploadedFile(name, b'print(1)\n')})
+
+    def test_valid_upload_is_stored_by_content_hash(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.post().status_code, 302)
+        submission = Submission.objects.get()
+        self.assertEqual(self.stored_files(), [submission.submitted_file.name])
+        self.assertEqual(submission.original_name, 'solution.py')
+
+    def test_rejected_requests_store_nothing(self):
+        locked = Course.objects.create(template=self.course.template, course_number=2)
+        locked.students.add(self.student)
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(self.student)
+        csrf_client.get(self.url)   # کوکی CSRF هست ولی توکن فرم نه، پس بدنه خوانده می‌شود
+        cases = {
+            'anonymous': (lambda: self.post(Client()), 302),
+            'not a member': (lambda: (self.client.force_login(self.outsider), self.post())[1], 302),
+            'locked': (lambda: (self.client.force_login(self.student), self.client.post(
+                reverse('courses:exercise_detail', args=[locked.exercises.get().pk]),
+                {'submitted_file': SimpleUploadedFile('a.py', b'x')},
+            ))[1], 403),
+            'missing csrf token': (lambda: self.post(csrf_client), 403),
+            'invalid form': (lambda: (self.client.force_login(self.student), self.post(name='x' * 120 + '.py'))[1], 200),
+        }
+        for case, (send, status) in cases.items():
+            with self.subTest(case):
+                self.assertEqual(send().status_code, status)
+                self.assertEqual(self.stored_files(), [])
+        self.assertFalse(Submission.objects.exists())
+
+
+class AsyncViewTests(TestCase):
+    """صفحه‌های دانشجو با ASYNC_VIEWS=True (courses/async_views.py)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # urls.py نسخه‌ی ویوها را هنگام import انتخاب می‌کند
+        # cleanup ها برعکس اجرا می‌شوند: اول تنظیم برمی‌گردد، بعد مسیرها دوباره خوانده می‌شوند
+        cls.addClassCleanup(cls.reload_urls)
+        cls.enterClassContext(override_settings(ASYNC_VIEWS=True))
+        cls.reload_urls()
+
+    @staticmethod
+    def reload_urls():
+        # include() مسیرهای courses را هنگام import شدن config/urls.py می‌سازد، پس آن هم دوباره خوانده می‌شود
+        importlib.reload(course_urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        for order in (1, 2):
+            ExerciseTemplate.objects.create(course_template=template, title=f'تمرین {order}', order=order)
+        cls.course = Course.objects.create(template=template, course_number=1, title='پایتون ۱')
+        cls.other = Course.objects.create(template=template, course_number=2, title='پایتون ۲', is_active_for_signup=True)
+        cls.exercise = cls.course.exercises.get(order=1)
+        Exercise.objects.filter(pk=cls.exercise.pk).update(is_locked=False)
+        cls.student = CustomUser.objects.create(email='async@example.com', first_name='Ali', last_name='Async')
+        cls.course.students.add(cls.student)
+        Submission.objects.create(student=cls.student, exercise=cls.exercise, submitted_file='m/a.py')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.student)
+
+    def test_urls_use_async_views(self):
+        self.assertIs(resolve(reverse('courses:course_list')).func, async_views.course_list)
+        self.assertIs(resolve(reverse('courses:exercise_detail', args=[1])).func, async_views.exercise_detail)
+
+    def test_course_list(self):
+        response = self.client.get(reverse('courses:course_list'))
+        self.assertContains(response, 'دوره شماره 2')
+        self.assertContains(response, reverse('courses:course_detail', args=[self.course.pk]))
+        # بار دوم کارت‌ها از کش می‌آیند
+        self.assertContains(self.client.get(reverse('courses:course_list')), 'دوره شماره 2')
+
+    def test_course_detail(self):
+        response = self.client.get(reverse('courses:course_detail', args=[self.course.pk]))
+        self.assertTrue(response.context['is_enrolled'])
+        self.assertEqual(len(response.context['exercises']), 2)
+        self.assertEqual((response.context['submitted_count'], response.context['total_exercises']), (1, 2))
+
+        response = self.client.get(reverse('courses:course_detail', args=[self.other.pk]))
+        self.assertFalse(response.context['is_enrolled'])
+        self.assertEqual(response.context['exercises'], [])
+        self.assertEqual(self.client.get(reverse('courses:course_detail', args=[9999])).status_code, 404)
+
+    def test_exercise_detail(self):
+        response = self.client.get(reverse('courses:exercise_detail', args=[self.exercise.pk]))
+        self.assertEqual(len(response.context['previous_submissions']), 1)
+        self.assertFalse(response.context['more_submissions'])
+
+        locked = self.course.exercises.get(order=2)
+        self.assertEqual(self.client.get(reverse('courses:exercise_detail', args=[locked.pk])).status_code, 403)
+        other_exercise = self.other.exercises.get(order=1)
+        Exercise.objects.filter(pk=other_exercise.pk).update(is_locked=False)
+        response = self.client.get(reverse('courses:exercise_detail', args=[other_exercise.pk]))
+        self.assertRedirects(response, reverse('courses:course_detail', args=[self.other.pk]))
+
+    def test_upload_goes_through_sync_view(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        url = reverse('courses:exercise_detail', args=[self.exercise.pk])
+        with self.settings(MEDIA_ROOT=media.name):
+            response = self.client.post(url, {'submitted_file': SimpleUploadedFile('b.py', b'print(2)\n')})
+            self.assertRedirects(response, url)
+            csrf_client = Client(enforce_csrf_checks=True)
+            csrf_client.force_login(self.student)
+            csrf_client.get(url)
+            response = csrf_client.post(url, {'submitted_file': SimpleUploadedFile('c.py', b'print(3)\n')})
+            self.assertEqual(response.status_code, 403)
+        self.assertEqual(Submission.objects.filter(student=self.student).count(), 2)
+
+
+class MediaServingTests(TestCase):
+    CONTENT = b'0123456789' * 10
+    PATH = 'blobs/ab/cd/abcd.py'
+
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        ExerciseTemplate.objects.create(course_template=template, title='تمرین', order=1)
+        course = Course.objects.create(template=template, course_number=1)
+        cls.owner = CustomUser.objects.create(email='owner@example.com', first_name='Ali', last_name='Nouri')
+        cls.other = CustomUser.objects.create(email='other@example.com', first_name='Sara', last_name='Nouri')
+        cls.staff = CustomUser.objects.create(
+            email='ta@example.com', first_name='Mina', last_name='Rad', username='ta', is_staff=True,
+        )
+        Submission.objects.create(student=cls.owner, exercise=course.exercises.get(), submitted_file=cls.PATH)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name, MEDIA_SENDFILE_BACKEND='')
+        override.enable()
+        self.addCleanup(override.disable)
+        full_path = os.path.join(media.name, self.PATH)
+        os.makedirs(os.path.dirname(full_path))
+        with open(full_path, 'wb') as handle:
+            handle.write(self.CONTENT)
+        self.url = reverse('media', args=[self.PATH])
+
+    def get(self, user=None, **headers):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client.get(self.url, headers=headers)
+
+    def test_benchmark_leaves_media_root_untouched(self):
+        # فایل واقعی‌ای که تصادفا در media/bench است نباید پاک شود
+        kept = os.path.join(settings.MEDIA_ROOT, 'bench', 'keep.txt')
+        os.makedirs(os.path.dirname(kept))
+        with open(kept, 'w') as handle:
+            handle.write('keep')
+        out = io.StringIO()
+        call_command('benchmark_media_serving', '--size-mb', '1', '--repeat', '1', stdout=out)
+        self.assertIn('X-Accel-Redirect', out.getvalue())
+        self.assertEqual(os.listdir(os.path.dirname(kept)), ['keep.txt'])
+
+    def test_only_owner_and_staff_can_download(self):
+        for user, status in ((self.owner, 200), (self.staff, 200), (self.other, 404), (None, 404)):
+            with self.subTest(user=user and user.email):
+                response = self.get(user)
+                self.assertEqual(response.status_code, status)
+                if status == 200:
+                    self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+                    self.assertIn('private', response['Cache-Control'])
+
+    def test_path_traversal_is_rejected(self):
+        client = Client()
+        client.force_login(self.staff)
+        self.assertEqual(client.get('/media/../settings.py').status_code, 404)
+
+    def test_range_requests(self):
+        response = self.get(self.owner, Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[10:20])
+
+        response = self.get(self.owner, Range='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[-5:])
+
+        response = self.get(self.owner, Range=f'bytes={len(self.CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENT)}')
+
+    def test_not_modified(self):
+        etag = self.get(self.owner)['ETag']
+        self.assertEqual(self.get(self.owner, If_None_Match=etag).status_code, 304)
+        # کاربر غیرمجاز حتی 304 هم نمی‌گیرد
+        self.assertEqual(self.get(self.other, If_None_Match=etag).status_code, 404)
+
+    def test_nginx_offload(self):
+        with self.settings(MEDIA_SENDFILE_BACKEND='nginx', MEDIA_SENDFILE_PREFIX='/protected-media/'):
+            response = self.get(self.owner)
+            self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.PATH}')
+            self.assertEqual(response.content, b'')
+            self.assertEqual(self.get(self.other).status_code, 404)
+
+
+class EnrollmentApprovalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        cls.courses = [Course.objects.create(template=template, course_number=number) for number in (1, 2)]
+        cls.students = CustomUser.objects.bulk_create([
+            CustomUser(email=f'applicant{i}@example.com', username=f'applicant{i}') for i in range(30)
+        ])
+        EnrollmentRequest.objects.bulk_create([
+            EnrollmentRequest(student=student, course=cls.courses[index % 2])
+            for index, student in enumerate(cls.students)
+        ])
+        # عضو شده ولی درخواستش هنوز مانده است
+        cls.courses[0].students.add(cls.students[0])
+
+    def test_approval_is_set_based(self):
+        version_before = get_version(user_version_name(self.students[1].pk))
+        deleted_rows = unittest.mock.Mock()
+        post_delete.connect(deleted_rows, sender=EnrollmentRequest)
+        self.addCleanup(post_delete.disconnect, deleted_rows, sender=EnrollmentRequest)
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(5):
+            # SELECT، INSERT عضویت‌ها، DELETE درخواست‌ها و savepoint ها
+            approved = approve_requests(EnrollmentRequest.objects.all())
+        deleted_rows.assert_not_called()
+
+        self.assertEqual(approved, {self.courses[0].pk: 15, self.courses[1].pk: 15})
+        self.assertFalse(EnrollmentRequest.objects.exists())
+        self.assertEqual(Course.students.through.objects.count(), 30)
+        self.assertEqual(self.courses[1].students.count(), 15)
+        self.assertNotEqual(get_version(user_version_name(self.students[1].pk)), version_before)
+
+    def test_command_approves_in_chunks(self):
+        out = io.StringIO()
+        call_command('approve_enrollment_requests', '--course', str(self.courses[1].pk), '--chunk-size', '4', stdout=out)
+        self.assertIn('15 enrollment requests approved', out.getvalue())
+        self.assertEqual(list(EnrollmentRequest.objects.values_list('course', flat=True).distinct()), [self.courses[0].pk])
+
+
+class GradebookCsvTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        ExerciseTemplate.objects.create(course_template=template, title='تمرین', order=1)
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.student = CustomUser.objects.create(
+            email='csv@example.com', first_name='=HYPERLINK("http://evil")', last_name='',
+        )
+        cls.submission = Submission.objects.create(
+            student=cls.student, exercise=cls.course.exercises.get(), submitted_file='g/a.py',
+            score=10, feedback='-2 برای تاخیر',
+        )
+
+    def export(self):
+        return ''.join(iter_csv_rows(Submission.objects.all())).lstrip('\ufeff')
+
+    def import_text(self, text, encoding='utf-8'):
+        return import_grades(io.BytesIO(text.encode(encoding)))
+
+    def test_export_neutralizes_formulas(self):
+        row = next(csv.DictReader(io.StringIO(self.export())))
+        self.assertEqual(row['student_name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(row['feedback'], "'-2 برای تاخیر")
+        self.assertEqual(row['score'], '10')
+
+    def test_exported_file_reimports_unchanged(self):
+        result = self.import_text(self.export())
+        self.assertEqual((result.updated, result.unchanged, result.errors), (0, 1, []))
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.feedback, '-2 برای تاخیر')
+
+    def test_import_updates_and_reports_bad_rows(self):
+        pk = self.submission.pk
+        result = self.import_text(
+            f'submission_id,score,feedback\n{pk},95,خوب\nabc,1,\n{pk + 100},5,\n{pk},101,\n'
+        )
+        self.assertEqual(result.updated, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.submission.refresh_from_db()
+        self.assertEqual((self.submission.score, self.submission.feedback), (95, 'خوب'))
+
+    def test_non_utf8_file_is_reported_not_raised(self):
+        result = self.import_text(f'submission_id,score,feedback\n{self.submission.pk},50,خوب\n', 'cp1256')
+        self.assertEqual(result.updated, 0)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn('UTF-8', result.errors[0][1])
+
+    def test_missing_columns(self):
+        result = self.import_text('id,grade\n1,2\n')
+        self.assertEqual(result.errors, [(1, 'ستون‌های لازم وجود ندارند: score, submission_id')])
+
+
+class SubmissionArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        ExerciseTemplate.objects.create(course_template=template, title='تمرین', order=3)
+        course = Course.objects.create(template=template, course_number=7)
+        cls.student = CustomUser.objects.create(email='zipper@example.com', username='zipper')
+        cls.exercise = course.exercises.get()
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def submit(self, name, content):
+        return Submission.objects.create(
+            student=self.student, exercise=self.exercise, submitted_file=SimpleUploadedFile(name, content),
+        )
+
+    def test_streamed_archive_opens_with_expected_members(self):
+        self.submit('main.py', b'print(1)\n')
+        second = self.submit('main.py', b'print(2)\n')
+        self.submit('project.zip', b'PK fake zip')
+        gone = self.submit('gone.py', b'x')
+        os.remove(gone.submitted_file.path)
+
+        response = zip_response(Submission.objects.all())
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+
+        folder = 'zipper/Course_7/Ex_3'
+        self.assertEqual(sorted(archive.namelist()), sorted([
+            f'{folder}/main.py', f'{folder}/main-{second.pk}.py', f'{folder}/project.zip', '_missing_files.txt',
+        ]))
+        self.assertEqual(archive.read(f'{folder}/main.py'), b'print(1)\n')
+        self.assertEqual(archive.read(f'{folder}/main-{second.pk}.py'), b'print(2)\n')
+        self.assertEqual(archive.getinfo(f'{folder}/project.zip').compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(archive.getinfo(f'{folder}/main.py').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.read('_missing_files.txt').decode(), f'{folder}/gone.py')
+
+
+class GradebookMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        for order in (1, 2):
+            ExerciseTemplate.objects.create(course_template=template, title=f'تمرین {order}', order=order)
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.first, cls.second = cls.course.exercises.order_by('order')
+        cls.ali = CustomUser.objects.create(email='ali@example.com', first_name='Ali', last_name='A')
+        cls.bita = CustomUser.objects.create(email='bita@example.com', first_name='Bita', last_name='B')
+        cls.left = CustomUser.objects.create(email='left@example.com', first_name='Cyrus', last_name='C')
+        cls.course.students.add(cls.ali, cls.bita)
+        for student, exercise, score in (
+            (cls.ali, cls.first, 60), (cls.ali, cls.first, None), (cls.bita, cls.first, 90),
+            (cls.left, cls.second, 70),
+        ):
+            Submission.objects.create(student=student, exercise=exercise, submitted_file='m/a.py', score=score)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_matrix_cells(self):
+        with self.assertNumQueries(3):
+            matrix = build_matrix(self.course)
+        rows = {row['student']['email']: row for row in matrix['rows']}
+        # دانشجویی که دوره را ترک کرده ولی ارسال دارد هم در ماتریس می‌ماند
+        self.assertEqual(list(rows), ['ali@example.com', 'bita@example.com', 'left@example.com'])
+        self.assertEqual(rows['ali@example.com']['cells'], [
+            {'status': 'pending', 'latest': None, 'best': 60, 'attempts': 2}, {'status': 'missing'},
+        ])
+        self.assertEqual(rows['bita@example.com']['cells'][0], {'status': 'graded', 'latest': 90, 'best': 90, 'attempts': 1})
+        self.assertEqual(rows['left@example.com']['submitted'], 1)
+
+    def test_query_count_does_not_grow_with_students(self):
+        students = CustomUser.objects.bulk_create([
+            CustomUser(email=f'many{i}@example.com', username=f'many{i}') for i in range(40)
+        ])
+        self.course.students.add(*students)
+        Submission.objects.bulk_create([
+            Submission(student=student, exercise=exercise, submitted_file='m/b.py')
+            for student in students for exercise in (self.first, self.second)
+        ])
+        with self.assertNumQueries(3):
+            self.assertEqual(len(build_matrix(self.course)['rows']), 43)
+
+    def test_html_is_cached_until_a_submission_changes(self):
+        get_gradebook_html(self.course)
+        with self.assertNumQueries(0):
+            get_gradebook_html(self.course)
+        with self.captureOnCommitCallbacks(execute=True):
+            Submission.objects.filter(student=self.ali, score=60).get().delete()
+        self.assertIn('⏳ / - (1)', get_gradebook_html(self.course))
+
+    def test_cascade_delete_looks_up_courses_once(self):
+        for _ in range(10):
+            Submission.objects.create(student=self.bita, exercise=self.second, submitted_file='m/c.py')
+        exercise_table = Exercise._meta.db_table
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.bita.delete()
+        lookups = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and f'FROM "{exercise_table}"' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+
+
+class TemplateRemovalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course_template = CourseTemplate.objects.create(title='الگو', description='...')
+        cls.templates = [
+            ExerciseTemplate.objects.create(course_template=cls.course_template, title=f'تمرین {order}', order=order)
+            for order in (1, 2, 3)
+        ]
+        cls.courses = [Course.objects.create(template=cls.course_template, course_number=n) for n in (1, 2)]
+        cls.student = CustomUser.objects.create(email='keep@example.com', first_name='Nima', last_name='N')
+        cls.courses[0].students.add(cls.student)
+        cls.submitted = cls.courses[0].exercises.get(order=1)
+        Exercise.objects.filter(pk=cls.submitted.pk).update(is_locked=False)
+        Submission.objects.create(student=cls.student, exercise=cls.submitted, submitted_file='m/a.py')
+
+    def test_delete_removes_unsubmitted_and_locks_submitted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.templates[0].delete()
+        self.assertEqual(list(Exercise.objects.filter(order=1)), [self.submitted])
+        self.submitted.refresh_from_db()
+        self.assertTrue(self.submitted.is_locked)
+        self.assertIsNone(self.submitted.source_template_id)
+        self.assertEqual(get_progress(self.student, self.courses[0]).total_exercises, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.templates[1].delete()
+        self.assertEqual(get_progress(self.student, self.courses[0]).total_exercises, 2)
+
+    def test_query_count_does_not_grow_with_courses(self):
+        def count_queries(template):
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                template.delete()
+            return len(queries)
+
+        few = count_queries(self.templates[1])
+        for n in range(3, 13):
+            Course.objects.create(template=self.course_template, course_number=n)
+        self.assertEqual(count_queries(self.templates[2]), few)
+
+    def test_dry_run_reports_moved_templates_without_changes(self):
+        other = CourseTemplate.objects.create(title='دیگر', description='...')
+        ExerciseTemplate.objects.filter(pk__in=[self.templates[0].pk, self.templates[1].pk]).update(
+            course_template=other,
+        )
+        out = io.StringIO()
+        call_command('propagate_exercise_templates', '--dry-run', '--course-template', str(self.course_template.pk),
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn(f'  ! [{self.courses[0].pk}] #{self.submitted.pk} تمرین 1 (has submissions, locked)', lines)
+        self.assertEqual(sum(line.startswith('  - ') for line in lines), 3)
+        self.assertEqual(Exercise.objects.count(), 6)
+
+        call_command('propagate_exercise_templates', '--course-template', str(self.course_template.pk),
+                     stdout=io.StringIO())
+        self.assertEqual(Exercise.objects.count(), 3)
+
+
+def _sandbox_settings():
+    """تنظیماتی که sandbox با آن‌ها روی این سیستم اجرا می‌شود، یا None."""
+    if os.name != 'posix':
+        return None
+    if os.geteuid() != 0:
+        # بدون کاربر جدا؛ تست‌ها کد خودشان را اجرا می‌کنند
+        return {'AUTOGRADER_ALLOW_UNSANDBOXED': True}
+    # root: کد با nobody و پایتون سیستم اجرا می‌شود (virtualenv ممکن است برای nobody خواندنی نباشد)
+    python = shutil.which('python3', path='/usr/bin:/bin')
+    try:
+        import pwd
+        pwd.getpwnam('nobody')
+    except (ImportError, KeyError):
+        return None
+    return {'AUTOGRADER_USER': 'nobody', 'AUTOGRADER_PYTHON': python} if python else None
+
+
+SANDBOX_SETTINGS = _sandbox_settings()
+needs_sandbox = unittest.skipIf(SANDBOX_SETTINGS is None, 'no POSIX sandbox on this system')
+
+
+def io_test(stdin, expected_output, weight=1):
+    return {'kind': ExerciseTestCase.KIND_IO, 'stdin': stdin, 'expected_output': expected_output,
+            'check_code': '', 'weight': weight}
+
+
+def check_test(check_code, weight=1):
+    return {'kind': ExerciseTestCase.KIND_CHECK, 'stdin': '', 'expected_output': '',
+            'check_code': check_code, 'weight': weight}
+
+
+@needs_sandbox
+class AutograderSandboxTests(SimpleTestCase):
+    LIMITS = SandboxLimits(cpu_seconds=1, memory_mb=128, wall_seconds=2)
+    SOLUTION = 'def add(a, b):\n    return a + b\n\nif __name__ == "__main__":\n    print(input() * 2)\n'
+
+    def setUp(self):
+        override = self.settings(**SANDBOX_SETTINGS)
+        override.enable()
+        self.addCleanup(override.disable)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def source(self, code, name='solution.py'):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(code)
+        return path
+
+    def archive(self, members, name='solution.zip'):
+        path = os.path.join(self.folder, name)
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for member, data in members.items():
+                archive.writestr(member, data)
+        return path
+
+    def grade(self, path, tests):
+        return grade_file(path, os.path.basename(path), tests, self.LIMITS)
+
+    def test_io_and_check_tests(self):
+        score, feedback = self.grade(self.source(self.SOLUTION), [
+            io_test('ab', 'abab'), io_test('ab', 'ab'),
+            check_test('assert add(2, 3) == 5'), check_test('assert add(2, 3) == 6'),
+        ])
+        self.assertEqual(score, 50)
+        self.assertIn('❌ تست 2: خروجی با خروجی مورد انتظار یکسان نیست', feedback)
+        self.assertIn('❌ تست 4: AssertionError', feedback)
+
+    def test_check_tests_use_solution_objects(self):
+        solution = (
+            'LIMIT = 2\n\nclass Stack:\n    def __init__(self):\n        self.items = []\n'
+            '    def push(self, item):\n        if len(self.items) >= LIMIT:\n            raise OverflowError("full")\n'
+            '        self.items.append(item)\n    def pop(self):\n        return self.items.pop()\n'
+            '    def __len__(self):\n        return len(self.items)\n\n'
+            'def ordered(values, reverse=False):\n    return sorted(values, reverse=reverse)\n'
+        )
+        check = (
+            'stack = Stack()\nstack.push((1, "a"))\nstack.push({"k": {1, 2}})\nassert len(stack) == LIMIT\n'
+            'try:\n    stack.push(3)\nexcept OverflowError as error:\n    assert str(error) == "full"\n'
+            'else:\n    assert False\n'
+            'assert stack.pop() == {"k": {1, 2}} and stack.items == [(1, "a")]\n'
+            'assert ordered([3, 1, 2], reverse=True) == [3, 2, 1]\n'
+        )
+        score, feedback = self.grade(self.source(solution), [check_test(check), check_test('assert Stack().pop()')])
+        self.assertEqual(score, 50, feedback)
+        self.assertIn('❌ تست 2: IndexError: pop from empty list', feedback)
+
+    def test_early_exit_fails_check_tests(self):
+        for exit_code in ('import sys\nsys.exit(0)\n', 'import os\nos._exit(0)\n'):
+            with self.subTest(exit_code):
+                score, feedback = self.grade(self.source(exit_code + self.SOLUTION), [check_test('assert True')])
+                self.assertEqual(score, 0)
+                self.assertIn('قبل از تمام شدن کد بررسی', feedback)
+
+    def test_check_result_cannot_be_forged(self):
+        attacks = {
+            # توکن اتمام را از frame های launcher پیدا و خودش اعلام می‌کند
+            'completion token': (
+                'import os, sys\nframe = sys._getframe()\nwhile frame is not None:\n'
+                '    for value in list(frame.f_globals.values()):\n'
+                '        if isinstance(value, str) and len(value) == 32:\n'
+                '            os.write(2, ("\\n" + value + "\\n").encode())\n'
+                '            os._exit(0)\n'
+                '    frame = frame.f_back\n'
+            ),
+        }
+        for case, attack in attacks.items():
+            with self.subTest(case):
+                score, feedback = self.grade(self.source(attack + self.SOLUTION), [check_test('assert False')])
+                self.assertEqual(score, 0, feedback)
+
+    @unittest.skipUnless(os.path.isdir('/proc'), 'needs /proc')
+    def test_check_process_memory_is_protected_from_the_solution(self):
+        # کد دانشجو با همان کاربر اجرا می‌شود؛ اگر حافظه‌ی پروسه‌ی check را باز کند می‌تواند نتیجه را عوض کند
+        probe = (
+            'import os\nstatus = "no check process"\nfor pid in os.listdir("/proc"):\n    try:\n'
+            '        if b"/checks/check_" in open(f"/proc/{pid}/cmdline", "rb").read():\n'
+            '            try:\n                open(f"/proc/{pid}/mem", "rb").close()\n'
+            '                status = "check memory is open"\n'
+            '            except OSError:\n                status = "check memory is protected"\n'
+            '    except OSError:\n        pass\nraise RuntimeError(status)\n'
+        )
+        score, feedback = self.grade(self.source(probe + self.SOLUTION), [check_test('assert True')])
+        self.assertEqual(score, 0)
+        self.assertIn('RuntimeError: check memory is protected', feedback)
+
+    @unittest.skipUnless(SANDBOX_SETTINGS and SANDBOX_SETTINGS.get('AUTOGRADER_USER'), 'needs a separate sandbox user')
+    def test_check_tests_cannot_be_rewritten_by_earlier_tests(self):
+        # اجرای تست اول سعی می‌کند فایل تست دوم را عوض کند
+        tamper = (
+            'import glob\nfor path in glob.glob("../checks/*.py"):\n'
+            '    try:\n        open(path, "w").write("pass")\n    except OSError:\n        pass\n'
+        )
+        score, _ = self.grade(self.source(tamper + self.SOLUTION), [check_test('pass'), check_test('assert False')])
+        self.assertEqual(score, 50)
+
+    def test_limits(self):
+        cases = {
+            'memory': ('data = bytearray(512 * 1024 * 1024)\n', 'MemoryError'),
+            'cpu': ('while True:\n    pass\n', 'محدودیت منابع'),
+            'wall clock': ('import time\ntime.sleep(30)\n', 'زمان اجرا تمام شد'),
+            'fork': ('import os\nos.fork()\n', 'BlockingIOError'),
+        }
+        for case, (code, detail) in cases.items():
+            with self.subTest(case):
+                started = time.monotonic()
+                score, feedback = self.grade(self.source(code + self.SOLUTION), [check_test('assert True')])
+                self.assertEqual(score, 0)
+                self.assertIn(detail, feedback)
+                self.assertLess(time.monotonic() - started, 10)
+
+    def test_submission_modules_do_not_shadow_the_launcher(self):
+        path = self.archive({
+            'resource.py': 'RLIMIT_CPU = RLIMIT_AS = RLIMIT_FSIZE = RLIMIT_CORE = RLIMIT_NPROC = 0\n'
+                           'def setrlimit(*args):\n    pass\n',
+            'solution.py': 'data = bytearray(512 * 1024 * 1024)\n' + self.SOLUTION,
+        })
+        score, feedback = self.grade(path, [check_test('assert True')])
+        self.assertEqual(score, 0)
+        self.assertIn('MemoryError', feedback)
+
+    def test_zip_guards(self):
+        cases = {
+            'too large': ({'solution.py': 'x = 1\n', 'big.txt': b'\0' * (MAX_UNZIPPED_BYTES + 1)}, 'بیش از حد بزرگ'),
+            'too many files': ({f'f{n}.txt': '' for n in range(MAX_ZIP_MEMBERS + 1)}, 'بیش از حد بزرگ'),
+            'path traversal': ({'../solution.py': 'x = 1\n'}, 'مسیر نامعتبر'),
+            'no main file': ({'a.py': '', 'b.py': ''}, 'فایل اصلی'),
+        }
+        for case, (members, detail) in cases.items():
+            with self.subTest(case):
+                score, feedback = self.grade(self.archive(members), [check_test('assert True')])
+                self.assertEqual(score, 0)
+                self.assertIn(detail, feedback)
+
+    def test_root_needs_a_sandbox_user(self):
+        with self.settings(AUTOGRADER_USER='', AUTOGRADER_ALLOW_UNSANDBOXED=True), \
+                unittest.mock.patch('os.geteuid', return_value=0):
+            self.assertFalse(supports_sandbox())
+
+    def test_running_as_the_application_user_needs_an_explicit_opt_in(self):
+        with unittest.mock.patch('os.geteuid', return_value=1000):
+            with self.settings(AUTOGRADER_USER='', AUTOGRADER_ALLOW_UNSANDBOXED=False):
+                self.assertFalse(supports_sandbox())
+                with self.assertRaisesMessage(CommandError, 'AUTOGRADER_USER'):
+                    call_command('autograde_submissions', '--queued', stdout=io.StringIO())
+            with self.settings(AUTOGRADER_USER='', AUTOGRADER_ALLOW_UNSANDBOXED=True):
+                self.assertTrue(supports_sandbox())
+
+
+@needs_sandbox
+class AutogradeQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        ExerciseTemplate.objects.create(course_template=template, title='تمرین', order=1)
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.exercise = cls.course.exercises.get()
+        ExerciseTestCase.objects.create(exercise=cls.exercise, kind=ExerciseTestCase.KIND_IO, stdin='2', expected_output='4')
+        cls.student = CustomUser.objects.create(email='graded@example.com', first_name='Ali', last_name='Grade')
+        cls.admin = CustomUser.objects.create_superuser(
+            email='ta@example.com', username='ta', password='x', first_name='TA', last_name='Admin',
+        )
+
+    def setUp(self):
+        override = self.settings(**SANDBOX_SETTINGS)
+        override.enable()
+        self.addCleanup(override.disable)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_override = self.settings(MEDIA_ROOT=media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.ungraded, self.auto, self.manual = [
+            Submission.objects.create(
+                student=self.student, exercise=self.exercise,
+                submitted_file=SimpleUploadedFile('solution.py', b'print(int(input()) * 2)\n'),
+            )
+            for _ in range(3)
+        ]
+        Submission.objects.filter(pk=self.auto.pk).update(score=0, autograded_score=0)
+        Submission.objects.filter(pk=self.manual.pk).update(score=70, feedback='دستی')
+
+    def test_admin_action_only_queues(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:courses_submission_changelist'), {
+            'action': 'autograde_submissions',
+            '_selected_action': [self.ungraded.pk, self.auto.pk, self.manual.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        rows = dict(Submission.objects.values_list('pk', 'autograde_request'))
+        self.assertEqual(rows, {
+            self.ungraded.pk: Submission.AUTOGRADE_QUEUED, self.auto.pk: Submission.AUTOGRADE_QUEUED, self.manual.pk: '',
+        })
+        self.assertIsNone(Submission.objects.get(pk=self.ungraded.pk).score)
+
+    def test_admin_action_refuses_without_a_sandbox(self):
+        self.client.force_login(self.admin)
+        with self.settings(AUTOGRADER_USER='', AUTOGRADER_ALLOW_UNSANDBOXED=False):
+            response = self.client.post(reverse('admin:courses_submission_changelist'), {
+                'action': 'autograde_submissions', '_selected_action': [self.ungraded.pk],
+            }, follow=True)
+        self.assertContains(response, 'نمره‌دهی خودکار فعال نیست')
+        self.assertFalse(Submission.objects.exclude(autograde_request='').exists())
+
+    def test_worker_keeps_manual_scores(self):
+        queue_submissions(Submission.objects.all())
+        # دستیار آموزشی بعد از صف شدن نمره داد
+        Submission.objects.filter(pk=self.auto.pk).update(score=90)
+        stats = grade_submissions(queued_submissions(), workers=1)
+        self.assertEqual(stats.graded, 1)
+        scores = dict(Submission.objects.values_list('pk', 'score'))
+        self.assertEqual(scores, {self.ungraded.pk: 100, self.auto.pk: 90, self.manual.pk: 70})
+        self.assertFalse(Submission.objects.exclude(autograde_request='').exists())
+
+    def test_overwrite_replaces_manual_scores(self):
+        self.assertEqual(queue_submissions(Submission.objects.all(), overwrite_manual=True), 3)
+        call_command('autograde_submissions', '--queued', '--workers', '1', stdout=io.StringIO())
+        self.assertEqual(set(Submission.objects.values_list('score', flat=True)), {100})
+        self.assertEqual(set(Submission.objects.values_list('autograded_score', flat=True)), {100})
+
+
+class SimilarityTests(TestCase):
+    SOURCE = (
+        'def solve(numbers):\n    total = 0\n    for value in numbers:\n        if value % 2 == 0:\n'
+        '            total += value * 3\n        else:\n            total -= value\n    return total\n\n'
+        'items = [int(x) for x in input().split()]\nprint(solve(items), len(items), max(items))\n'
+    )
+    # همان کد با نام‌ها، عددها، رشته‌ها و توضیحات دیگر
+    RENAMED = (
+        '# my own work\ndef calc(arr):\n    s = 0\n    for v in arr:\n        if v % 7 == 1:\n'
+        '            s += v * 9\n        else:\n            s -= v\n    return s\n\n'
+        'xs = [int(t) for t in input().split()]\nprint(calc(xs), len(xs), max(xs))\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        ExerciseTemplate.objects.create(course_template=template, title='تمرین', order=1)
+        cls.exercise = Course.objects.create(template=template, course_number=1).exercises.get()
+        cls.students = [
+            CustomUser.objects.create(email=f'copy{number}@example.com', first_name='Copy', last_name=str(number))
+            for number in range(4)
+        ]
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def submit(self, student, source, name='solution.py'):
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = Submission.objects.create(
+                student=student, exercise=self.exercise, submitted_file=SimpleUploadedFile(name, source),
+            )
+        index_pending()
+        return submission
+
+    def test_upload_is_indexed_by_the_queue_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for student in self.students[:2]:
+                Submission.objects.create(
+                    student=student, exercise=self.exercise,
+                    submitted_file=SimpleUploadedFile('solution.py', self.SOURCE.encode()),
+                )
+        # درخواست آپلود چیزی ایندکس نمی‌کند
+        self.assertFalse(FingerprintPosting.objects.exists())
+        self.assertEqual(Submission.objects.filter(similarity_pending=True).count(), 2)
+
+        out = io.StringIO()
+        call_command('build_similarity_index', '--pending', '--batch-size', '1', stdout=out)
+        self.assertIn('2 queued submissions indexed, 0 failed', out.getvalue())
+        self.assertFalse(Submission.objects.filter(similarity_pending=True).exists())
+        self.assertEqual(SimilarityPair.objects.count(), 1)
+
+    def test_failed_and_rebuilt_submissions_leave_the_queue(self):
+        self.submit(self.students[0], self.SOURCE.encode())
+        with unittest.mock.patch('courses.similarity.index_submission', side_effect=ValueError('broken')):
+            self.submit(self.students[1], self.SOURCE.encode())
+        self.assertFalse(Submission.objects.filter(similarity_pending=True).exists())
+        self.assertFalse(SimilarityPair.objects.exists())
+
+        Submission.objects.update(similarity_pending=True)
+        rebuild_exercise(self.exercise.pk)
+        self.assertFalse(Submission.objects.filter(similarity_pending=True).exists())
+        self.assertEqual(SimilarityPair.objects.count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('build_similarity_index', '--loop', stdout=io.StringIO())
+
+    def test_fingerprint_ignores_names_literals_and_comments(self):
+        original = fingerprint_source(self.SOURCE.encode())
+        self.assertTrue(original)
+        self.assertEqual(fingerprint_source(self.RENAMED.encode()), original)
+        self.assertNotEqual(fingerprint_source(b'print(sorted(input().split(), reverse=True))\n' * 3), original)
+
+    def test_incremental_index_finds_copies_across_students_only(self):
+        first = self.submit(self.students[0], self.SOURCE.encode())
+        again = self.submit(self.students[0], self.SOURCE.encode())   # ارسال دوباره‌ی همان دانشجو جفت نمی‌شود
+        copy = self.submit(self.students[1], self.RENAMED.encode())
+        self.submit(self.students[2], b'print(sum(map(int, input().split())))\n')
+        expected = {(first.pk, copy.pk), (again.pk, copy.pk)}
+        self.assertEqual(
+            set(SimilarityPair.objects.values_list('submission_a_id', 'submission_b_id')), expected,
+        )
+        self.assertEqual(set(SimilarityPair.objects.values_list('similarity', flat=True)), {1.0})
+
+        _, pairs = rebuild_exercise(self.exercise.pk)
+        self.assertEqual({(p.submission_a_id, p.submission_b_id) for p in pairs}, expected)
+
+    def test_frequent_hashes_move_to_the_stop_list(self):
+        hashes = fingerprint_source(self.SOURCE.encode())
+        with unittest.mock.patch('courses.similarity.MIN_COMMON_LIMIT', 2):
+            for student in self.students[:2]:
+                self.submit(student, self.SOURCE.encode())
+            self.assertEqual(FingerprintPosting.objects.count(), 2 * len(hashes))
+            self.assertFalse(CommonFingerprint.objects.exists())
+
+            # سومین ارسال یکسان از حد می‌گذرد: hash ها عمومی و posting هایشان حذف می‌شوند
+            third = self.submit(self.students[2], self.SOURCE.encode())
+            self.assertEqual(
+                set(CommonFingerprint.objects.values_list('hash', flat=True)), set(hashes),
+            )
+            self.assertFalse(FingerprintPosting.objects.exists())
+            self.assertEqual(index_submission(third), [])
+
+            _, pairs = rebuild_exercise(self.exercise.pk)
+        self.assertEqual(pairs, [])
+        self.assertEqual(CommonFingerprint.objects.count(), len(hashes))
+
+    def test_zip_sources_are_read_up_to_the_limit(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('a.py', 'x = 1\n' * 50)
+            archive.writestr('b.py', 'y = 2\n' * 50)
+            archive.writestr('notes.txt', 'not code')
+        submission = Submission.objects.get(pk=self.submit(self.students[3], buffer.getvalue(), name='solution.zip').pk)
+        self.assertEqual(read_source(submission), b'x = 1\n' * 50 + b'\n' + b'y = 2\n' * 50)
+
+        with unittest.mock.patch('courses.similarity.MAX_SOURCE_BYTES', 100), \
+                unittest.mock.patch('zipfile.ZipFile.read', side_effect=AssertionError('whole member read')):
+            self.assertEqual(read_source(submission), b'x = 1\n' * 16 + b'x = ')
+
+
+class DemoDataFlushTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def generate(self, *extra):
+        call_command(
+            'generate_demo_data', '--templates', '1', '--exercises-per-template', '2', '--courses', '2',
+            '--students', '4', '--courses-per-student', '1', '--submissions-per-student', '2', '--files', '2',
+            *extra, stdout=io.StringIO(),
+        )
+
+    def test_flush_removes_rows_that_reference_demo_submissions(self):
+        self.generate()
+        first, second = Submission.objects.order_by('pk')[:2]
+        FingerprintPosting.objects.create(exercise=first.exercise, submission=first, hash=1)
+        SimilarityPair.objects.create(exercise=first.exercise, submission_a=first, submission_b=second,
+                                      shared=1, similarity=1)
+        self.generate('--flush')
+        self.assertFalse(Submission.objects.filter(pk__in=[first.pk, second.pk]).exists())
+        self.assertFalse(FingerprintPosting.objects.exists())
+        self.assertFalse(SimilarityPair.objects.exists())
+        # DELETE مستقیم FK شکسته‌ای جا نگذاشته باشد
+        connection.check_constraints()
+
+
+class ProblemStatementLinkTests(SimpleTestCase):
+    def assertLinkDropped(self, source, attribute='href'):
+        self.assertNotIn(f'{attribute}=', render_problem_statement(source))
+
+    def test_unsafe_schemes_are_removed(self):
+        for source in (
+            '[a](javascript:alert(1))',
+            '[a](JaVaScRiPt:alert(1))',
+            '[a](&#106;avascript:alert(1))',
+            '[a](&#x6A;avascript:alert(1))',
+            '[a](javascript&#58;alert(1))',
+            '[a](javascript&colon;alert(1))',
+            '[a](java&#x09;script:alert(1))',
+            '[a](\x01javascript:alert(1))',
+            '[a][ref]\n\n[ref]: &#106;avascript:alert(1)',
+            '[a](data&#x3A;text/html,x)',
+        ):
+            with self.subTest(source=source):
+                self.assertLinkDropped(source)
+        self.assertLinkDropped('![a](&#x6A;avascript:alert(1))', attribute='src')
+
+    def test_safe_links_are_kept(self):
+        for source, href in (
+            ('[a](https://example.com/?x=1&y=2)', 'https://example.com/?x=1&amp;y=2'),
+            ('[a](http://example.com)', 'http://example.com'),
+            ('[a](mailto:ta@example.com)', 'mailto:ta@example.com'),
+            ('[a](/courses/1/)', '/courses/1/'),
+            ('[a](#part-2)', '#part-2'),
+        ):
+            with self.subTest(source=source):
+                self.assertIn(f'href="{href}"', render_problem_statement(source))
+        self.assertIn('src="https://example.com/a.png"', render_problem_statement('![a](https://example.com/a.png)'))
+
+
+class ProblemStatementHtmlTests(TestCase):
+    STATEMENT = 'خط اول\n\nخط <b>دوم</b>\n\n```python\nprint(1)\n```'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course_template = CourseTemplate.objects.create(title='پایتون', description='...')
+        cls.template = ExerciseTemplate.objects.create(
+            course_template=cls.course_template, title='تمرین', problem_statement=cls.STATEMENT, order=1,
+        )
+
+    def test_html_is_compiled_on_save_and_escapes_raw_html(self):
+        html = self.template.problem_statement_html
+        self.assertEqual(html, render_problem_statement(self.STATEMENT))
+        self.assertIn('&lt;b&gt;', html)
+        self.assertNotIn('<b>', html)
+
+    def test_update_fields_includes_html(self):
+        self.template.problem_statement = 'متن جدید'
+        self.template.save(update_fields=['problem_statement'])
+        self.template.refresh_from_db()
+        self.assertIn('متن جدید', self.template.problem_statement_html)
+
+    def test_propagated_exercises_copy_compiled_html(self):
+        course = Course.objects.create(template=self.course_template, course_number=1)
+        exercise = course.exercises.get()
+        self.assertEqual(exercise.problem_statement_html, self.template.problem_statement_html)
+
+        self.template.problem_statement = 'نسخه‌ی دوم'
+        self.template.save()
+        exercise.refresh_from_db()
+        self.assertEqual(exercise.problem_statement_html, render_problem_statement('نسخه‌ی دوم'))
+
+    def test_exercise_page_uses_stored_html(self):
+        course = Course.objects.create(template=self.course_template, course_number=2)
+        student = CustomUser.objects.create(email='reader@example.com', first_name='Sara', last_name='Karimi')
+        course.students.add(student)
+        exercise = course.exercises.get()
+        Exercise.objects.filter(pk=exercise.pk).update(is_locked=False, problem_statement_html='<p>STORED</p>')
+        self.client.force_login(student)
+        response = self.client.get(reverse('courses:exercise_detail', args=[exercise.pk]))
+        self.assertContains(response, '<p>STORED</p>', html=True)
+
+
+class CourseExerciseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگو', description='...')
+        for order in (1, 2):
+            ExerciseTemplate.objects.create(course_template=template, title=f'تمرین {order}', order=order)
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.student = CustomUser.objects.create(email='cached@example.com', first_name='Reza', last_name='Karimi')
+        cls.course.students.add(cls.student)
+        cls.admin = CustomUser.objects.create_superuser(
+            email='teacher@example.com', username='teacher', password='x', first_name='مدرس', last_name='دوره',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def locked_states(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('courses:course_detail', args=[self.course.pk]))
+        return [exercise['is_locked'] for exercise in response.context['exercises']]
+
+    def test_second_view_does_not_query_exercises(self):
+        self.locked_states()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.locked_states(), [True, True])
+        exercise_table = Exercise._meta.db_table
+        self.assertFalse([q['sql'] for q in queries if f'FROM "{exercise_table}"' in q['sql']])
+
+    def test_admin_unlock_action_invalidates_list(self):
+        self.assertEqual(self.locked_states(), [True, True])
+        first = self.course.exercises.get(order=1)
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:courses_exercise_changelist'), {
+                'action': 'unlock_exercises', '_selected_action': [first.pk],
+            })
+        self.assertEqual(self.locked_states(), [False, True])
+
+    def test_save_and_delete_invalidate_list(self):
+        self.locked_states()
+        exercise = self.course.exercises.get(order=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise.is_locked = False
+            exercise.save()
+        self.assertEqual(self.locked_states(), [True, False])
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise.delete()
+        self.assertEqual(self.locked_states(), [True])
+
+    def test_waiting_readers_get_previous_list_while_rebuilding(self):
+        from .cache import bump_exercises, get_course_exercises
+
+        self.assertEqual(len(get_course_exercises(self.course.pk)), 2)
+        Exercise.objects.filter(course=self.course, order=2).delete()
+        bump_exercises(self.course.pk)
+        # درخواست دیگری در حال ساختن لیست نسخه‌ی جدید است
+        with unittest.mock.patch.object(cache, 'add', return_value=False), self.assertNumQueries(0):
+            self.assertEqual(len(get_course_exercises(self.course.pk)), 2)
+        self.assertEqual(len(get_course_exercises(self.course.pk)), 1)
+
+
+class ExerciseReleaseTests(TestCase):
+    START = datetime(2030, 1, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.template = CourseTemplate.objects.create(title='الگوی زمان‌بندی', description='...')
+        ExerciseTemplate.objects.create(
+            course_template=cls.template, title='هفته ۱', order=1,
+            unlock_offset=timedelta(0), lock_offset=timedelta(days=7),
+        )
+        ExerciseTemplate.objects.create(
+            course_template=cls.template, title='هفته ۲', order=2, unlock_offset=timedelta(days=7),
+        )
+        ExerciseTemplate.objects.create(course_template=cls.template, title='دستی', order=3)
+
+    def create_course(self, number, starts_at=START):
+        return Course.objects.create(template=self.template, course_number=number, starts_at=starts_at)
+
+    def states(self, course):
+        return list(course.exercises.order_by('order').values_list('is_locked', 'unlock_at', 'lock_at'))
+
+    def test_exercises_inherit_times_from_template_offsets(self):
+        course = self.create_course(1)
+        self.assertEqual(self.states(course), [
+            (True, self.START, self.START + timedelta(days=7)),
+            (True, self.START + timedelta(days=7), None),
+            (True, None, None),
+        ])
+        self.assertEqual(next_release_at(), self.START)
+
+    def test_due_transitions_are_applied_once_and_cleared(self):
+        course = self.create_course(1)
+        result = apply_due_releases(now=self.START + timedelta(hours=1))
+        self.assertEqual((result.unlocked, result.locked, result.course_ids), (1, 0, {course.pk}))
+        self.assertEqual(next_release_at(), self.START + timedelta(days=7))
+
+        # بعد از اعمال، قفل دستی مدرس دوباره باز نمی‌شود
+        course.exercises.filter(order=1).update(is_locked=True)
+        self.assertFalse(apply_due_releases(now=self.START + timedelta(hours=2)))
+        course.exercises.filter(order=1).update(is_locked=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = apply_due_releases(now=self.START + timedelta(days=8))
+        # یک SELECT و یک UPDATE (به جز SAVEPOINT ها)
+        self.assertEqual(len([q for q in queries if 'SAVEPOINT' not in q['sql']]), 2)
+        self.assertEqual((result.unlocked, result.locked), (1, 1))
+        self.assertEqual(self.states(course), [(True, None, None), (False, None, None), (True, None, None)])
+        self.assertIsNone(next_release_at())
+
+    def test_missed_window_ends_locked(self):
+        course = self.create_course(1)
+        apply_due_releases(now=self.START + timedelta(days=30))
+        self.assertTrue(course.exercises.get(order=1).is_locked)
+
+    def test_stagger_shifts_pending_times(self):
+        first, second = self.create_course(2), self.create_course(1)
+        stagger_courses([first, second], timedelta(minutes=30))
+        second.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual((second.release_offset, first.release_offset), (timedelta(0), timedelta(minutes=15)))
+        self.assertEqual(
+            first.exercises.get(order=2).unlock_at, self.START + timedelta(days=7, minutes=15),
+        )
+
+    def test_changing_course_start_reschedules_only_future_times(self):
+        course = self.create_course(1, starts_at=timezone.now() - timedelta(days=1))
+        apply_due_releases()
+        course.starts_at += timedelta(hours=12)
+        course.save()
+        self.assertEqual(self.states(course), [
+            # باز شدن هفته ۱ (هنوز در گذشته) قبلا اعمال شده و دوباره زمان‌بندی نمی‌شود
+            (False, None, course.starts_at + timedelta(days=7)),
+            (True, course.starts_at + timedelta(days=7), None),
+            (True, None, None),
+        ])
+
+    def test_pending_time_moved_into_the_past_is_applied_next_tick(self):
+        course = self.create_course(1, starts_at=timezone.now() + timedelta(days=1))
+        course.starts_at -= timedelta(days=3)
+        course.save()
+        # باز شدن هفته ۱ هنوز اعمال نشده بود؛ زمان در انتظار به زمان جدید (گذشته) می‌رود، نه این‌که بماند
+        self.assertEqual(self.states(course)[0], (True, course.starts_at, course.starts_at + timedelta(days=7)))
+        result = apply_due_releases()
+        self.assertEqual((result.unlocked, result.locked), (1, 0))
+        self.assertEqual(self.states(course)[0], (False, None, course.starts_at + timedelta(days=7)))
+
+
+class JsonApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        template = CourseTemplate.objects.create(title='الگوی API', description='...')
+        ExerciseTemplate.objects.bulk_create([
+            ExerciseTemplate(course_template=template, title=f'تمرین {order}', order=order) for order in (3, 1, 2, 2, 1)
+        ])
+        cls.course = Course.objects.create(template=template, course_number=1)
+        cls.other_course = Course.objects.create(template=template, course_number=2)
+        cls.student = CustomUser.objects.create(email='mobile@example.com', first_name='Sara', last_name='Ahmadi')
+        cls.course.students.add(cls.student)
+        cls.exercise = cls.course.exercises.order_by('order', 'pk').first()
+        # چند ارسال با زمان یکسان تا ترتیب بر اساس id هم آزموده شود
+        same_time = timezone.now()
+        Submission.objects.bulk_create([
+            Submission(student=cls.student, exercise=cls.exercise, submitted_file=f'api/{number}.py')
+            for number in range(25)
+        ])
+        Submission.objects.filter(pk__in=Submission.objects.order_by('pk').values('pk')[:10]).update(submitted_at=same_time)
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def walk(self, url, page_queries):
+        ids = []
+        while url:
+            with self.assertNumQueries(page_queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.json()['results'])
+            url = response.json()['next']
+        return ids
+
+    def test_submissions_newest_first_over_keyset_pages(self):
+        url = reverse('api:exercise_submissions', args=[self.exercise.pk]) + '?limit=4'
+        # نشست، کاربر، تمرین، عضویت، صفحه؛ برای صفحه‌ی آخر هم همان تعداد
+        ids = self.walk(url, 5)
+        expected = list(
+            Submission.objects.filter(exercise=self.exercise).order_by('-submitted_at', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_exercises_in_order_then_id(self):
+        ids = self.walk(reverse('api:course_exercises', args=[self.course.pk]) + '?limit=2', 5)
+        self.assertEqual(ids, list(self.course.exercises.order_by('order', 'pk').values_list('pk', flat=True)))
+
+    def test_my_courses(self):
+        response = self.client.get(reverse('api:my_courses'))
+        self.assertEqual([course['id'] for course in response.json()['results']], [self.course.pk])
+
+    def test_etag_returns_304_until_data_changes(self):
+        url = reverse('api:exercise_submissions', args=[self.exercise.pk]) + '?limit=5'
+        first = self.client.get(url)
+        etag = first['ETag']
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], etag)
+
+        Submission.objects.create(student=self.student, exercise=self.exercise, submitted_file='api/new.py')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_errors(self):
+        url = reverse('api:course_exercises', args=[self.course.pk])
+        self.assertEqual(self.client.get(url + '?cursor=not-a-cursor').status_code, 400)
+        # JSON معتبر با مقدارهای نامعتبر هم ۴۰۰ است، نه ۵۰۰
+        for values in ([None, 1], [1, None], [[1], 2], [{'a': 1}, 2], [True, 1], ['x', 1], [2 ** 70, 1], [1, 2, 3]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400)
+        submissions_url = reverse('api:exercise_submissions', args=[self.exercise.pk])
+        for values in ([None, 1], ['2030-13-01T00:00:00', 1], [0, 1]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+                self.assertEqual(self.client.get(submissions_url, {'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 405)
+        self.assertEqual(self.client.get(reverse('api:course_exercises', args=[self.other_course.pk])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api:course_exercises', args=[0])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_exercise_page_shows_only_latest_submissions(self):
+        self.exercise.is_locked = False
+        self.exercise.save()
+        response = self.client.get(reverse('courses:exercise_detail', args=[self.exercise.pk]))
+        self.assertEqual(len(response.context['previous_submissions']), SUBMISSION_HISTORY_LIMIT)
+        self.assertTrue(response.context['more_submissions'])
+
+
+# --- بودجه‌ی کوئری هر صفحه روی داده‌ی بزرگ ---
+
+# سقف زمان هر درخواست در تست (ثانیه)؛ فقط برای گرفتن کندی‌های چند برابری، نه بنچمارک
+DEFAULT_TIME_BUDGET = 2.0
+
+
+def seed_dataset(courses=12, exercises_per_course=20, students=300, courses_per_student=4, submissions_per_student=10):
+    """
+    داده‌ی نزدیک به واقعیت با bulk_create: چند دوره، ده‌ها تمرین، صدها دانشجو و هزاران ارسال.
+    بودجه‌ها باید با بزرگ شدن این اعداد ثابت بمانند؛ هر کوئری که به ازای هر ردیف تکرار شود
+    از بودجه بیرون می‌زند.
+    """
+    from users.usernames import assign_usernames
+    from .models import EnrollmentRequest, Exercise, Submission
+
+    template = CourseTemplate.objects.create(title='الگوی تست بار', description='...')
+    course_objs = Course.objects.bulk_create([
+        Course(template=template, course_number=1000 + number, title=f'دوره {number}', is_active_for_signup=True)
+        for number in range(courses)
+    ])
+    exercises = Exercise.objects.bulk_create([
+        Exercise(course=course, title=f'تمرین {order}', problem_statement='صورت سوال', order=order, is_locked=False)
+        for course in course_objs for order in range(1, exercises_per_course + 1)
+    ])
+    users = [
+        CustomUser(email=f'seed{number}@example.com', first_name='دانشجو', last_name=str(number))
+        for number in range(students)
+    ]
+    assign_usernames(users)
+    users = CustomUser.objects.bulk_create(users)
+
+    Membership = Course.students.through
+    memberships = []
+    requests = []
+    submissions = []
+    for index, user in enumerate(users):
+        joined = [course_objs[(index + offset) % courses] for offset in range(courses_per_student)]
+        memberships.extend(Membership(course_id=course.pk, customuser_id=user.pk) for course in joined)
+        requests.append(EnrollmentRequest(student=user, course=course_objs[(index + courses_per_student) % courses]))
+        for number in range(submissions_per_student):
+            exercise = exercises[(index * submissions_per_student + number) % len(exercises)]
+            submissions.append(Submission(
+                student=user, exercise=exercise, submitted_file=f'seed/{user.pk}-{number}.py',
+                score=number * 10 if number % 2 else None,
+            ))
+    Membership.objects.bulk_create(memberships)
+    EnrollmentRequest.objects.bulk_create(requests, ignore_conflicts=True)
+    Submission.objects.bulk_create(submissions, batch_size=1000)
+    return course_objs, exercises, users
+
+
+class QueryBudgetTestCase(TestCase):
+    """پایه‌ی تست‌های بودجه: هر درخواست با سقف تعداد کوئری و زمان بررسی می‌شود."""
+
+    def setUp(self):
+        # کش کارت‌ها و نسخه‌ها خالی باشد تا مسیر کامل (بدترین حالت) اندازه گرفته شود
+        cache.clear()
+
+    def assertWithinBudget(self, method, url, max_queries, status=200, max_seconds=DEFAULT_TIME_BUDGET, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, status, f'{method.upper()} {url}')
+        if len(queries) > max_queries:
+            sql = '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(queries, start=1))
+            self.fail(f'{method.upper()} {url}: {len(queries)} queries, budget is {max_queries}\n{sql}')
+        self.assertLessEqual(
+            elapsed, max_seconds, f'{method.upper()} {url} took {elapsed:.2f}s, budget is {max_seconds}s',
+        )
+        return response
+
+
+class CourseViewBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses, cls.exercises, cls.users = seed_dataset()
+        cls.student = cls.users[0]
+        cls.course = cls.student.courses_joined.first()
+        cls.exercise = cls.course.exercises.order_by('order').first()
+        cls.other_course = Course.objects.exclude(students=cls.student).exclude(
+            enrollment_requests__student=cls.student,
+        ).first()
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.student)
+
+    def test_course_list(self):
+        self.assertWithinBudget('get', reverse('courses:course_list'), 5)
+
+    def test_course_detail_enrolled(self):
+        # شامل ساختن ردیف CourseProgress در اولین بازدید (سه کوئری نوشتن)
+        self.assertWithinBudget('get', reverse('courses:course_detail', args=[self.course.pk]), 12)
+
+    def test_course_detail_not_enrolled(self):
+        self.assertWithinBudget('get', reverse('courses:course_detail', args=[self.other_course.pk]), 5)
+
+    def test_exercise_detail(self):
+        self.assertWithinBudget('get', reverse('courses:exercise_detail', args=[self.exercise.pk]), 6)
+
+    def test_enroll(self):
+        self.assertWithinBudget('post', reverse('courses:enroll', args=[self.other_course.pk]), 7, status=302)
+
+    def test_home_redirects_logged_in_user(self):
+        self.assertWithinBudget('get', reverse('home'), 3, status=302)
+
+    def test_contact(self):
+        self.assertWithinBudget('get', reverse('contact'), 3)
+
+
+class AdminChangelistBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses, cls.exercises, cls.users = seed_dataset()
+        cls.admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin', password='x', first_name='مدیر', last_name='سایت',
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        budgets = {
+            'courses_coursetemplate': 8,
+            'courses_course': 8,
+            'courses_exercise': 8,
+            'courses_submission': 8,
+            'courses_enrollmentrequest': 8,
+            'courses_sitesetting': 8,
+            'users_customuser': 8,
+        }
+        for name, max_queries in budgets.items():
+            with self.subTest(changelist=name):
+                self.assertWithinBudget('get', reverse(f'admin:{name}_changelist'), max_queries)
+
+    def test_submission_changelist_search(self):
+        self.assertWithinBudget('get', reverse('admin:courses_submission_changelist') + '?q=seed1', 8)
+
+    def test_gradebook(self):
+        self.assertWithinBudget('get', reverse('admin:courses_course_gradebook', args=[self.courses[0].pk]), 8)
+
+    def test_user_change_form(self):
+        # اینلاین ارسال‌ها نباید برای هر ردیف دوره و تمرین را جدا بخواند
+        self.assertWithinBudget('get', reverse('admin:users_customuser_change', args=[self.users[0].pk]), 11)
@@ -0,0 +1,159 @@
+"""
+ذخیره‌ی فایل‌های ارسالی به صورت content-addressed.
+
+هر فایل با SHA-256 محتوایش در مسیر blobs/ab/cd/<sha256><ext> ذخیره می‌شود؛ پس ارسال دوباره‌ی
+همان محتوا (توسط همان دانشجو یا دیگری) فضای دیسک جدیدی نمی‌گیرد.
+
+ContentAddressedUploadHandler تکه‌های آپلود را مستقیم در پوشه‌ی media می‌نویسد و همزمان هش را
+حساب می‌کند؛ فایل تا ذخیره‌ی ارسال در blobs/tmp می‌ماند و بعد فقط یک rename انجام می‌شود (بدون
+کپی دوباره). فایل درخواستی که ارسالی نساخته (فرم نامعتبر، CSRF، خطا) با discard_unsaved پاک می‌شود.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+BLOB_ROOT = 'blobs'
+PARTIAL_DIR = os.path.join(BLOB_ROOT, 'tmp')
+
+
+def blob_name(digest, original_name):
+    ext = os.path.splitext(original_name)[1].lower()
+    return f'{BLOB_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def supports_streaming(storage=None):
+    # فقط وقتی فایل‌ها روی دیسک محلی (دیسک mount شده‌ی media) هستند می‌توان مستقیم در مقصد نوشت
+    storage = storage or default_storage
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return False
+    return True
+
+
+class StoredBlob(UploadedFile):
+    """
+    فایلی که handler آپلود در پوشه‌ی موقت نوشته و هشش را دارد؛ Submission.save آن را با promote
+    (بدون نوشتن دوباره) به مخزن blob منتقل می‌کند.
+    """
+
+    def __init__(self, file, name, content_type, size, charset, digest, stored_name, storage):
+        super().__init__(file, name, content_type, size, charset)
+        self.sha256 = digest
+        self.blob_name = stored_name
+        self.storage = storage
+        self.promoted = False
+
+    def promote(self):
+        self.file.close()
+        final_path = self.storage.path(self.blob_name)
+        if os.path.exists(final_path):
+            # همین محتوا قبلا ذخیره شده است
+            os.remove(self.file.name)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self.file.name, final_path)
+        self.promoted = True
+
+    def discard(self):
+        if self.promoted:
+            return
+        self.file.close()
+        try:
+            os.remove(self.file.name)
+        except FileNotFoundError:
+            pass
+
+
+class ContentAddressedUploadHandler(FileUploadHandler):
+    def __init__(self, request=None, field_name='submitted_file', storage=None):
+        super().__init__(request)
+        self.target_field = field_name
+        self.storage = storage or default_storage
+        self.active = False
+        self.partial = None
+        self.blobs = []
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.target_field
+        if not self.active:
+            return
+        partial_dir = self.storage.path(PARTIAL_DIR)
+        os.makedirs(partial_dir, exist_ok=True)
+        self.partial = tempfile.NamedTemporaryFile(dir=partial_dir, suffix='.part', delete=False)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        self.hasher.update(raw_data)
+        self.partial.write(raw_data)
+        self.size += len(raw_data)
+        # None یعنی این تکه به handler های بعدی (حافظه / فایل موقت) داده نشود
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        self.partial.close()
+
+        digest = self.hasher.hexdigest()
+        blob = StoredBlob(
+            file=open(self.partial.name, 'rb'),
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            digest=digest,
+            stored_name=blob_name(digest, self.file_name),
+            storage=self.storage,
+        )
+        self.partial = None
+        self.blobs.append(blob)
+        return blob
+
+    def upload_interrupted(self):
+        if self.partial is not None:
+            self.partial.close()
+            try:
+                os.remove(self.partial.name)
+            except FileNotFoundError:
+                pass
+            self.partial = None
+
+    def discard_unsaved(self):
+        """بعد از پاسخ: فایل‌هایی که به ارسالی تبدیل نشده‌اند پاک می‌شوند."""
+        self.upload_interrupted()
+        for blob in self.blobs:
+            blob.discard()
+
+
+def store_blob(content, storage=None):
+    """
+    برای فایل‌هایی که از مسیر handler نیامده‌اند (مثلا پنل ادمین):
+    هش را با خواندن تکه‌ای حساب می‌کند و فقط اگر blob وجود نداشت آن را ذخیره می‌کند.
+    خروجی: (نام ذخیره شده، هش، اندازه)
+    """
+    storage = storage or default_storage
+    hasher = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+        size += len(chunk)
+
+    digest = hasher.hexdigest()
+    stored_name = blob_name(digest, content.name)
+    if not storage.exists(stored_name):
+        content.seek(0)
+        stored_name = storage.save(stored_name, content)
+    return stored_name, digest, size
@@ -1,12 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# زیر ASGI صفحه‌های خواندنی دانشجو از نسخه‌ی async استفاده می‌کنند (courses/async_views.py)
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 
 app_name = 'courses'
 
 urlpatterns = [
-    path('', views.course_list, name='course_list'), # لیست همه دوره‌ها
-    path('<int:course_id>/', views.course_detail, name='course_detail'), # جزئیات یک دوره خاص
+    path('', read_views.course_list, name='course_list'), # لیست همه دوره‌ها
+    path('<int:course_id>/', read_views.course_detail, name='course_detail'), # جزئیات یک دوره خاص
     path('<int:course_id>/enroll/', views.enroll_course, name='enroll'), # لینک ثبت‌نام در دوره
-    path('exercise/<int:exercise_id>/', views.exercise_detail, name='exercise_detail'),
+    path('exercise/<int:exercise_id>/', read_views.exercise_detail, name='exercise_detail'),
 ]
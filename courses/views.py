@@ -7,32 +7,79 @@ from .forms import SubmissionForm
 from .models import Course, EnrollmentRequest
 from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from .cache import get_course_exercises, get_versions, user_version_name
+from .progress import get_progress
+from .uploads import ContentAddressedUploadHandler, supports_streaming
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+import hashlib
+
+
+# مدت نگه‌داری کارت‌های رندر شده‌ی داشبورد (ثانیه)
+COURSE_CARDS_TIMEOUT = 60 * 60
+# صفحه‌ی تمرین فقط آخرین ارسال‌ها را نشان می‌دهد؛ تاریخچه‌ی کامل از API (courses/api.py) صفحه‌به‌صفحه خوانده می‌شود
+SUBMISSION_HISTORY_LIMIT = 20
+
+
+def course_cards_cache_key(request, user):
+    # کارت‌های رندر شده برای هر کاربر کش می‌شوند و با تغییر دوره، عضویت یا درخواست ثبت‌نام
+    # (نسخه‌ی courses یا user:<id>) کلید کش عوض می‌شود. هش توکن CSRF هم در کلید است
+    # چون فرم‌های ثبت‌نام داخل همین بخش هستند.
+    versions = get_versions('courses', user_version_name(user.pk))
+    get_token(request)
+    csrf_digest = hashlib.sha256(request.META.get('CSRF_COOKIE', '').encode()).hexdigest()[:12]
+    return 'course_cards:{}:{}:{}:{}'.format(
+        user.pk, versions['courses'], versions[user_version_name(user.pk)], csrf_digest,
+    )
+
+
+# کارت‌ها زیر نسخه‌ی تازه کش می‌شوند، پس از دیتابیس اصلی خوانده می‌شوند نه replica ای که شاید
+# هنوز تغییر را ندارد (maintenance/replicas.py)
+
+def my_courses_queryset(user):
+    # دوره‌های فعلی دانشجو (الگو در همان کوئری خوانده می‌شود)
+    return user.courses_joined.using(DEFAULT_DB_ALIAS).select_related('template').order_by('-created_at')
+
+
+def available_courses_queryset(user):
+    # دوره‌های قابل ثبت‌نام (آن‌هایی که دانشجو ندارد) به همراه وضعیت «در انتظار تایید»
+    pending_request = EnrollmentRequest.objects.filter(student=user, course=OuterRef('pk'))
+    return (
+        Course.objects.using(DEFAULT_DB_ALIAS).filter(is_active_for_signup=True)
+        .exclude(students=user)
+        .select_related('template')
+        .annotate(is_pending=Exists(pending_request))
+        .order_by('-created_at')
+    )
 
 
 @login_required
 def course_list(request):
-    # دوره‌های فعلی دانشجو
-    my_courses = request.user.courses_joined.all().order_by('-created_at')
+    user = request.user
+    cache_key = course_cards_cache_key(request, user)
 
-    # دوره‌های قابل ثبت‌نام (آن‌هایی که دانشجو ندارد)
-    available_courses = Course.objects.filter(is_active_for_signup=True).exclude(students=request.user).order_by('-created_at')
+    course_cards = cache.get(cache_key)
+    if course_cards is None:
+        context = {
+            'my_courses': list(my_courses_queryset(user)),
+            'available_courses': list(available_courses_queryset(user)),
+        }
+        course_cards = render_to_string('courses/course_cards.html', context, request=request)
+        cache.set(cache_key, course_cards, COURSE_CARDS_TIMEOUT)
 
-    # لیست آی‌دی دوره‌هایی که دانشجو براشون درخواست داده و هنوز تایید نشده
-    pending_ids = EnrollmentRequest.objects.filter(student=request.user).values_list('course_id', flat=True)
-
-    context = {
-        'my_courses': my_courses,
-        'available_courses': available_courses,
-        'pending_ids': pending_ids,
-    }
-    return render(request, 'courses/course_list.html', context)
+    return render(request, 'courses/course_list.html', {'course_cards': mark_safe(course_cards)})
 
 @login_required
 def course_detail(request, course_id):
     course = get_object_or_404(Course, pk=course_id)
     
     # چک می‌کنیم آیا دانشجو در این دوره ثبت نام کرده است یا نه
-    is_enrolled = request.user in course.students.all()
+    is_enrolled = course.is_member(request.user)
     
     exercises = []
     # مقادیر اولیه برای درصد پیشرفت (برای حالتی که ثبت‌نام نکرده)
@@ -41,22 +88,14 @@ def course_detail(request, course_id):
     total_exercises = 0
 
     if is_enrolled:
-        # فقط تمرینات همین دوره را می‌گیریم
-        exercises = course.exercises.all().order_by('order')
-        
-        # 1. محاسبه تعداد کل تمرین‌های این دوره
-        total_exercises = exercises.count()
-
-        # 2. محاسبه تعداد تمرین‌هایی که دانشجو انجام داده
-        # نکته: از values و distinct استفاده می‌کنیم تا اگر برای یک تمرین چند بار فایل فرستاده، فقط یکی حساب شود
-        submitted_count = Submission.objects.filter(
-            student=request.user,
-            exercise__in=exercises
-        ).values('exercise').distinct().count()
+        # فقط تمرینات همین دوره را می‌گیریم (از کش نسخه‌دار؛ با هر تغییر تمرین یا قفل عوض می‌شود)
+        exercises = get_course_exercises(course.pk)
 
-        # 3. محاسبه درصد (با شرط اینکه مخرج صفر نشود)
-        if total_exercises > 0:
-            progress_percentage = int((submitted_count / total_exercises) * 100)
+        # پیشرفت از جدول خلاصه (CourseProgress) خوانده می‌شود و با هر ارسال به‌روز می‌شود
+        progress = get_progress(request.user, course)
+        total_exercises = progress.total_exercises
+        submitted_count = progress.submitted_count
+        progress_percentage = progress.percentage
 
     context = {
         'course': course,
@@ -75,7 +114,7 @@ def enroll_course(request, course_id):
     course = get_object_or_404(Course, pk=course_id)
     
     # چک می‌کنیم اگر قبلا عضو است
-    if request.user in course.students.all():
+    if course.is_member(request.user):
         messages.warning(request, 'شما قبلاً در این دوره عضو شده‌اید.')
     # چک می‌کنیم اگر قبلا درخواست داده
     elif EnrollmentRequest.objects.filter(student=request.user, course=course).exists():
@@ -87,17 +126,41 @@ def enroll_course(request, course_id):
     
     return redirect('courses:course_list')
 
-@login_required
-def exercise_detail(request, exercise_id):
-    exercise = get_object_or_404(Exercise, pk=exercise_id)
-    
+def exercise_access_denied(request, exercise):
+    """پاسخ رد دسترسی به صفحه‌ی تمرین (قفل یا عضو نبودن در دوره)، یا None."""
     if exercise.is_locked:
         return HttpResponseForbidden("این تمرین قفل است.")
 
-    if request.user not in exercise.course.students.all():
+    if not exercise.course.is_member(request.user):
         messages.error(request, "شما در این دوره ثبت نام نکرده‌اید.")
         return redirect('courses:course_detail', course_id=exercise.course.id)
+    return None
+
 
+@csrf_exempt
+@login_required
+def exercise_detail(request, exercise_id):
+    # دسترسی قبل از خوانده شدن بدنه‌ی درخواست بررسی می‌شود تا هر درخواستی نتواند دیسک را پر کند
+    exercise = get_object_or_404(Exercise.objects.select_related('course'), pk=exercise_id)
+    denied = exercise_access_denied(request, exercise)
+    if denied is not None:
+        return denied
+    if request.method != 'POST' or not supports_streaming():
+        return _exercise_detail(request, exercise)
+
+    # handler آپلود باید قبل از خوانده شدن request.POST اضافه شود، پس بررسی CSRF
+    # را به بعد از آن منتقل می‌کنیم (الگوی مستندات جنگو برای upload handler سفارشی)
+    handler = ContentAddressedUploadHandler(request)
+    request.upload_handlers.insert(0, handler)
+    try:
+        return _exercise_detail(request, exercise)
+    finally:
+        # فایل درخواستی که رد شد (CSRF، فرم نامعتبر، خطا) در مخزن blob نمی‌ماند
+        handler.discard_unsaved()
+
+
+@csrf_protect
+def _exercise_detail(request, exercise):
     if request.method == 'POST':
         # نکته کلیدی: request.FILES برای دریافت فایل ضروری است
         form = SubmissionForm(request.POST, request.FILES)
@@ -111,12 +174,15 @@ def exercise_detail(request, exercise_id):
     else:
         form = SubmissionForm()
 
-    previous_submissions = exercise.submissions.filter(student=request.user).order_by('-submitted_at')
+    previous_submissions = list(
+        exercise.submissions.filter(student=request.user).order_by('-submitted_at', '-pk')[:SUBMISSION_HISTORY_LIMIT + 1]
+    )
 
     context = {
         'exercise': exercise,
         'form': form,
-        'previous_submissions': previous_submissions
+        'previous_submissions': previous_submissions[:SUBMISSION_HISTORY_LIMIT],
+        'more_submissions': len(previous_submissions) > SUBMISSION_HISTORY_LIMIT,
     }
     return render(request, 'courses/exercise_detail.html', context)
 
@@ -150,7 +216,7 @@ def contact_us(request):
         """
 
         try:
-            # 3. ارسال ایمیل
+            # 3. ارسال ایمیل (با EMAIL_OUTBOX=True در صف ثبت می‌شود و send_outbox آن را می‌فرستد)
             send_mail(
                 subject=f"📩 پیام تماس با ما: {subject}",  # عنوان ایمیل
                 message=full_message,                     # متن ایمیل
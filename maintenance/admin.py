@@ -1,3 +1,21 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import OutboxEmail
+
+
+@admin.action(description='🔁 ارسال دوباره‌ی ایمیل‌های انتخاب شده')
+def retry_emails(modeladmin, request, queryset):
+    queryset.exclude(status=OutboxEmail.STATUS_SENT).update(
+        status=OutboxEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+    )
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['status']
+    search_fields = ['subject', 'recipients']
+    readonly_fields = ['from_email', 'recipients', 'subject', 'attempts', 'last_error', 'created_at', 'sent_at']
+    exclude = ['raw_message']
+    actions = [retry_emails]
@@ -0,0 +1,27 @@
+"""
+ابزار مشترک دستورهای benchmark.
+
+دستورهای benchmark هزاران ردیف می‌سازند؛ با scratch_database همه‌ی آن‌ها در یک دیتابیس موقت
+(همان دیتابیسی که manage.py test می‌سازد: test_<نام> یا SQLite در حافظه) نوشته می‌شوند و
+دیتابیس واقعی دست نمی‌خورد. فایل‌ها هم با scratch_media_root در یک MEDIA_ROOT موقت نوشته می‌شوند.
+"""
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import override_settings
+
+
+@contextmanager
+def scratch_database():
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def scratch_media_root():
+    with tempfile.TemporaryDirectory(prefix='bench-media-') as media_root, override_settings(MEDIA_ROOT=media_root):
+        yield media_root
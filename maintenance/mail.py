@@ -0,0 +1,174 @@
+"""
+صف ایمیل (outbox) در دیتابیس.
+
+OutboxBackend (با EMAIL_OUTBOX=True) به جای اتصال به SMTP در حین درخواست، پیام را در جدول
+OutboxEmail ذخیره می‌کند (داخل همان تراکنش درخواست). دستور send_outbox پیام‌ها را دسته‌دسته با
+یک اتصال SMTP برای هر دسته می‌فرستد و پیام‌های ناموفق را با تاخیر رو به افزایش دوباره امتحان می‌کند.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+# مدتی که پیام برداشته شده توسط یک worker از دید بقیه پنهان می‌ماند
+CLAIM_SECONDS = 10 * 60
+
+
+class OutboxBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            rows.append(OutboxEmail(
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                recipients='\n'.join(recipients),
+                subject=str(message.subject)[:255],
+                raw_message=message.message().as_bytes(),
+            ))
+        OutboxEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+class _RawMIME:
+    """پیام MIME از پیش ساخته شده، با همان رابطی که بک‌اندهای ایمیل جنگو از message() انتظار دارند."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def as_bytes(self, linesep='\n'):
+        if linesep == '\n':
+            return self.data
+        return self.data.replace(b'\r\n', b'\n').replace(b'\n', linesep.encode())
+
+    def get_charset(self):
+        return None
+
+
+class OutboxMessage(EmailMessage):
+    """یک ردیف OutboxEmail به شکل EmailMessage تا هر بک‌اند جنگو (SMTP، کنسول، ...) بتواند آن را بفرستد."""
+
+    def __init__(self, row):
+        super().__init__(subject=row.subject, from_email=row.from_email)
+        self.row = row
+
+    def recipients(self):
+        return self.row.recipient_list()
+
+    def message(self, *args, **kwargs):
+        return _RawMIME(bytes(self.row.raw_message))
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def is_permanent(error):
+    # خطاهای 5xx (مثلا آدرس نامعتبر) با تلاش دوباره درست نمی‌شوند
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def _record_failure(row, error, now, max_attempts):
+    row.attempts += 1
+    row.last_error = f'{type(error).__name__}: {error}'[:2000]
+    if row.attempts >= max_attempts or is_permanent(error):
+        row.status = OutboxEmail.STATUS_DEAD
+    else:
+        row.next_attempt_at = now + backoff(row.attempts)
+
+
+def _claim(batch_size):
+    """
+    پیام‌های آماده را در یک تراکنش کوتاه برمی‌دارد و زمان تلاش بعدی‌شان را CLAIM_SECONDS جلو می‌برد
+    تا worker های دیگر آن‌ها را برندارند. اگر worker وسط ارسال بمیرد، بعد از این مدت دوباره فرستاده می‌شوند.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        rows = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if rows:
+            OutboxEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS),
+            )
+    return rows, now
+
+
+def _send(rows, now, max_attempts):
+    connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND, fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        # سرور در دسترس نیست؛ کل دسته بعدا دوباره امتحان می‌شود
+        for row in rows:
+            _record_failure(row, error, now, max_attempts)
+        return
+
+    done = set()
+    try:
+        for row in rows:
+            try:
+                connection.send_messages([OutboxMessage(row)])
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as error:
+                _record_failure(row, error, now, max_attempts)
+                done.add(row.pk)
+                # اتصال قطع شد؛ برای بقیه‌ی دسته اتصال تازه باز کن
+                connection.close()
+                connection.open()
+            except Exception as error:
+                _record_failure(row, error, now, max_attempts)
+                done.add(row.pk)
+            else:
+                row.attempts += 1
+                row.status = OutboxEmail.STATUS_SENT
+                row.sent_at = timezone.now()
+                row.last_error = ''
+                done.add(row.pk)
+    except Exception as error:
+        # باز کردن دوباره‌ی اتصال هم شکست خورد؛ بقیه‌ی دسته را برای بعد نگه دار
+        for row in rows:
+            if row.pk not in done:
+                _record_failure(row, error, now, max_attempts)
+    finally:
+        connection.close()
+
+
+def deliver_batch(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    یک دسته از پیام‌های آماده را می‌فرستد و (sent, retried, dead) برمی‌گرداند.
+    برداشتن و ثبت نتیجه هر کدام یک تراکنش کوتاه است و ارسال SMTP بیرون از تراکنش (و بدون
+    نگه داشتن قفل ردیف‌ها) انجام می‌شود.
+    """
+    sent = retried = dead = 0
+    rows, now = _claim(batch_size)
+    if not rows:
+        return sent, retried, dead
+
+    _send(rows, now, max_attempts)
+    OutboxEmail.objects.bulk_update(
+        rows, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+    for row in rows:
+        if row.status == OutboxEmail.STATUS_SENT:
+            sent += 1
+        elif row.status == OutboxEmail.STATUS_DEAD:
+            dead += 1
+        else:
+            retried += 1
+    return sent, retried, dead
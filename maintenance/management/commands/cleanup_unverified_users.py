@@ -1,26 +1,118 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
+import time
 from datetime import timedelta
+
 from allauth.account.models import EmailAddress
 from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
 
 User = get_user_model()
 
+
+def unverified_users(cutoff):
+    unverified_email = EmailAddress.objects.filter(user=OuterRef('pk'), verified=False)
+    return User.objects.filter(
+        Exists(unverified_email),
+        date_joined__lt=cutoff,
+        is_superuser=False,
+    )
+
+
 class Command(BaseCommand):
-    help = "Delete users who didn't verify email"
+    help = "Delete users who didn't verify email, in small pk-ordered chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=15,
+                            help='Only delete users who joined more than this many minutes ago')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Users deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.5,
+                            help='Seconds to pause between chunks')
+        parser.add_argument('--max-runtime', type=float, default=None,
+                            help='Stop after this many seconds (whole process when used with --loop)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and clean up every --interval seconds')
+        parser.add_argument('--interval', type=float, default=60,
+                            help='Seconds between runs with --loop')
 
     def handle(self, *args, **options):
-        cutoff = timezone.now() - timedelta(minutes=15)
+        deadline = None
+        if options['max_runtime'] is not None:
+            deadline = time.monotonic() + options['max_runtime']
+
+        try:
+            while True:
+                self._run_once(options, deadline)
+                if not options['loop'] or self._expired(deadline):
+                    break
+                self._pause(options['interval'], deadline)
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
+
+    def _expired(self, deadline):
+        return deadline is not None and time.monotonic() >= deadline
+
+    def _pause(self, seconds, deadline):
+        # --max-runtime وسط مکث هم رعایت می‌شود
+        if deadline is not None:
+            seconds = min(seconds, deadline - time.monotonic())
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _run_once(self, options, deadline):
+        cutoff = timezone.now() - timedelta(minutes=options['minutes'])
+        candidates = unverified_users(cutoff)
+
+        if options['dry_run']:
+            count = candidates.count()
+            self.stdout.write(
+                self.style.SUCCESS(f"{count} unverified users would be deleted (dry run)")
+            )
+            return
+
+        started = time.monotonic()
+        deleted_users = 0
+        deleted_rows = {}
+        chunks = 0
+        slowest = 0.0
+        last_pk = 0
+        while not self._expired(deadline):
+            # یک شناسه‌ی بیشتر خوانده می‌شود تا بعد از تکه‌ی آخر بی‌دلیل مکث نکنیم
+            chunk_ids = list(
+                candidates.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['chunk_size'] + 1]
+            )
+            more = len(chunk_ids) > options['chunk_size']
+            chunk_ids = chunk_ids[:options['chunk_size']]
+            if not chunk_ids:
+                break
+            last_pk = chunk_ids[-1]
+
+            chunk_started = time.monotonic()
+            # هر تکه یک تراکنش کوتاه؛ شرط‌ها دوباره اعمال می‌شوند تا کاربری که در این فاصله
+            # ایمیلش را تایید کرده حذف نشود
+            with transaction.atomic():
+                _, per_model = candidates.filter(pk__in=chunk_ids).delete()
+            slowest = max(slowest, time.monotonic() - chunk_started)
+            chunks += 1
 
-        users = User.objects.filter(
-            emailaddress__verified=False,
-            date_joined__lt=cutoff,
-            is_superuser=False
-        ).distinct()
+            deleted_users += per_model.get(User._meta.label, 0)
+            for label, count in per_model.items():
+                deleted_rows[label] = deleted_rows.get(label, 0) + count
 
-        count = users.count()
-        users.delete()
+            if not more:
+                break
+            self._pause(options['sleep'], deadline)
 
+        if chunks:
+            details = ", ".join(f"{label}: {count}" for label, count in sorted(deleted_rows.items()))
+            self.stdout.write(
+                f"{chunks} chunks in {time.monotonic() - started:.1f}s, "
+                f"slowest {slowest * 1000:.0f} ms ({details})"
+            )
         self.stdout.write(
-            self.style.SUCCESS(f"{count} unverified users deleted")
+            self.style.SUCCESS(f"{deleted_users} unverified users deleted")
         )
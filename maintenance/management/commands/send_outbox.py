@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from maintenance.mail import MAX_ATTEMPTS, deliver_batch
+from maintenance.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails in batches over one SMTP connection per batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='Give up on a message (mark it dead) after this many failed attempts')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when the outbox is empty (with --loop)')
+        parser.add_argument('--keep-sent-days', type=int, default=7,
+                            help='Delete sent messages older than this many days')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                sent, retried, dead = self._drain(options)
+                if sent or retried or dead:
+                    self.stdout.write(
+                        self.style.SUCCESS(f"{sent} sent, {retried} to retry, {dead} dead")
+                    )
+                self._purge(options['keep_sent_days'])
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
+
+    def _drain(self, options):
+        # دسته‌ها را تا خالی شدن صف (یا رسیدن فقط به پیام‌هایی که باید صبر کنند) پشت سر هم بفرست
+        totals = [0, 0, 0]
+        while True:
+            counts = deliver_batch(options['batch_size'], options['max_attempts'])
+            totals = [total + count for total, count in zip(totals, counts)]
+            if sum(counts) < options['batch_size']:
+                return totals
+
+    def _purge(self, days):
+        cutoff = timezone.now() - timedelta(days=days)
+        OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENT, sent_at__lt=cutoff).delete()
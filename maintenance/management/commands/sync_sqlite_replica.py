@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary database into the SQLite replica files, for trying the read-replica "
+        "router locally. With --loop the copy repeats, which behaves like replication lag"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between copies (with --loop)')
+
+    def handle(self, *args, **options):
+        aliases = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not aliases:
+            raise CommandError('No replicas configured; set DATABASE_REPLICA_URLS (e.g. sqlite:////tmp/replica.sqlite3)')
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not SQLite; real replicas are kept up to date by the database server')
+
+        try:
+            while True:
+                started = time.perf_counter()
+                for alias in aliases:
+                    self._copy(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'], settings.DATABASES[alias]['NAME'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"Copied primary to {', '.join(aliases)} in {time.perf_counter() - started:.2f}s"
+                ))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
+
+    def _copy(self, source_name, target_name):
+        # backup API یک کپی سازگار می‌گیرد حتی اگر سرور همزمان در حال نوشتن باشد
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
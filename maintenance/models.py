@@ -1,3 +1,39 @@
 from django.db import models
 
-# Create your models here.
+
+class OutboxEmail(models.Model):
+    """ایمیلی که در تراکنش درخواست ذخیره شده و worker (send_outbox) بعدا آن را می‌فرستد."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'در صف'),
+        (STATUS_SENT, 'ارسال شده'),
+        (STATUS_DEAD, 'ناموفق (رها شده)'),
+    ]
+
+    from_email = models.CharField(max_length=254)
+    # گیرنده‌های واقعی (to + cc + bcc)، هر خط یک آدرس
+    recipients = models.TextField()
+    subject = models.CharField(max_length=255, blank=True)
+    # متن کامل MIME پیام، همان چیزی که به سرور SMTP داده می‌شود
+    raw_message = models.BinaryField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # کوئری worker: پیام‌های در صف که زمان تلاش بعدی‌شان رسیده
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.recipients.splitlines()[0] if self.recipients else '-'} ({self.status})"
+
+    def recipient_list(self):
+        return [address for address in self.recipients.splitlines() if address]
@@ -0,0 +1,270 @@
+"""
+پروفایل سبک درخواست‌ها برای روشن ماندن در production.
+
+برای هر درخواست تعداد و زمان کوئری‌ها، زمان رندر قالب و زمان کل ثبت می‌شود و برای کاربران staff
+در هدر Server-Timing برمی‌گردد (در DevTools مرورگر، تب Network > Timing دیده می‌شود).
+درخواست‌های کندتر از PROFILING_SLOW_MS با کوئری‌هایشان (و در صورت نیاز خروجی EXPLAIN) در یک
+بافر حلقوی با اندازه‌ی ثابت نگه داشته می‌شوند و صفحه‌ی /admin/profiling/ صدک‌های هر ویو را نشان می‌دهد.
+
+شمارش کوئری‌ها با یک execute_wrapper دائمی روی هر اتصال انجام می‌شود که پروفایل درخواست جاری را
+از یک contextvar می‌خواند؛ پس زیر ASGI و داخل sync_to_async هم کار می‌کند و بیرون از درخواست
+(دستورات مدیریتی، worker ها) تقریبا هزینه‌ای ندارد.
+داده‌ها در حافظه‌ی همان پروسه هستند؛ هر worker آمار خودش را دارد.
+"""
+import functools
+import math
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, empty
+
+
+MAX_STATEMENTS = 200    # کوئری‌های نگه داشته شده از هر درخواست
+EXPLAIN_TOP = 3         # چند کوئری کندتر هر درخواست کند EXPLAIN می‌شوند
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    __slots__ = ('queries', 'sql_time', 'template_time', 'template_depth', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.statements = []
+
+
+def _sql_timer(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        profile.queries += 1
+        profile.sql_time += duration
+        if len(profile.statements) < MAX_STATEMENTS:
+            profile.statements.append((context['connection'].alias, sql, params, many, duration))
+
+
+def _install_sql_timer(sender, connection, **kwargs):
+    if _sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_timer)
+
+
+def install():
+    """از MaintenanceConfig.ready صدا زده می‌شود."""
+    if not getattr(settings, 'PROFILING_ENABLED', False):
+        return
+    connection_created.connect(_install_sql_timer, dispatch_uid='maintenance.profiling')
+    for connection in connections.all(initialized_only=True):
+        _install_sql_timer(None, connection)
+    _install_template_timer()
+
+
+def _install_template_timer():
+    from django.template.backends.django import Template
+
+    original = Template.render
+    if getattr(original, 'profiled', False):
+        return
+
+    @functools.wraps(original)
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        # قالب‌هایی که داخل رندر قالب دیگری رندر می‌شوند دو بار شمرده نمی‌شوند
+        if profile is None or profile.template_depth:
+            return original(self, context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+            profile.template_depth -= 1
+
+    render.profiled = True
+    Template.render = render
+
+
+def percentile(sorted_values, fraction):
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class ProfileStore:
+    """زمان‌های اخیر هر ویو (پنجره‌ی ثابت) و بافر حلقوی درخواست‌های کند."""
+
+    def __init__(self, window, slow_size):
+        self.window = window
+        self.lock = threading.Lock()
+        self.views = {}
+        self.slow = deque(maxlen=slow_size)
+
+    def record(self, view, total, profile):
+        with self.lock:
+            samples = self.views.get(view)
+            if samples is None:
+                samples = self.views[view] = deque(maxlen=self.window)
+            samples.append((total, profile.sql_time, profile.queries, profile.template_time))
+
+    def add_slow(self, entry):
+        with self.lock:
+            self.slow.append(entry)
+
+    def view_stats(self):
+        with self.lock:
+            snapshot = {view: list(samples) for view, samples in self.views.items()}
+        rows = []
+        for view, samples in snapshot.items():
+            totals = sorted(sample[0] for sample in samples)
+            rows.append({
+                'view': view,
+                'count': len(samples),
+                'p50': percentile(totals, 0.5) * 1000,
+                'p95': percentile(totals, 0.95) * 1000,
+                'p99': percentile(totals, 0.99) * 1000,
+                'db': sum(sample[1] for sample in samples) / len(samples) * 1000,
+                'queries': sum(sample[2] for sample in samples) / len(samples),
+                'tpl': sum(sample[3] for sample in samples) / len(samples) * 1000,
+            })
+        return sorted(rows, key=lambda row: row['p95'], reverse=True)
+
+    def slow_requests(self):
+        with self.lock:
+            return list(reversed(self.slow))
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+            self.slow.clear()
+
+
+store = ProfileStore(
+    window=getattr(settings, 'PROFILING_WINDOW', 1000),
+    slow_size=getattr(settings, 'PROFILING_SLOW_BUFFER', 50),
+)
+
+
+def _explain(statements):
+    plans = {}
+    selects = [
+        (index, statement) for index, statement in enumerate(statements)
+        if not statement[3] and statement[1].lstrip().upper().startswith('SELECT')
+    ]
+    selects.sort(key=lambda item: item[1][4], reverse=True)
+    for index, (alias, sql, params, _, _) in selects[:EXPLAIN_TOP]:
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                plans[index] = '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+        except Exception as error:  # EXPLAIN فقط برای عیب‌یابی است و نباید درخواست را خراب کند
+            plans[index] = f'EXPLAIN failed: {error}'
+    return plans
+
+
+def _statements(statements, explain):
+    plans = _explain(statements) if explain else {}
+    return [
+        {'alias': alias, 'sql': sql, 'ms': duration * 1000, 'plan': plans.get(index)}
+        for index, (alias, sql, _, _, duration) in enumerate(statements)
+    ]
+
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    # فقط اگر کاربر در همین درخواست خوانده شده باشد؛ خواندن نشست فقط برای این هدر یک کوئری
+    # اضافه است و زیر ASGI (بیرون از thread) اصلا مجاز نیست
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return False
+    return user.is_staff
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class ProfilingMiddleware:
+    """
+    باید اولین middleware باشد تا زمان کل شامل بقیه‌ی middleware ها هم بشود.
+    زمان رندر قالب شامل کوئری‌هایی است که هنگام رندر اجرا می‌شوند.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'PROFILING_SLOW_MS', 500) / 1000
+        self.explain = getattr(settings, 'PROFILING_EXPLAIN', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+        if total >= self.slow_seconds and self.explain:
+            return await sync_to_async(self._finish)(request, response, profile, total)
+        return self._finish(request, response, profile, total)
+
+    def _finish(self, request, response, profile, total):
+        view = _view_name(request)
+        store.record(view, total, profile)
+        if total >= self.slow_seconds:
+            store.add_slow({
+                'at': timezone.now(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': view,
+                'status': response.status_code,
+                'total': total * 1000,
+                'db': profile.sql_time * 1000,
+                'tpl': profile.template_time * 1000,
+                'queries': profile.queries,
+                'statements': _statements(profile.statements, self.explain),
+            })
+
+        if _is_staff(request):
+            response['Server-Timing'] = (
+                f'db;dur={profile.sql_time * 1000:.1f};desc="{profile.queries} queries", '
+                f'tpl;dur={profile.template_time * 1000:.1f};desc="templates", '
+                f'total;dur={total * 1000:.1f};desc="{view}"'
+            )
+        return response
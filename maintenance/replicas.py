@@ -0,0 +1,159 @@
+"""
+فرستادن خواندن‌های صفحه‌های پربازدید به replica های دیتابیس.
+
+فقط درخواست‌های GET/HEAD ویوهای REPLICA_VIEWS (صفحه‌های دوره و تمرین، changelist های ادمین)
+از replica می‌خوانند؛ بقیه‌ی درخواست‌ها، نوشتن‌ها و هر چیزی بیرون از درخواست (دستورات مدیریتی)
+روی دیتابیس اصلی می‌مانند. اولین نوشتن در یک درخواست، باقی خواندن‌های همان درخواست را به اصلی
+برمی‌گرداند و یک کوکی کوتاه‌مدت می‌گذارد تا خواندن‌های همان کاربر تا REPLICA_STICKY_SECONDS بعد
+هم از اصلی باشد؛ پس کاربر ارسال، درخواست ثبت‌نام یا نمره‌ای که همین الان ثبت کرده را با تاخیر
+replication از دست نمی‌دهد.
+
+تعداد خواندن‌های هر alias در حافظه‌ی همان پروسه شمرده می‌شود و در /admin/profiling/ دیده می‌شود.
+"""
+import random
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+# نشست در خود ویو (با اولین دسترسی به request.user) خوانده می‌شود؛ نشستی که هنوز به replica
+# نرسیده یعنی خروج ناخواسته‌ی کاربر، پس همیشه از اصلی خوانده می‌شود
+PRIMARY_APPS = {'sessions'}
+
+_state = ContextVar('replica_state', default=None)
+
+
+class ReplicaState:
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self):
+        self.alias = None   # replica انتخاب شده برای این درخواست؛ None یعنی دیتابیس اصلی
+        self.wrote = False
+
+
+class ReadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reads = Counter()
+
+    def record(self, alias):
+        with self.lock:
+            self.reads[alias] += 1
+
+    def split(self):
+        with self.lock:
+            reads = dict(self.reads)
+        total = sum(reads.values())
+        return [
+            {'alias': alias, 'reads': count, 'share': count / total * 100}
+            for alias, count in sorted(reads.items())
+        ]
+
+    def clear(self):
+        with self.lock:
+            self.reads.clear()
+
+
+stats = ReadStats()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or state.alias is None or state.wrote
+            or model._meta.app_label in PRIMARY_APPS or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            alias = DEFAULT_DB_ALIAS
+        else:
+            alias = state.alias
+        stats.record(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # شیئی که از replica خوانده شده هم در اصلی ذخیره می‌شود
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica ها کپی همان دیتابیس هستند
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'DATABASE_REPLICAS', []):
+            return False
+        return None
+
+
+def _wants_replica(request):
+    if request.method not in SAFE_METHODS or request.COOKIES.get(PIN_COOKIE):
+        return False
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return False
+    return any(fnmatchcase(match.view_name, pattern) for pattern in getattr(settings, 'REPLICA_VIEWS', []))
+
+
+class ReplicaMiddleware:
+    """
+    بعد از ProfilingMiddleware و قبل از SessionMiddleware قرار می‌گیرد تا نوشتن نشست (مثلا هنگام
+    ورود) هم کاربر را به اصلی بچسباند. replica در process_view (بعد از پیدا شدن ویو) انتخاب می‌شود.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+        if not self.replicas:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = ReplicaState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(response, state)
+
+    async def __acall__(self, request):
+        state = ReplicaState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is not None and not state.wrote and _wants_replica(request):
+            # یک replica برای کل درخواست، تا خواندن‌های یک صفحه با هم سازگار باشند
+            state.alias = random.choice(self.replicas)
+
+    def _finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.sticky_seconds, httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE, secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
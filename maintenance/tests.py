@@ -1,3 +1,284 @@
-from django.test import TestCase
+import io
+import smtplib
+import time
+import unittest.mock
+from datetime import timedelta
 
-# Create your tests here.
+from allauth.account.models import EmailAddress
+from django.contrib.sessions.models import Session
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from courses.models import Course, Submission
+from courses.tests import QueryBudgetTestCase
+from users.models import CustomUser
+from .mail import deliver_batch
+from .models import OutboxEmail
+from .profiling import install, store
+from .replicas import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter, stats
+
+
+class OutboxAdminBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        OutboxEmail.objects.bulk_create([
+            OutboxEmail(from_email='noreply@example.com', recipients=f'user{number}@example.com',
+                        subject=f'پیام {number}', raw_message=b'...')
+            for number in range(500)
+        ])
+        cls.admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin', password='x', first_name='مدیر', last_name='سایت',
+        )
+
+    def test_changelist(self):
+        self.client.force_login(self.admin)
+        self.assertWithinBudget('get', reverse('admin:maintenance_outboxemail_changelist'), 8)
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # PROFILING_ENABLED پیش‌فرض فقط با DEBUG روشن است و install در ready شاید اجرا نشده باشد
+        install()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(
+            email='admin@example.com', username='admin', password='x', first_name='مدیر', last_name='سایت',
+        )
+        cls.student = CustomUser.objects.create(email='student@example.com', first_name='Ali', last_name='Ahmadi')
+
+    def setUp(self):
+        store.clear()
+
+    def test_server_timing_only_for_staff(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:courses_course_changelist'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+')
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('courses:course_list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_percentiles_per_view(self):
+        self.client.force_login(self.student)
+        for _ in range(3):
+            self.client.get(reverse('courses:course_list'))
+        stats = {row['view']: row for row in store.view_stats()}
+        self.assertEqual(stats['courses:course_list']['count'], 3)
+        self.assertGreater(stats['courses:course_list']['queries'], 0)
+
+    @override_settings(PROFILING_SLOW_MS=0, PROFILING_EXPLAIN=True)
+    def test_slow_requests_capture_sql_and_plans(self):
+        self.client.force_login(self.student)
+        self.client.get(reverse('courses:course_list'))
+        entry = store.slow_requests()[0]
+        self.assertEqual(entry['view'], 'courses:course_list')
+        self.assertEqual(len(entry['statements']), entry['queries'])
+        self.assertTrue(any(statement['plan'] for statement in entry['statements']))
+
+    def test_profiling_page_is_staff_only(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('maintenance:profiling')).status_code, 302)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('maintenance:profiling')).status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTests(SimpleTestCase):
+    """فقط تصمیم router بررسی می‌شود؛ کوئری واقعی به replica ای (که در تست‌ها وجود ندارد) زده نمی‌شود."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, method, path, write=False, model=Course, cookies=None):
+        request = getattr(self.factory, method)(path)
+        request.resolver_match = resolve(path)
+        request.COOKIES.update(cookies or {})
+        seen = {}
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            seen['before_write'] = self.router.db_for_read(model)
+            if write:
+                self.router.db_for_write(Submission)
+            seen['read'] = self.router.db_for_read(model)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        response = middleware(request)
+        return seen, response
+
+    def test_page_reads_go_to_replica(self):
+        for path in (reverse('courses:course_detail', args=[1]), reverse('admin:courses_submission_changelist')):
+            with self.subTest(path=path):
+                seen, response = self.route('get', path)
+                self.assertEqual(seen['read'], 'replica1')
+                self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_other_views_and_methods_use_primary(self):
+        self.assertEqual(self.route('get', reverse('admin:courses_submission_change', args=[1]))[0]['read'], 'default')
+        self.assertEqual(self.route('post', reverse('courses:exercise_detail', args=[1]))[0]['read'], 'default')
+        self.assertEqual(self.route('get', reverse('courses:course_list'), model=Session)[0]['read'], 'default')
+
+    def test_write_sticks_user_to_primary(self):
+        seen, response = self.route('get', reverse('courses:course_detail', args=[1]), write=True)
+        self.assertEqual((seen['before_write'], seen['read']), ('replica1', 'default'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        seen, _ = self.route('get', reverse('courses:course_detail', args=[1]), cookies={PIN_COOKIE: '1'})
+        self.assertEqual(seen['read'], 'default')
+
+    def test_outside_requests_and_transactions_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Course), 'default')
+        self.assertEqual(self.router.db_for_write(Course), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'courses'))
+
+    def test_read_split(self):
+        stats.clear()
+        self.route('get', reverse('courses:course_detail', args=[1]))
+        self.router.db_for_read(Course)
+        self.assertEqual(
+            [(row['alias'], row['reads']) for row in stats.split()], [('default', 1), ('replica1', 2)],
+        )
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_disabled_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(lambda request: HttpResponse())
+
+
+class ReplicaTransactionTests(TransactionTestCase):
+    # TestCase خودش همه چیز را داخل atomic اجرا می‌کند
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_reads_inside_atomic_block_use_primary(self):
+        router = ReplicaRouter()
+        request = RequestFactory().get(reverse('courses:course_list'))
+        request.resolver_match = resolve(request.path)
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            outside = router.db_for_read(Course)
+            with transaction.atomic():
+                return HttpResponse(f'{outside} {router.db_for_read(Course)}')
+
+        middleware = ReplicaMiddleware(view)
+        self.assertEqual(middleware(request).content, b'replica1 default')
+
+
+class RecordingBackend(BaseEmailBackend):
+    """بک‌اند ارسال آزمایشی: bounce@ خطای دائمی و busy@ خطای موقت می‌گیرد."""
+    deliveries = []
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            recipient = message.recipients()[0]
+            if recipient.startswith('bounce@'):
+                raise smtplib.SMTPRecipientsRefused({recipient: (550, b'no such user')})
+            if recipient.startswith('busy@'):
+                raise smtplib.SMTPRecipientsRefused({recipient: (451, b'try again later')})
+            due = OutboxEmail.objects.filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            self.deliveries.append({
+                'raw': message.message().as_bytes(),
+                'in_transaction': connection.in_atomic_block,
+                'visible_to_other_workers': due.exists(),
+            })
+        return len(email_messages)
+
+
+@override_settings(
+    OUTBOX_DELIVERY_BACKEND='maintenance.tests.RecordingBackend', DEFAULT_FROM_EMAIL='noreply@example.com',
+)
+class OutboxDeliveryTests(TransactionTestCase):
+    def setUp(self):
+        RecordingBackend.deliveries = []
+
+    def queue(self, *recipients):
+        outbox = get_connection('maintenance.mail.OutboxBackend')
+        return outbox.send_messages([EmailMessage('سلام', 'متن پیام', to=[recipient]) for recipient in recipients])
+
+    def test_backend_stores_messages(self):
+        self.assertEqual(self.queue('a@example.com', 'b@example.com'), 2)
+        row = OutboxEmail.objects.order_by('pk').first()
+        self.assertEqual(row.from_email, 'noreply@example.com')
+        self.assertEqual(row.recipient_list(), ['a@example.com'])
+        self.assertIn(b'a@example.com', bytes(row.raw_message))
+
+    def test_sends_outside_transactions_with_rows_claimed(self):
+        self.queue('a@example.com', 'b@example.com')
+        self.assertEqual(deliver_batch(), (2, 0, 0))
+        self.assertEqual(len(RecordingBackend.deliveries), 2)
+        for delivery in RecordingBackend.deliveries:
+            self.assertFalse(delivery['in_transaction'])
+            self.assertFalse(delivery['visible_to_other_workers'])
+        self.assertEqual(RecordingBackend.deliveries[0]['raw'], bytes(OutboxEmail.objects.order_by('pk')[0].raw_message))
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', flat=True)), {OutboxEmail.STATUS_SENT})
+        self.assertEqual(deliver_batch(), (0, 0, 0))
+
+    def test_failures_are_retried_or_dropped(self):
+        self.queue('ok@example.com', 'busy@example.com', 'bounce@example.com')
+        started = timezone.now()
+        self.assertEqual(deliver_batch(), (1, 1, 1))
+        busy = OutboxEmail.objects.get(recipients='busy@example.com')
+        self.assertEqual(busy.status, OutboxEmail.STATUS_PENDING)
+        self.assertGreater(busy.next_attempt_at, started)
+        self.assertIn('SMTPRecipientsRefused', busy.last_error)
+        self.assertEqual(OutboxEmail.objects.get(recipients='bounce@example.com').status, OutboxEmail.STATUS_DEAD)
+        # پیام موقت تا رسیدن زمان تلاش بعدی دوباره فرستاده نمی‌شود
+        self.assertEqual(deliver_batch(), (0, 0, 0))
+
+        OutboxEmail.objects.filter(pk=busy.pk).update(next_attempt_at=started)
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 0, 1))
+
+
+class CleanupUnverifiedUsersTests(TestCase):
+    SLEEP = 'maintenance.management.commands.cleanup_unverified_users.time.sleep'
+
+    @classmethod
+    def setUpTestData(cls):
+        joined = timezone.now() - timedelta(hours=1)
+        for number in range(5):
+            user = CustomUser.objects.create(email=f'late{number}@example.com', date_joined=joined)
+            EmailAddress.objects.create(user=user, email=user.email, verified=False)
+        cls.verified = CustomUser.objects.create(email='ok@example.com', date_joined=joined)
+        EmailAddress.objects.create(user=cls.verified, email=cls.verified.email, verified=True)
+
+    def cleanup(self, *args):
+        call_command('cleanup_unverified_users', *args, stdout=io.StringIO())
+
+    def test_deletes_in_chunks_without_sleeping_after_the_last(self):
+        with unittest.mock.patch(self.SLEEP) as sleep:
+            self.cleanup('--chunk-size', '2', '--sleep', '1')
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(list(CustomUser.objects.all()), [self.verified])
+
+    def test_exact_multiple_of_chunk_size_does_not_sleep(self):
+        with unittest.mock.patch(self.SLEEP) as sleep:
+            self.cleanup('--chunk-size', '5', '--sleep', '1')
+        sleep.assert_not_called()
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_max_runtime_caps_the_loop_interval(self):
+        pauses = []
+        real_sleep = time.sleep
+
+        def sleep(seconds):
+            pauses.append(seconds)
+            real_sleep(seconds)
+
+        started = time.monotonic()
+        with unittest.mock.patch(self.SLEEP, side_effect=sleep):
+            self.cleanup('--loop', '--interval', '60', '--max-runtime', '0.2')
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(pauses)
+        self.assertTrue(all(seconds <= 0.2 for seconds in pauses))
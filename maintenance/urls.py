@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+
+app_name = 'maintenance'
+
+urlpatterns = [
+    path('', views.profiling_view, name='profiling'),
+    path('reset/', views.profiling_reset, name='profiling_reset'),
+]
@@ -1,3 +1,28 @@
-from django.shortcuts import render
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.views.decorators.http import require_POST
 
-# Create your views here.
+from . import replicas
+from .profiling import store
+
+
+@staff_member_required
+def profiling_view(request):
+    context = {
+        **admin.site.each_context(request),
+        'title': 'پروفایل درخواست‌ها',
+        'views': store.view_stats(),
+        'slow_requests': store.slow_requests(),
+        'read_split': replicas.stats.split(),
+    }
+    return TemplateResponse(request, 'admin/maintenance/profiling.html', context)
+
+
+@require_POST
+@staff_member_required
+def profiling_reset(request):
+    store.clear()
+    replicas.stats.clear()
+    return redirect('maintenance:profiling')
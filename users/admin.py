@@ -13,7 +13,11 @@ class SubmissionInline(admin.TabularInline):
     readonly_fields = ['course_info', 'exercise_info', 'submitted_at_formatted', 'file_link']
     extra = 0
     can_delete = False
-    
+
+    def get_queryset(self, request):
+        # دوره و تمرین هر ردیف در همان کوئری خوانده می‌شوند
+        return super().get_queryset(request).select_related('exercise__course')
+
     def course_info(self, obj):
         return obj.exercise.course.title
     course_info.short_description = "دوره"
@@ -3,6 +3,7 @@ from django.contrib.auth.forms import UserCreationForm
 from allauth.account.forms import SignupForm
 from .models import CustomUser
 from courses.models import Course
+from courses.cache import get_signup_catalog
 
 # فرم ۱: برای استفاده در پنل ادمین (بدون تغییر)
 class CustomUserCreationForm(UserCreationForm):
@@ -43,6 +44,12 @@ class CustomSignupForm(SignupForm):
         widget=forms.Select(attrs={'class': 'form-select'}) # کلاس مناسب برای لیست کشویی
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # گزینه‌های لیست دوره‌ها از کش می‌آید تا نمایش صفحه ثبت‌نام کوئری نزند
+        course_field = self.fields['course']
+        course_field.choices = [('', course_field.empty_label)] + get_signup_catalog()
+
     def save(self, request):
         # ۱. ساخت یوزر اولیه با ایمیل و پسورد (توسط Allauth)
         user = super(CustomSignupForm, self).save(request)
@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from maintenance.benchmarks import scratch_database
+from users.models import CustomUser
+from users.usernames import allocate_username, assign_usernames
+
+
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+# روش قبلی فقط ۹۹۹۰ شماره‌ی تصادفی دارد؛ وقتی پر شوند حلقه هیچ‌وقت تمام نمی‌شود
+MAX_PROBES = 2000
+BASE_NAMES = [('Ali', 'Ahmadi'), ('Sara', 'Mohammadi'), ('Reza', 'Karimi'), ('Maryam', 'Hosseini')]
+
+
+def _random_probe(base_username):
+    # روش قبلی CustomUser.save: امتحان عدد تصادفی تا پیدا شدن یوزرنیم آزاد
+    candidate = base_username
+    probes = 1
+    while CustomUser.objects.filter(username=candidate).exists():
+        if probes >= MAX_PROBES:
+            return None, probes
+        candidate = f"{base_username}{random.randint(10, 9999)}"
+        probes += 1
+    return candidate, probes
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the counter-based username allocator against the old random-probe loop on many colliding names "
+        "(runs in a temporary database)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Number of users sharing a few base names')
+        parser.add_argument('--signups', type=int, default=200, help='Allocations to time with each method')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self._run(options['users'], options['signups'])
+
+    def _run(self, count, signups):
+        self._populate(count)
+
+        first_name, last_name = BASE_NAMES[0]
+        base_username = f"{first_name}{last_name}"
+
+        failed = 0
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(signups):
+                candidate, _ = _random_probe(base_username)
+                failed += candidate is None
+        old_ms = (time.perf_counter() - start) / signups * 1000
+        old_queries = len(queries)
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(signups):
+                allocate_username(base_username)
+        new_ms = (time.perf_counter() - start) / signups * 1000
+        new_queries = len(queries)
+
+        self.stdout.write(
+            f"random probe (before) {old_ms:9.3f} ms/signup   {old_queries / signups:8.1f} queries/signup"
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f"random probe gave up after {MAX_PROBES} probes on {failed} of {signups} signups"
+            ))
+        self.stdout.write(
+            f"counter (after)       {new_ms:9.3f} ms/signup   {new_queries / signups:8.1f} queries/signup"
+        )
+
+    def _populate(self, count):
+        users = []
+        for index in range(count):
+            first_name, last_name = BASE_NAMES[index % len(BASE_NAMES)]
+            users.append(CustomUser(
+                email=f"bench{index}@{BENCH_EMAIL_DOMAIN}",
+                first_name=first_name,
+                last_name=last_name,
+                password='!',
+            ))
+        start = time.perf_counter()
+        with transaction.atomic():
+            assign_usernames(users)
+            CustomUser.objects.bulk_create(users, batch_size=2000)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(users)} users created in {time.perf_counter() - start:.1f}s."
+        ))
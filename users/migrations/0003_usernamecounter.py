@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_customuser_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameCounter',
+            fields=[
+                ('base', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('last_suffix', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
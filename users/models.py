@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import AbstractUser
-import random
+from .usernames import USERNAME_RETRIES, allocate_username, username_base
 
 
 class CustomUser(AbstractUser):
@@ -16,25 +16,30 @@ class CustomUser(AbstractUser):
 
     def save(self, *args, **kwargs):
         # بررسی می‌کنیم که آیا یوزرنیم تنظیم شده است یا خیر
-        if not self.username:
-            # قدم ۱: ساخت یک یوزرنیم اولیه از ترکیب نام و نام خانوادگی
-            # فاصله‌ها را حذف می‌کنیم تا یوزرنیم یک‌تکه باشد
-            base_username = f"{self.first_name}{self.last_name}".replace(" ", "")
-            
-            # اگر کاربر نام و نام خانوادگی وارد نکرده بود، از قسمت اول ایمیل استفاده کن
-            if not base_username:
-                base_username = self.email.split('@')[0]
-            
-            # قدم ۲: اطمینان از یکتا بودن (Uniqueness)
-            candidate = base_username
-            counter = 1
-            
-            # تا زمانی که کاربری با این یوزرنیم در دیتابیس وجود دارد، یک عدد رندوم به تهش اضافه کن
-            while CustomUser.objects.filter(username=candidate).exists():
-                # یک عدد تصادفی بین 10 تا 9999 به انتهای اسم اضافه می‌کند
-                candidate = f"{base_username}{random.randint(10, 9999)}"
-            
-            # قدم ۳: تنظیم یوزرنیم نهایی
-            self.username = candidate
-            
-        super().save(*args, **kwargs)
+        if self.username:
+            return super().save(*args, **kwargs)
+
+        # یوزرنیم از نام و نام خانوادگی (یا بخش اول ایمیل) ساخته و شماره‌ی آزاد بعدی
+        # از جدول شمارنده گرفته می‌شود (users/usernames.py)
+        base_username = username_base(self)
+        for attempt in range(USERNAME_RETRIES):
+            self.username = allocate_username(base_username)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # ثبت‌نام هم‌زمان یا یوزرنیم قدیمی با همین شماره؛ شماره‌ی بعدی را امتحان کن
+                if not CustomUser.objects.filter(username=self.username).exists():
+                    self.username = ''
+                    raise
+        self.username = ''
+        raise IntegrityError(f'Could not allocate a free username for "{base_username}"')
+
+
+class UsernameCounter(models.Model):
+    """آخرین شماره‌ی استفاده شده برای هر پایه‌ی یوزرنیم (مثلا alirezaahmadi → alirezaahmadi12)."""
+    base = models.CharField(max_length=150, primary_key=True)
+    last_suffix = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.base}: {self.last_suffix}"
@@ -1,3 +1,83 @@
+import unittest.mock
+
+from django.db import IntegrityError
 from django.test import TestCase
+from django.urls import reverse
+
+from courses.tests import QueryBudgetTestCase, seed_dataset
+from .models import CustomUser, UsernameCounter
+from .usernames import USERNAME_RETRIES, _highest_existing_number, reserve_numbers
+
+
+class UsernameAllocationTests(TestCase):
+    def make_user(self, email='nima@example.com'):
+        user = CustomUser(email=email, first_name='Nima', last_name='Nouri')
+        user.save()
+        return user
+
+    def test_highest_number_reads_one_row(self):
+        for username in ('NimaNouri', 'NimaNouri9', 'NimaNouri12', 'NimaNouri012', 'NimaNouriX', 'NimaNouri3b'):
+            CustomUser.objects.create(email=f'{username}@example.com', username=username)
+        with self.assertNumQueries(1):
+            self.assertEqual(_highest_existing_number('NimaNouri'), 12)
+        self.assertEqual(_highest_existing_number('Nima.Nouri'), 0)
+
+    def test_numbers_follow_existing_usernames(self):
+        self.assertEqual(self.make_user().username, 'NimaNouri')
+        self.assertEqual(self.make_user('second@example.com').username, 'NimaNouri2')
+
+    def test_save_skips_usernames_taken_behind_the_counter(self):
+        self.make_user()
+        # یوزرنیم‌هایی که بدون شمارنده ساخته شده‌اند (مثلا از ادمین)
+        for number in (2, 3):
+            CustomUser.objects.create(email=f'old{number}@example.com', username=f'NimaNouri{number}')
+        self.assertEqual(self.make_user('new@example.com').username, 'NimaNouri4')
+        self.assertEqual(UsernameCounter.objects.get(base='NimaNouri').last_suffix, 4)
+
+    def test_save_gives_up_after_retries(self):
+        self.make_user()
+        CustomUser.objects.bulk_create([
+            CustomUser(email=f'old{number}@example.com', username=f'NimaNouri{number}')
+            for number in range(2, USERNAME_RETRIES + 2)
+        ])
+        user = CustomUser(email='late@example.com', first_name='Nima', last_name='Nouri')
+        with self.assertRaises(IntegrityError):
+            user.save()
+        self.assertEqual(user.username, '')
+        self.assertIsNone(user.pk)
+
+    def test_reserve_retries_when_counter_is_created_concurrently(self):
+        def concurrent_signup(base):
+            # درخواست دیگری بین خواندن و ساختن، شمارنده را می‌سازد
+            UsernameCounter.objects.create(base=base, last_suffix=7)
+            return 0
+
+        with unittest.mock.patch('users.usernames._highest_existing_number', side_effect=concurrent_signup):
+            self.assertEqual(reserve_numbers('NimaNouri', 2), 8)
+        self.assertEqual(UsernameCounter.objects.get(base='NimaNouri').last_suffix, 9)
+
+
+class UserViewBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses, cls.exercises, cls.users = seed_dataset(students=100)
+        cls.student = cls.users[0]
+
+    def test_anonymous_pages(self):
+        budgets = {
+            reverse('users:register'): 3,
+            reverse('users:login'): 3,
+            reverse('users:account_signup'): 3,
+            reverse('home'): 3,
+        }
+        for url, max_queries in budgets.items():
+            with self.subTest(url=url):
+                self.assertWithinBudget('get', url, max_queries)
+
+    def test_edit_profile(self):
+        self.client.force_login(self.student)
+        self.assertWithinBudget('get', reverse('users:edit_profile'), 3)
 
-# Create your tests here.
+    def test_logout(self):
+        self.client.force_login(self.student)
+        self.assertWithinBudget('get', reverse('users:logout'), 5, status=302)
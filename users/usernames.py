@@ -0,0 +1,101 @@
+"""
+ساخت یوزرنیم یکتا برای CustomUser.
+
+به جای امتحان کردن عددهای تصادفی (که برای نام‌های پرتکرار کند می‌شد و در ثبت‌نام‌های
+هم‌زمان تداخل داشت)، برای هر پایه‌ی یوزرنیم یک شمارنده در UsernameCounter نگه داریم:
+ali، ali2، ali3، ...
+شمارنده اولین بار با یک کوئری prefix روی ایندکس یوزرنیم مقداردهی می‌شود.
+"""
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
+
+
+USERNAME_MAX_LENGTH = 150
+# جا برای شماره‌ی انتهای یوزرنیم
+BASE_MAX_LENGTH = USERNAME_MAX_LENGTH - 10
+USERNAME_RETRIES = 5
+
+
+def username_base(user):
+    # فاصله‌ها را حذف می‌کنیم تا یوزرنیم یک‌تکه باشد
+    base = f"{user.first_name}{user.last_name}".replace(" ", "")
+    # اگر کاربر نام و نام خانوادگی وارد نکرده بود، از قسمت اول ایمیل استفاده کن
+    if not base:
+        base = user.email.split('@')[0]
+    return base[:BASE_MAX_LENGTH]
+
+
+def _username(base, number):
+    # شماره‌ی ۱ همان پایه‌ی بدون عدد است
+    return base if number == 1 else f"{base}{number}"
+
+
+def _highest_existing_number(base):
+    """
+    بزرگ‌ترین شماره‌ی استفاده شده برای این پایه. فقط یک ردیف خوانده می‌شود: LIKE 'base%' روی ایندکس
+    یکتا، regex فقط «پایه + عدد بدون صفر اول» را نگه می‌دارد و طولانی‌ترین (یعنی بزرگ‌ترین عدد) اول می‌آید.
+    """
+    User = apps.get_model('users', 'CustomUser')
+    username = (
+        User.objects.filter(username__startswith=base, username__regex=rf'^{re.escape(base)}([1-9][0-9]*)?$')
+        .order_by(Length('username').desc(), '-username')
+        .values_list('username', flat=True)
+        .first()
+    )
+    if username is None:
+        return 0
+    rest = username[len(base):]
+    return int(rest) if rest else 1
+
+
+def reserve_numbers(base, count=1):
+    """count شماره‌ی پشت سر هم برای این پایه رزرو می‌کند و شماره‌ی اول را برمی‌گرداند."""
+    Counter = apps.get_model('users', 'UsernameCounter')
+    for _ in range(USERNAME_RETRIES):
+        with transaction.atomic():
+            # قفل ردیف شمارنده، ثبت‌نام‌های هم‌زمان با پایه‌ی یکسان را پشت سر هم می‌کند
+            counter = Counter.objects.select_for_update().filter(base=base).first()
+            if counter is not None:
+                first = counter.last_suffix + 1
+                counter.last_suffix += count
+                counter.save(update_fields=['last_suffix'])
+                return first
+
+            first = _highest_existing_number(base) + 1
+            try:
+                with transaction.atomic():
+                    Counter.objects.create(base=base, last_suffix=first + count - 1)
+                return first
+            except IntegrityError:
+                # درخواست دیگری هم‌زمان شمارنده را ساخت؛ دوباره با قفل بخوان
+                continue
+    raise IntegrityError(f'Could not reserve a username number for "{base}"')
+
+
+def allocate_username(base):
+    return _username(base, reserve_numbers(base))
+
+
+def allocate_usernames(base, count):
+    first = reserve_numbers(base, count)
+    return [_username(base, number) for number in range(first, first + count)]
+
+
+def assign_usernames(users):
+    """
+    برای ساخت گروهی کاربران (bulk_create): به همه‌ی کاربرهای بدون یوزرنیم، با یک رزرو
+    برای هر پایه، یوزرنیم یکتا می‌دهد.
+    """
+    by_base = defaultdict(list)
+    for user in users:
+        if not user.username:
+            by_base[username_base(user)].append(user)
+
+    for base, group in by_base.items():
+        for user, username in zip(group, allocate_usernames(base, len(group))):
+            user.username = username
+    return users